@@ -0,0 +1,262 @@
+"""
+Intervalos de férias e afastamentos por matrícula
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import numpy as np
+import pandas as pd
+
+from column_resolver import (DIAS_FERIAS_COLUMN, FIM_COLUMN, INICIO_COLUMN, MATRICULA_COLUMN,
+                             normalize_matricula)
+
+INTERVAL_COLUMNS = ['matricula', 'inicio', 'fim', 'tipo']
+
+# Férias sem datas: dias corridos, convertidos em dias úteis na proporção do mês
+DAY_COUNT_COLUMN = 'dias_corridos'
+
+# Datas no texto livre das planilhas (ex.: "retorno da licença em 04/06")
+DATE_PATTERN = r'(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?'
+
+
+def as_dates(values, n):
+    """Converte valores posicionais em datetime64 (NaT quando ausentes)"""
+    if values is None:
+        return np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]')
+    values = values.to_numpy() if isinstance(values, pd.Series) else values
+    return pd.to_datetime(pd.Series(values), errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+
+def extract_text_dates(df, year):
+    """Extrai a primeira data dd/mm[/aaaa] do texto de qualquer coluna não numérica"""
+    result = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        parts = df[col].astype(str).str.extract(DATE_PATTERN)
+        if parts[0].isna().all():
+            continue
+        years = pd.to_numeric(parts[2], errors='coerce').fillna(year)
+        years = years.where(years >= 100, years + 2000)
+        dates = pd.to_datetime(
+            pd.DataFrame({
+                'year': years,
+                'month': pd.to_numeric(parts[1], errors='coerce'),
+                'day': pd.to_numeric(parts[0], errors='coerce')
+            }),
+            errors='coerce'
+        )
+        result = result.fillna(dates)
+    return result
+
+
+def source_column(df, name):
+    """Coluna canônica da planilha mapeada, ou None se ela não veio na planilha"""
+    return name if name in df.columns else None
+
+
+def interval_frame(matriculas, inicio=None, fim=None, tipo=None, dias=None):
+    """
+    Intervalos com tipos fixos por coluna (matrícula, datas, dias corridos).
+
+    Todos os quadros de intervalos saem daqui, de modo que o concat entre
+    eles nunca depende de colunas vazias ou só com nulos.
+    """
+    n = len(matriculas)
+    frame = pd.DataFrame({
+        'matricula': normalize_matricula(matriculas).to_numpy(),
+        'inicio': as_dates(inicio, n),
+        'fim': as_dates(fim, n),
+        DAY_COUNT_COLUMN: np.full(n, np.nan) if dias is None else np.asarray(dias, dtype=np.float64)
+    })
+    if tipo is not None:
+        frame.insert(3, 'tipo', tipo)
+    return frame
+
+
+def ferias_intervals(ferias, calendar):
+    """
+    Converte a planilha de férias em intervalos [início, fim] por matrícula.
+
+    Usa colunas de início/fim quando existem. Sem data nenhuma, a posição
+    das férias no mês é desconhecida: a linha fica sem intervalo e leva os
+    DIAS DE FÉRIAS (corridos) em dias_corridos, descontados depois na
+    proporção de dias úteis do mês (absence_business_days).
+    """
+    if ferias is None or ferias.empty:
+        return interval_frame([], tipo='ferias')
+
+    matricula_col = source_column(ferias, MATRICULA_COLUMN)
+    if matricula_col is None:
+        return interval_frame([], tipo='ferias')
+
+    start_col = source_column(ferias, INICIO_COLUMN)
+    end_col = source_column(ferias, FIM_COLUMN)
+    days_col = source_column(ferias, DIAS_FERIAS_COLUMN)
+
+    no_dates = pd.Series(pd.NaT, index=ferias.index, dtype='datetime64[ns]')
+    inicio = pd.to_datetime(ferias[start_col], errors='coerce') if start_col is not None else no_dates
+    fim = pd.to_datetime(ferias[end_col], errors='coerce') if end_col is not None else no_dates
+    dias = (pd.to_numeric(ferias[days_col], errors='coerce') if days_col is not None
+            else pd.Series(np.nan, index=ferias.index))
+
+    # Com início e dias, o fim sai do início; sem início, só o fim data a linha
+    fim = fim.fillna(inicio + pd.to_timedelta(dias - 1, unit='D'))
+    dated = fim.notna()
+    inicio = inicio.where(inicio.notna() | ~dated, pd.Timestamp(calendar.start))
+
+    intervals = interval_frame(ferias[matricula_col], inicio, fim, 'ferias', dias.where(~dated))
+    intervals = intervals.dropna(subset=['matricula'])
+    return intervals[intervals['fim'].notna() | (intervals[DAY_COUNT_COLUMN] > 0)]
+
+
+def afastamento_intervals(afastamentos, calendar):
+    """
+    Converte a planilha de afastamentos em intervalos [início, fim] por matrícula.
+
+    Sem datas explícitas, o afastamento cobre a competência inteira; uma data
+    de retorno no texto (ex.: "retorno da licença em 04/06") encerra o
+    intervalo na véspera do retorno.
+    """
+    if afastamentos is None or afastamentos.empty:
+        return interval_frame([], tipo='afastamento')
+
+    matricula_col = source_column(afastamentos, MATRICULA_COLUMN)
+    if matricula_col is None:
+        return interval_frame([], tipo='afastamento')
+
+    period_start = pd.Timestamp(calendar.start)
+    period_end = pd.Timestamp(calendar.end)
+
+    start_col = source_column(afastamentos, INICIO_COLUMN)
+    end_col = source_column(afastamentos, FIM_COLUMN)
+
+    if start_col is not None:
+        inicio = pd.to_datetime(afastamentos[start_col], errors='coerce').fillna(period_start)
+    else:
+        inicio = pd.Series(period_start, index=afastamentos.index)
+
+    if end_col is not None:
+        fim = pd.to_datetime(afastamentos[end_col], errors='coerce')
+    else:
+        retorno = extract_text_dates(afastamentos, int(calendar.period.year))
+        fim = retorno - pd.Timedelta(days=1)
+
+    intervals = interval_frame(afastamentos[matricula_col], inicio, fim.fillna(period_end), 'afastamento')
+    return intervals.dropna(subset=['matricula'])
+
+
+def merge_intervals(intervals):
+    """
+    Une intervalos sobrepostos ou adjacentes da mesma matrícula.
+
+    Ordena por (matrícula, início) e usa o máximo acumulado do fim para
+    identificar onde começa cada novo bloco: O(n log n), sem laços.
+    """
+    if intervals.empty:
+        return pd.DataFrame(columns=['matricula', 'inicio', 'fim'])
+
+    ordered = intervals.sort_values(['matricula', 'inicio'], kind='mergesort').reset_index(drop=True)
+    running_end = ordered.groupby('matricula', sort=False)['fim'].cummax()
+
+    previous_end = running_end.shift()
+    same_matricula = ordered['matricula'].eq(ordered['matricula'].shift())
+    starts_block = ~same_matricula | (ordered['inicio'] > previous_end + pd.Timedelta(days=1))
+    block = starts_block.cumsum()
+
+    merged = ordered.groupby(block, sort=False).agg(
+        matricula=('matricula', 'first'),
+        inicio=('inicio', 'min'),
+        fim=('fim', 'max')
+    )
+    return merged.reset_index(drop=True)
+
+
+def build_absence_intervals(ferias, afastamentos, calendar):
+    """
+    Monta os intervalos de ausência (férias + afastamentos) já unidos por matrícula.
+
+    Férias sem datas não entram na união: viram uma linha por matrícula sem
+    início/fim, com o total de dias_corridos.
+    """
+    # Só quadros com linhas entram no concat (mesmos tipos por coluna)
+    frames = [frame for frame in (ferias_intervals(ferias, calendar), afastamento_intervals(afastamentos, calendar))
+              if not frame.empty]
+    if not frames:
+        return interval_frame([])
+    intervals = pd.concat(frames, ignore_index=True)
+
+    counted = intervals[DAY_COUNT_COLUMN].notna()
+    day_counts = intervals[counted].groupby('matricula', sort=False)[DAY_COUNT_COLUMN].sum()
+
+    intervals = intervals[~counted]
+    merged = merge_intervals(intervals[intervals['fim'] >= intervals['inicio']])
+
+    parts = []
+    if not merged.empty:
+        parts.append(interval_frame(merged['matricula'], merged['inicio'], merged['fim']))
+    if not day_counts.empty:
+        parts.append(interval_frame(day_counts.index, dias=day_counts.to_numpy()))
+    return pd.concat(parts, ignore_index=True) if parts else interval_frame([])
+
+
+def absence_business_days(calendar, intervals, matriculas, calendar_ids,
+                          admissao=None, desligamento=None):
+    """
+    Conta os dias úteis de ausência de cada colaborador.
+
+    Os intervalos unidos são ligados aos colaboradores por matrícula (hash
+    join), recortados pela janela de admissão/desligamento e contados no
+    calendário de cada um; o total por colaborador sai de um bincount.
+    Férias só com dias corridos descontam esses dias na razão entre dias
+    úteis e dias corridos da janela do colaborador na competência (meio dia
+    arredondado para cima), limitados aos dias corridos e úteis da janela.
+    """
+    n = len(calendar_ids)
+    if intervals is None or intervals.empty or n == 0:
+        return np.zeros(n, dtype=np.int64)
+
+    employees = pd.DataFrame({
+        'matricula': normalize_matricula(matriculas).to_numpy(),
+        'calendar_id': np.asarray(calendar_ids),
+        'admissao': as_dates(admissao, n),
+        'desligamento': as_dates(desligamento, n),
+        'posicao': np.arange(n)
+    })
+    joined = intervals.merge(employees.dropna(subset=['matricula']), on='matricula', how='inner')
+    if joined.empty:
+        return np.zeros(n, dtype=np.int64)
+
+    inicio = joined['inicio'].where(joined['admissao'].isna() | (joined['inicio'] > joined['admissao']),
+                                    joined['admissao'])
+    fim = joined['fim'].where(joined['desligamento'].isna() | (joined['fim'] < joined['desligamento']),
+                              joined['desligamento'])
+
+    joined_ids = joined['calendar_id'].to_numpy()
+    counts = calendar.count_business_days(joined_ids, inicio, fim)
+
+    if DAY_COUNT_COLUMN in joined:
+        dias = joined[DAY_COUNT_COLUMN].to_numpy(dtype=np.float64)
+        # Janela do colaborador (admissão/desligamento) na competência: dias úteis e corridos
+        n_days = len(calendar.days)
+        business = calendar.count_business_days(joined_ids, joined['admissao'], joined['desligamento'])
+        first = np.clip(calendar.day_offsets(joined['admissao'], 0), 0, n_days)
+        last = np.clip(calendar.day_offsets(joined['desligamento'], n_days - 1), -1, n_days - 1)
+        window = np.maximum(last - first + 1, 0)
+        ratio = np.divide(business, window, out=np.zeros(len(window)), where=window > 0)
+        proportional = np.minimum(np.floor(np.minimum(dias, window) * ratio + 0.5), business)
+        counts = np.where(np.isnan(dias), counts, np.nan_to_num(proportional))
+    return np.bincount(joined['posicao'].to_numpy(), weights=counts, minlength=n).astype(np.int64)
+
+
+def full_period_absences(afastamentos, calendar):
+    """Matrículas cujo afastamento cobre a competência inteira"""
+    intervals = afastamento_intervals(afastamentos, calendar)
+    if intervals.empty:
+        return intervals['matricula'].to_numpy()
+
+    covers = (
+        (pd.to_datetime(intervals['inicio']) <= pd.Timestamp(calendar.start))
+        & (pd.to_datetime(intervals['fim']) >= pd.Timestamp(calendar.end))
+    )
+    return intervals.loc[covers, 'matricula'].unique()
@@ -0,0 +1,183 @@
+"""
+Benchmark de escala do ImprovedVRDataProcessor sobre planilhas sintéticas
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from synthetic_data import generate_dataset
+
+# Etapas medidas, na ordem do processamento
+BENCHMARK_STAGES = ['load', 'eligibility', 'days', 'values', 'validation', 'write']
+
+# Tolerância padrão para regressões (fração sobre a linha de base)
+DEFAULT_TOLERANCE = 0.25
+
+# Diferenças absolutas abaixo destes limites são ruído de medição
+MIN_SECONDS_DELTA = 0.05
+MIN_RSS_DELTA_MB = 20.0
+
+BENCHMARK_VERSION = 1
+
+
+def peak_rss_mb():
+    """Pico de memória residente (MB) do processo e dos processos filhos já encerrados"""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+
+def run_stages(data_dir, output_dir, competencia, use_cache):
+    """
+    Executa o processamento completo em um processo próprio e devolve as medidas.
+
+    Os tempos por etapa (carga, elegibilidade, proporcionalidade + dias úteis,
+    valores e gravação) vêm da instrumentação de process_data_with_reference.
+    """
+    os.environ['EXCEL_CACHE'] = '1' if use_cache else '0'
+    os.environ['VR_COLUMNAR'] = '0'
+    os.environ['VR_INCREMENTAL'] = '0'
+
+    from improved_data_processor import ImprovedVRDataProcessor
+
+    processor = ImprovedVRDataProcessor(pure_data=True, competencia=competencia,
+                                        data_dir=data_dir, output_dir=output_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = processor.process_data_with_reference(resume=False)
+    timings = processor.instrumentation.stage_times()
+
+    return {
+        'colaboradores': int(len(processor.data.get('ativos', []))),
+        'elegiveis': int(len(result)),
+        'valor_total': processor.totals.total,
+        'etapas_s': {stage: round(timings.get(stage, 0.0), 4) for stage in BENCHMARK_STAGES},
+        'total_s': round(sum(timings.get(stage, 0.0) for stage in BENCHMARK_STAGES), 4),
+        'pico_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def benchmark_size(rows, work_dir, competencia='2025-05', seed=42, repeat=1, use_cache=False):
+    """Gera (uma vez) as planilhas do tamanho pedido e mede o processamento; fica a melhor repetição"""
+    data_dir = os.path.join(work_dir, f"dados_{rows}_{seed}")
+    if not os.path.isdir(data_dir):
+        generate_dataset(rows, data_dir, competencia, seed)
+    output_dir = os.path.join(work_dir, f"saida_{rows}")
+
+    runs = []
+    for _ in range(repeat):
+        # Processo novo a cada repetição: o pico de RSS não herda execuções anteriores
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            runs.append(executor.submit(run_stages, data_dir, output_dir, competencia, use_cache).result())
+
+    best = min(runs, key=lambda run: run['total_s'])
+    best['linhas'] = rows
+    best['repeticoes'] = repeat
+    return best
+
+
+def compare_results(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Lista as regressões de current em relação a baseline (mesmos tamanhos).
+
+    Uma métrica regride quando passa da linha de base em mais de tolerance e
+    a diferença absoluta supera o ruído de medição.
+    """
+    previous = {item['linhas']: item for item in baseline.get('resultados', [])}
+    regressions = []
+    for item in current['resultados']:
+        base = previous.get(item['linhas'])
+        if base is None:
+            continue
+
+        metrics = [(f"etapas_s.{stage}", item['etapas_s'].get(stage), base['etapas_s'].get(stage), MIN_SECONDS_DELTA)
+                   for stage in BENCHMARK_STAGES]
+        metrics.append(('total_s', item['total_s'], base['total_s'], MIN_SECONDS_DELTA))
+        metrics.append(('pico_rss_mb', item['pico_rss_mb'], base['pico_rss_mb'], MIN_RSS_DELTA_MB))
+
+        for name, value, reference, min_delta in metrics:
+            if value is None or reference is None:
+                continue
+            if value > reference * (1 + tolerance) and value - reference > min_delta:
+                regressions.append({
+                    'linhas': item['linhas'],
+                    'metrica': name,
+                    'atual': value,
+                    'base': reference,
+                    'variacao': round(value / reference - 1, 3) if reference else None
+                })
+    return regressions
+
+
+def main(argv=None):
+    """Roda o benchmark e compara com a linha de base (código de saída 1 em caso de regressão)"""
+    parser = argparse.ArgumentParser(description="Benchmark de escala do processamento de VR/VA")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help="números de colaboradores a medir")
+    parser.add_argument('--diretorio', default=os.path.join('output', 'benchmark'),
+                        help="diretório das planilhas sintéticas e saídas")
+    parser.add_argument('--saida', default=None, help="arquivo JSON de resultados")
+    parser.add_argument('--base', default=None, help="JSON de uma execução anterior para comparação")
+    parser.add_argument('--tolerancia', type=float, default=DEFAULT_TOLERANCE,
+                        help="aumento relativo aceito antes de acusar regressão")
+    parser.add_argument('--repeticoes', type=int, default=1, help="repetições por tamanho (vale a melhor)")
+    parser.add_argument('--competencia', default='2025-05')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--cache', action='store_true', help="usar o cache colunar das planilhas na carga")
+    args = parser.parse_args(argv)
+
+    results = []
+    for rows in args.tamanhos:
+        print(f"\n=== BENCHMARK: {rows} colaboradores ===")
+        result = benchmark_size(rows, args.diretorio, args.competencia, args.semente,
+                                args.repeticoes, args.cache)
+        stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in result['etapas_s'].items())
+        print(f"{result['elegiveis']} elegíveis | {stages} | total {result['total_s']:.2f}s | "
+              f"pico RSS {result['pico_rss_mb']:.0f} MB")
+        results.append(result)
+
+    report = {
+        'versao': BENCHMARK_VERSION,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'cache_planilhas': args.cache,
+        'resultados': results
+    }
+
+    output_path = args.saida or os.path.join(args.diretorio, 'resultado.json')
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados salvos em: {output_path}")
+
+    if args.base:
+        with open(args.base, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.tolerancia)
+        if regressions:
+            print(f"\nREGRESSÕES em relação a {args.base}:")
+            for item in regressions:
+                variacao = f", {item['variacao']:+.0%}" if item['variacao'] is not None else ""
+                print(f"- {item['linhas']} linhas, {item['metrica']}: {item['atual']} (base {item['base']}{variacao})")
+            return 1
+        print(f"\nSem regressões em relação a {args.base} (tolerância {args.tolerancia:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Calendário de dias úteis por sindicato, estado e município
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Feriados nacionais fixos (mês, dia)
+FERIADOS_NACIONAIS = [
+    (1, 1, 'Confraternização Universal'),
+    (4, 21, 'Tiradentes'),
+    (5, 1, 'Dia do Trabalho'),
+    (9, 7, 'Independência do Brasil'),
+    (10, 12, 'Nossa Senhora Aparecida'),
+    (11, 2, 'Finados'),
+    (11, 15, 'Proclamação da República'),
+    (11, 20, 'Dia Nacional de Zumbi e da Consciência Negra'),
+    (12, 25, 'Natal')
+]
+
+# Feriados nacionais móveis (dias em relação à Páscoa)
+FERIADOS_NACIONAIS_MOVEIS = [
+    (-2, 'Sexta-feira Santa')
+]
+
+# Feriados estaduais (mês, dia) e móveis (dias em relação à Páscoa)
+FERIADOS_ESTADUAIS = {
+    'SP': [(7, 9, 'Revolução Constitucionalista')],
+    'RJ': [(4, 23, 'Dia de São Jorge')],
+    'RS': [(9, 20, 'Revolução Farroupilha')],
+    'PR': [(12, 19, 'Emancipação Política do Paraná')]
+}
+
+FERIADOS_ESTADUAIS_MOVEIS = {
+    'RJ': [(-47, 'Carnaval')]
+}
+
+# Feriados municipais (mês, dia) e móveis (dias em relação à Páscoa)
+FERIADOS_MUNICIPAIS = {
+    'São Paulo': [(1, 25, 'Aniversário de São Paulo')],
+    'Rio de Janeiro': [(1, 20, 'Dia de São Sebastião')],
+    'Porto Alegre': [(2, 2, 'Nossa Senhora dos Navegantes')],
+    'Curitiba': [(9, 8, 'Nossa Senhora da Luz dos Pinhais')]
+}
+
+FERIADOS_MUNICIPAIS_MOVEIS = {
+    'São Paulo': [(60, 'Corpus Christi')],
+    'Rio de Janeiro': [(60, 'Corpus Christi')],
+    'Porto Alegre': [(60, 'Corpus Christi')],
+    'Curitiba': [(60, 'Corpus Christi')]
+}
+
+# Estados por sigla e município padrão (capital) quando não há lotação
+ESTADOS = {
+    'AC': 'Acre', 'AL': 'Alagoas', 'AP': 'Amapá', 'AM': 'Amazonas',
+    'BA': 'Bahia', 'CE': 'Ceará', 'DF': 'Distrito Federal',
+    'ES': 'Espírito Santo', 'GO': 'Goiás', 'MA': 'Maranhão',
+    'MT': 'Mato Grosso', 'MS': 'Mato Grosso do Sul', 'MG': 'Minas Gerais',
+    'PA': 'Pará', 'PB': 'Paraíba', 'PR': 'Paraná', 'PE': 'Pernambuco',
+    'PI': 'Piauí', 'RJ': 'Rio de Janeiro', 'RN': 'Rio Grande do Norte',
+    'RS': 'Rio Grande do Sul', 'RO': 'Rondônia', 'RR': 'Roraima',
+    'SC': 'Santa Catarina', 'SP': 'São Paulo', 'SE': 'Sergipe',
+    'TO': 'Tocantins'
+}
+
+CAPITAIS = {
+    'SP': 'São Paulo',
+    'RJ': 'Rio de Janeiro',
+    'RS': 'Porto Alegre',
+    'PR': 'Curitiba'
+}
+
+UF_PATTERN = re.compile(r'\b(' + '|'.join(ESTADOS) + r')\b')
+
+
+def easter_date(year):
+    """Calcula o domingo de Páscoa (algoritmo gregoriano anônimo)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def holidays_for(year, uf=None, municipio=None):
+    """Retorna os feriados do ano (nacionais, estaduais e municipais) como datetime64[D]"""
+    easter = easter_date(year)
+
+    fixed = list(FERIADOS_NACIONAIS)
+    moving = list(FERIADOS_NACIONAIS_MOVEIS)
+    if uf:
+        fixed += FERIADOS_ESTADUAIS.get(uf, [])
+        moving += FERIADOS_ESTADUAIS_MOVEIS.get(uf, [])
+    if municipio:
+        fixed += FERIADOS_MUNICIPAIS.get(municipio, [])
+        moving += FERIADOS_MUNICIPAIS_MOVEIS.get(municipio, [])
+
+    days = [date(year, month, day) for month, day, _ in fixed]
+    days += [easter + timedelta(days=offset) for offset, _ in moving]
+
+    holidays = np.array(sorted(set(days)), dtype='datetime64[D]')
+    holidays.setflags(write=False)
+    return holidays
+
+
+def resolve_uf(sindicato):
+    """Identifica a UF de um sindicato pela sigla (ex.: 'SINDPD SP') ou pelo nome do estado"""
+    if sindicato is None or (isinstance(sindicato, float) and np.isnan(sindicato)):
+        return None
+
+    text = str(sindicato).strip()
+    match = UF_PATTERN.search(text.upper())
+    if match:
+        return match.group(1)
+
+    for uf, nome in ESTADOS.items():
+        if nome.lower() == text.lower():
+            return uf
+    return None
+
+
+class BusinessCalendar:
+    """
+    Bitmaps de dias úteis da competência, um por calendário (UF + município).
+
+    Os bitmaps são montados uma única vez por calendário e mantidos como
+    somas acumuladas, de modo que a contagem de dias úteis de qualquer
+    intervalo, para qualquer quantidade de colaboradores, é uma indexação
+    vetorizada.
+    """
+
+    def __init__(self, competencia):
+        self.period = pd.Period(competencia, freq='M')
+        self.start = np.datetime64(self.period.start_time.date(), 'D')
+        self.end = np.datetime64(self.period.end_time.date(), 'D')
+        self.days = np.arange(self.start, self.end + 1, dtype='datetime64[D]')
+
+        self.calendar_keys = []
+        self._calendar_index = {}
+        self._bitmaps = []
+        self._cumulative = None
+
+    def calendar_id(self, uf=None, municipio=None):
+        """Retorna o id do calendário (UF, município), montando o bitmap na primeira vez"""
+        if municipio is None and uf is not None:
+            municipio = CAPITAIS.get(uf)
+        key = (uf, municipio)
+
+        if key not in self._calendar_index:
+            holidays = holidays_for(int(self.period.year), uf, municipio)
+            bitmap = np.is_busday(self.days, holidays=holidays)
+            self._calendar_index[key] = len(self.calendar_keys)
+            self.calendar_keys.append(key)
+            self._bitmaps.append(bitmap)
+            self._cumulative = None
+
+        return self._calendar_index[key]
+
+    def calendar_ids(self, sindicatos, municipios=None):
+        """Resolve o calendário de cada colaborador a partir do sindicato (e município, se houver)"""
+        sindicatos = pd.Series(sindicatos).reset_index(drop=True)
+        if municipios is None:
+            municipios = pd.Series(None, index=sindicatos.index, dtype=object)
+        else:
+            municipios = pd.Series(municipios).reset_index(drop=True)
+
+        # Resolver apenas as combinações distintas e expandir com os códigos
+        keys = sindicatos.fillna('').astype(str) + '|' + municipios.fillna('').astype(str)
+        codes, uniques = pd.factorize(keys)
+        ids = []
+        for key in uniques:
+            sindicato, municipio = key.rsplit('|', 1)
+            ids.append(self.calendar_id(resolve_uf(sindicato) if sindicato else None,
+                                        municipio or None))
+        ids = np.array(ids, dtype=np.int64)
+        return ids[codes] if len(ids) else np.zeros(len(codes), dtype=np.int64)
+
+    @property
+    def cumulative(self):
+        """Somas acumuladas dos bitmaps (calendários x dias + 1)"""
+        if self._cumulative is None:
+            bitmaps = np.vstack(self._bitmaps) if self._bitmaps else np.zeros((0, len(self.days)), dtype=bool)
+            cumulative = np.zeros((bitmaps.shape[0], bitmaps.shape[1] + 1), dtype=np.int32)
+            np.cumsum(bitmaps, axis=1, out=cumulative[:, 1:])
+            self._cumulative = cumulative
+        return self._cumulative
+
+    def day_offsets(self, dates, default):
+        """Converte datas em posições dentro da competência (NaT vira o default)"""
+        values = pd.to_datetime(pd.Series(dates), errors='coerce').to_numpy(dtype='datetime64[D]')
+        offsets = (values - self.start).astype(np.int64)
+        return np.where(np.isnat(values), default, offsets)
+
+    def count_business_days(self, calendar_ids, starts=None, ends=None):
+        """
+        Conta os dias úteis de [início, fim] (inclusive) de cada linha, limitados à competência.
+
+        Datas ausentes (NaT) equivalem ao início/fim da competência.
+        """
+        calendar_ids = np.asarray(calendar_ids, dtype=np.int64)
+        n_days = len(self.days)
+
+        if starts is None:
+            first = np.zeros(len(calendar_ids), dtype=np.int64)
+        else:
+            first = self.day_offsets(starts, 0)
+        if ends is None:
+            last = np.full(len(calendar_ids), n_days - 1, dtype=np.int64)
+        else:
+            last = self.day_offsets(ends, n_days - 1)
+
+        first = np.clip(first, 0, n_days)
+        last = np.clip(last, -1, n_days - 1)
+
+        cumulative = self.cumulative
+        counts = cumulative[calendar_ids, last + 1] - cumulative[calendar_ids, first]
+        return np.where(last >= first, counts, 0)
+
+    def full_period_days(self, calendar_ids):
+        """Dias úteis da competência inteira para cada calendário"""
+        calendar_ids = np.asarray(calendar_ids, dtype=np.int64)
+        return self.cumulative[calendar_ids, -1]
+
+
+@lru_cache(maxsize=12)
+def get_calendar(competencia):
+    """Retorna o calendário compartilhado da competência (montado uma vez por mês)"""
+    return BusinessCalendar(str(pd.Period(competencia, freq='M')))
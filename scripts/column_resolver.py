@@ -0,0 +1,202 @@
+"""
+Resolução de colunas comuns às planilhas de entrada
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import hashlib
+import json
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+# Palavras-chave da coluna de matrícula (sem acentos)
+MATRICULA_KEYWORDS = ['MATRICULA', 'CADASTRO']
+
+# Nomes canônicos lidos pelas etapas seguintes (planilhas já mapeadas)
+MATRICULA_COLUMN = 'MATRICULA'
+SINDICATO_COLUMN = 'SINDICATO'
+ESTADO_COLUMN = 'ESTADO'
+VALOR_COLUMN = 'VALOR'
+CARGO_COLUMN = 'TITULO DO CARGO'
+INICIO_COLUMN = 'INICIO'
+FIM_COLUMN = 'FIM'
+DIAS_FERIAS_COLUMN = 'DIAS DE FERIAS'
+DIAS_UTEIS_COLUMN = 'DIAS UTEIS'
+DATA_ADMISSAO_COLUMN = 'ADMISSAO'
+DATA_DEMISSAO_COLUMN = 'DATA DEMISSAO'
+COMUNICADO_DESLIGAMENTO_COLUMN = 'COMUNICADO DE DESLIGAMENTO'
+
+# Colunas canônicas de cada planilha: nome canônico (já normalizado) -> palavras-chave.
+# Cada coluna é casada pelo nome normalizado exato e, se não houver, pela primeira
+# que contenha uma das palavras-chave, na ordem declarada e sem reaproveitar colunas.
+# Colunas fora do mapa mantêm o nome original; a referência final não é mapeada.
+SOURCE_COLUMNS = {
+    'ativos': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        'EMPRESA': ['EMPRESA'],
+        CARGO_COLUMN: ['CARGO'],
+        'DESC. SITUACAO': ['SITUACAO'],
+        SINDICATO_COLUMN: ['SINDIC']
+    },
+    'ferias': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        'DESC. SITUACAO': ['SITUACAO'],
+        INICIO_COLUMN: ['INICIO'],
+        FIM_COLUMN: ['FIM', 'TERMINO'],
+        DIAS_FERIAS_COLUMN: ['DIAS']
+    },
+    'desligados': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        COMUNICADO_DESLIGAMENTO_COLUMN: ['COMUNICADO'],
+        DATA_DEMISSAO_COLUMN: ['DEMISSAO', 'DESLIGAMENTO']
+    },
+    'admissao': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        DATA_ADMISSAO_COLUMN: ['ADMISSAO'],
+        'CARGO': ['CARGO']
+    },
+    'afastamentos': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        'DESC. SITUACAO': ['SITUACAO'],
+        INICIO_COLUMN: ['INICIO'],
+        FIM_COLUMN: ['FIM', 'TERMINO', 'RETORNO']
+    },
+    'aprendiz': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        CARGO_COLUMN: ['CARGO']
+    },
+    'estagio': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        CARGO_COLUMN: ['CARGO']
+    },
+    'exterior': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        VALOR_COLUMN: ['VALOR']
+    },
+    'base_sindicato': {
+        ESTADO_COLUMN: ['ESTADO', 'UF'],
+        SINDICATO_COLUMN: ['SINDIC'],
+        VALOR_COLUMN: ['VALOR']
+    },
+    'base_dias_uteis': {
+        SINDICATO_COLUMN: ['SINDIC'],
+        DIAS_UTEIS_COLUMN: ['DIAS']
+    },
+    'vr_mensal': {
+        MATRICULA_COLUMN: MATRICULA_KEYWORDS,
+        DATA_ADMISSAO_COLUMN: ['ADMISSAO'],
+        'SINDICATO DO COLABORADOR': ['SINDIC'],
+        'COMPETENCIA': ['COMPETENCIA'],
+        'VALOR DIARIO VR': ['VALOR DIARIO'],
+        'CUSTO EMPRESA': ['CUSTO', 'EMPRESA'],
+        'DESCONTO PROFISSIONAL': ['DESCONTO'],
+        'TOTAL': ['TOTAL'],
+        'DIAS': ['DIAS']
+    }
+}
+
+
+def normalize_name(name):
+    """Normaliza o nome de uma coluna: sem acentos, sem espaços extras, em maiúsculas"""
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.upper().split())
+
+
+def header_of(df):
+    """Cabeçalho da planilha como tupla de textos (chave dos caches de resolução)"""
+    return tuple(str(col) for col in df.columns)
+
+
+@lru_cache(maxsize=4096)
+def _keyword_position(header, keywords):
+    """Posição da primeira coluna do cabeçalho que contém uma das palavras-chave"""
+    for position, name in enumerate(header):
+        name = normalize_name(name)
+        if any(keyword in name for keyword in keywords):
+            return position
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _matricula_position(header):
+    """Posição da coluna de matrícula; 'Cadastro' só vale com o nome exato"""
+    position = _keyword_position(header, ('MATRICULA',))
+    if position is None:
+        names = [normalize_name(name) for name in header]
+        position = names.index('CADASTRO') if 'CADASTRO' in names else None
+    return position
+
+
+def find_matricula_column(df):
+    """Encontra a coluna de matrícula (ex.: 'MATRICULA', 'Matrícula', 'MATRICULA ', 'Cadastro')"""
+    position = _matricula_position(header_of(df))
+    return None if position is None else df.columns[position]
+
+
+def normalize_matricula(values):
+    """Converte matrículas em inteiros (nulos para valores inválidos)"""
+    return pd.to_numeric(pd.Series(values), errors='coerce').astype('Int64')
+
+
+def source_matricula_column(key, df):
+    """
+    Coluna de matrícula de uma planilha carregada.
+
+    Nas planilhas mapeadas (SOURCE_COLUMNS) é a canônica; a busca por
+    palavras-chave fica para as que chegam com os nomes originais
+    (referência final).
+    """
+    if key in SOURCE_COLUMNS:
+        return MATRICULA_COLUMN if MATRICULA_COLUMN in df.columns else None
+    return find_matricula_column(df)
+
+
+def find_keyword_column(df, keywords):
+    """Encontra a primeira coluna cujo nome contenha uma das palavras-chave (sem acentos)"""
+    keywords = tuple(normalize_name(keyword) for keyword in keywords)
+    position = _keyword_position(header_of(df), keywords)
+    return None if position is None else df.columns[position]
+
+
+def header_signature(key, header):
+    """Assinatura do cabeçalho de uma planilha e do seu mapa declarado (chave do mapa salvo)"""
+    payload = json.dumps([key, list(header), SOURCE_COLUMNS.get(key)], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def resolve_columns(key, header, columns=None):
+    """
+    Nome canônico de cada coluna do cabeçalho (None para as que ficam como estão).
+
+    O nome normalizado exato tem precedência sobre as palavras-chave, e cada
+    coluna da planilha atende a no máximo um nome canônico.
+    """
+    columns = SOURCE_COLUMNS.get(key, {}) if columns is None else columns
+    names = [normalize_name(name) for name in header]
+    resolved = [None] * len(header)
+
+    pending = []
+    for canonical, keywords in columns.items():
+        if canonical in names and resolved[names.index(canonical)] is None:
+            resolved[names.index(canonical)] = canonical
+        else:
+            pending.append((canonical, [normalize_name(keyword) for keyword in keywords]))
+
+    for canonical, keywords in pending:
+        for position, name in enumerate(names):
+            if resolved[position] is None and any(keyword in name for keyword in keywords):
+                resolved[position] = canonical
+                break
+    return resolved
+
+
+def rename_columns(df, resolved):
+    """Aplica o mapa de colunas (posição a posição) sem copiar os dados"""
+    if not any(resolved):
+        return df
+    renamed = df.copy(deep=False)
+    renamed.columns = [canonical or col for col, canonical in zip(df.columns, resolved)]
+    return renamed
@@ -0,0 +1,190 @@
+"""
+Saída colunar (Parquet particionado) e snapshots Arrow das etapas do processamento
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+from excel_loader import content_hash
+
+# Etapas do processamento, na ordem em que acontecem
+STAGES = ['fontes', 'elegiveis', 'dias', 'valores']
+
+SNAPSHOT_MANIFEST = 'manifest.json'
+SNAPSHOT_VERSION = 1
+
+# Tipos da planilha final no dataset Parquet
+PARQUET_TYPES = {
+    'Matrícula': 'Int64',
+    'Dias Úteis': 'Int32',
+    'Valor do VR': 'float64',
+    'Valor Total': 'float64',
+    'Valor Empresa (80%)': 'float64',
+    'Valor Descontado (20%)': 'float64'
+}
+
+# Colunas de partição do dataset
+COMPETENCIA_COLUMN = 'competencia'
+PARTITION_COLUMNS = [COMPETENCIA_COLUMN, 'Sindicato']
+
+
+def columnar_enabled():
+    """Indica se a saída colunar está habilitada (VR_COLUMNAR=0 desabilita; requer pyarrow)"""
+    if os.getenv('VR_COLUMNAR', '1') == '0':
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resume_enabled():
+    """Indica se o processamento deve retomar do último snapshot válido (VR_RESUME=1)"""
+    return os.getenv('VR_RESUME', '0') == '1'
+
+
+def to_arrow_table(df):
+    """
+    Converte um DataFrame em tabela Arrow.
+
+    Colunas de texto com tipos misturados (ex.: cabeçalhos repetidos no meio
+    da planilha) não têm tipo Arrow; essas viram texto, mantendo os vazios.
+    """
+    import pyarrow as pa
+
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowException, TypeError, ValueError):
+        converted = df.copy()
+        for col in converted.columns:
+            if converted[col].dtype == object:
+                converted[col] = converted[col].map(lambda v: v if pd.isna(v) else str(v))
+        return pa.Table.from_pandas(converted, preserve_index=False)
+
+
+def write_parquet_dataset(frame, root, competencia):
+    """
+    Grava a planilha final como dataset Parquet tipado, particionado por
+    competência e sindicato (root/competencia=AAAA-MM/Sindicato=.../).
+
+    A partição da competência é substituída a cada execução.
+    """
+    import pyarrow.parquet as pq
+
+    typed = frame.copy()
+    for column, dtype in PARQUET_TYPES.items():
+        if column in typed.columns:
+            typed[column] = pd.to_numeric(typed[column], errors='coerce').astype(dtype)
+    typed[COMPETENCIA_COLUMN] = competencia
+    typed['Sindicato'] = typed['Sindicato'].fillna('SEM SINDICATO').astype(str)
+
+    partition = os.path.join(root, f"{COMPETENCIA_COLUMN}={competencia}")
+    if os.path.isdir(partition):
+        shutil.rmtree(partition)
+    pq.write_to_dataset(to_arrow_table(typed), root, partition_cols=PARTITION_COLUMNS)
+    return partition
+
+
+class StageSnapshots:
+    """
+    Snapshots Arrow (IPC) de cada etapa de uma competência.
+
+    Os arquivos ficam em root/<competência>/ com um manifesto que guarda a
+    impressão digital das planilhas de entrada; um snapshot só é válido se
+    as entradas não mudaram desde que ele foi gravado. Na leitura o arquivo
+    é mapeado em memória. Sem source_paths (ex.: snapshots de outro mês), o
+    manifesto gravado é aceito como está.
+    """
+
+    def __init__(self, root, competencia, source_paths=None):
+        self.directory = os.path.join(root, competencia)
+        self.competencia = competencia
+        self.source_paths = source_paths
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        """Hash das planilhas de entrada (conteúdo) e da competência"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(f"{SNAPSHOT_VERSION}|{self.competencia}".encode('utf-8'))
+            for key, path in sorted(self.source_paths.items()):
+                file_hash = content_hash(path) if os.path.exists(path) else 'ausente'
+                digest.update(f"|{key}:{file_hash}".encode('utf-8'))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def manifest_path(self):
+        return os.path.join(self.directory, SNAPSHOT_MANIFEST)
+
+    def read_manifest(self):
+        """Manifesto atual, descartado se as entradas mudaram"""
+        try:
+            with open(self.manifest_path(), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        if self.source_paths is None:
+            return manifest if 'stages' in manifest else {'fingerprint': None, 'stages': {}}
+        if manifest.get('fingerprint') != self.fingerprint:
+            return {'fingerprint': self.fingerprint, 'stages': {}}
+        return manifest
+
+    def write_manifest(self, manifest):
+        with open(self.manifest_path(), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    def stage_files(self, stage, frames):
+        return {name: os.path.join(self.directory, stage, f"{name}.arrow") for name in frames}
+
+    def save(self, stage, frames):
+        """Grava os DataFrames da etapa ({nome: DataFrame}); entradas None são ignoradas"""
+        import pyarrow.feather as feather
+
+        frames = {name: df for name, df in frames.items() if df is not None}
+        os.makedirs(os.path.join(self.directory, stage), exist_ok=True)
+        for name, path in self.stage_files(stage, frames).items():
+            feather.write_feather(to_arrow_table(frames[name]), path)
+
+        # Uma etapa regravada invalida as seguintes
+        manifest = self.read_manifest()
+        for later in STAGES[STAGES.index(stage) + 1:]:
+            manifest['stages'].pop(later, None)
+        manifest['stages'][stage] = {
+            'frames': sorted(frames),
+            'rows': {name: len(df) for name, df in frames.items()},
+            'created_at': datetime.now().isoformat(timespec='seconds')
+        }
+        self.write_manifest(manifest)
+
+    def load(self, stage):
+        """Lê os DataFrames da etapa, ou None se não houver snapshot válido"""
+        import pyarrow.feather as feather
+
+        saved = self.read_manifest()['stages'].get(stage)
+        if saved is None:
+            return None
+        paths = self.stage_files(stage, saved['frames'])
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+        return {
+            name: feather.read_table(path, memory_map=True).to_pandas()
+            for name, path in paths.items()
+        }
+
+    def last_valid(self):
+        """Última etapa com snapshot válido, considerando que todas as anteriores também o sejam"""
+        stages = self.read_manifest()['stages']
+        last = None
+        for stage in STAGES:
+            if stage not in stages:
+                break
+            last = stage
+        return last
@@ -2,33 +2,74 @@
 Processador de dados Excel para automação de VR/VA
 """
 
+import logging
 import pandas as pd
 import os
+import time
 from datetime import datetime, timedelta
 import numpy as np
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
+from excel_loader import files_for_competencia, load_workbooks
+from money import VRTotals
+from lazy_imports import pure_data_mode, report_import_times, timed_import
+from absence_intervals import build_absence_intervals, full_period_absences
+from business_calendar import get_calendar
+from eligibility import MOTIVO_COLUMN, build_exclusion_index, split_eligible
+from output_writer import write_vr_outputs
+from run_logging import event, get_logger, log_frame
+from sindicato_index import SindicatoIndex
+from proration import EXCLUIDO_COLUMN, apply_proration
+from vr_engine import calculate_vr_frame, calculate_working_days, coalesce_columns
+
+logger = get_logger('processador')
 
 class VRDataProcessor:
-    def __init__(self):
+    def __init__(self, pure_data=None, competencia=None, data_dir='data', output_dir='output',
+                 load_workers=None):
+        start = time.perf_counter()
         load_dotenv()
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         self.model_name = os.getenv('MODEL_NAME', 'gpt-4o-mini')
         
-        # Inicializar LLM
-        self.llm = ChatOpenAI(
-            model_name=self.model_name,
-            temperature=0,
-            openai_api_key=self.openai_api_key
-        )
+        # Calendário de dias úteis da competência (compartilhado por mês)
+        self.competencia = competencia or os.getenv('COMPETENCIA', '2025-05')
+        self.calendar = get_calendar(self.competencia)
+        
+        # Planilhas e diretórios da competência
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self.load_workers = load_workers
+        self.files = files_for_competencia(self.competencia, data_dir)
+        
+        # LLM criado apenas quando usado (modo só dados nunca importa langchain)
+        self.pure_data = pure_data_mode() if pure_data is None else pure_data
+        self._llm = None
         
         # Dicionários para armazenar dados
         self.data = {}
         self.final_data = None
+        self.totals = None
+        self.vr_cents = None
+        self.excluded = pd.DataFrame()
         
         # Carregar prompt personalizado
         self.load_custom_prompt()
+        
+        self.startup_time = time.perf_counter() - start
+    
+    @property
+    def llm(self):
+        """Cliente ChatOpenAI, inicializado (e langchain importado) no primeiro acesso"""
+        if self.pure_data:
+            return None
+        if self._llm is None:
+            ChatOpenAI = timed_import('langchain_openai').ChatOpenAI
+            self._llm = ChatOpenAI(
+                model_name=self.model_name,
+                temperature=0,
+                openai_api_key=self.openai_api_key
+            )
+        return self._llm
     
     def load_custom_prompt(self):
         """Carrega o prompt personalizado do arquivo"""
@@ -36,169 +77,124 @@ class VRDataProcessor:
             prompt_path = os.path.join('data', 'prompt.md')
             with open(prompt_path, 'r', encoding='utf-8') as f:
                 self.custom_prompt = f.read()
-            print("Prompt personalizado carregado com sucesso.")
+            event(logger, logging.DEBUG, "Prompt personalizado carregado", caracteres=len(self.custom_prompt))
         except Exception as e:
-            print(f"Erro ao carregar prompt: {str(e)}")
+            event(logger, logging.WARNING, "Erro ao carregar prompt", erro=str(e))
             self.custom_prompt = ""
     
+    def output_paths(self):
+        """Caminhos da planilha final (xlsx) e do CSV da competência"""
+        period = pd.Period(self.competencia, freq='M')
+        name = f"VR_Mensal_{period.month:02d}_{period.year}_Gerado"
+        return (os.path.join(self.output_dir, f"{name}.xlsx"),
+                os.path.join(self.output_dir, f"{name}.csv"))
+    
     def load_excel_files(self):
-        """Carrega todos os arquivos Excel necessários"""
-        files_to_load = {
-            'ativos': 'ATIVOS.xlsx',
-            'ferias': 'FÉRIAS.xlsx',
-            'desligados': 'DESLIGADOS.xlsx',
-            'admissao': 'ADMISSÃOABRIL.xlsx',
-            'afastamentos': 'AFASTAMENTOS.xlsx',
-            'aprendiz': 'APRENDIZ.xlsx',
-            'estagio': 'ESTÁGIO.xlsx',
-            'exterior': 'EXTERIOR.xlsx',
-            'base_sindicato': 'Basesindicatoxvalor.xlsx',
-            'base_dias_uteis': 'Basediasuteis.xlsx',
-            'vr_mensal': 'VRMENSAL05.2025.xlsx',
-            'vr_final_ref': 'VR_Mensal_05.2025_Final27ago.xlsx'
-        }
-        
-        for key, filename in files_to_load.items():
-            try:
-                file_path = os.path.join('data', filename)
-                
-                # Tratamento especial para base_dias_uteis (pular primeira linha)
-                if key == 'base_dias_uteis':
-                    df = pd.read_excel(file_path, skiprows=1)
-                else:
-                    df = pd.read_excel(file_path)
-                
-                self.data[key] = df
-                print(f"Arquivo {filename} carregado: {len(df)} registros")
-                
-                # Mostrar colunas para debug
-                print(f"Colunas de {key}: {list(df.columns)}")
-                print("---")
-                
-            except Exception as e:
-                print(f"Erro ao carregar {filename}: {str(e)}")
-                self.data[key] = pd.DataFrame()
+        """Carrega todos os arquivos Excel necessários (em paralelo, com cache)"""
+        self.data = load_workbooks(self.files, data_dir=self.data_dir, max_workers=self.load_workers)
+        
+        # Colunas de cada planilha apenas no modo detalhado (VR_VERBOSE=1)
+        for key, df in self.data.items():
+            event(logger, logging.DEBUG, "Colunas da planilha", planilha=key, colunas=[str(col) for col in df.columns])
     
     def analyze_data_structure(self):
         """Analisa a estrutura dos dados carregados"""
-        print("\\n=== ANÁLISE DA ESTRUTURA DOS DADOS ===\\n")
-        
+        # Registros, colunas e memória de cada planilha; amostra só no modo detalhado
         for key, df in self.data.items():
             if not df.empty:
-                print(f"\\n{key.upper()}:")
-                print(f"  Registros: {len(df)}")
-                print(f"  Colunas: {list(df.columns)}")
-                
-                # Mostrar algumas linhas de exemplo
-                if len(df) > 0:
-                    print(f"  Exemplo (primeiras 2 linhas):")
-                    print(df.head(2).to_string(index=False))
-                print("-" * 50)
+                log_frame(logger, f"Planilha {key}", df, level=logging.DEBUG)
     
     def get_eligible_employees(self):
         """Identifica colaboradores elegíveis ao VR"""
         if 'ativos' not in self.data or self.data['ativos'].empty:
-            print("Dados de colaboradores ativos não encontrados.")
+            event(logger, logging.WARNING, "Dados de colaboradores ativos não encontrados")
             return pd.DataFrame()
         
         # Começar com colaboradores ativos
-        eligible = self.data['ativos'].copy()
-        print(f"Colaboradores ativos iniciais: {len(eligible)}")
-        
-        # Remover exclusões baseadas em matrícula
-        exclusions = []
-        
-        # Adicionar matrículas de exclusão
-        for exclusion_type in ['aprendiz', 'estagio', 'afastamentos', 'exterior']:
-            if exclusion_type in self.data and not self.data[exclusion_type].empty:
-                df_exclusion = self.data[exclusion_type]
-                # Tentar diferentes nomes de coluna para matrícula
-                matricula_col = None
-                for col in df_exclusion.columns:
-                    if 'matricula' in col.lower() or 'matrícula' in col.lower():
-                        matricula_col = col
-                        break
-                
-                if matricula_col:
-                    exclusions.extend(df_exclusion[matricula_col].tolist())
-                    print(f"Exclusões de {exclusion_type}: {len(df_exclusion)} registros")
-        
-        # Aplicar exclusões
-        if exclusions:
-            # Encontrar coluna de matrícula nos ativos
-            matricula_col_ativos = None
-            for col in eligible.columns:
-                if 'matricula' in col.lower() or 'matrícula' in col.lower():
-                    matricula_col_ativos = col
-                    break
-            
-            if matricula_col_ativos:
-                before_exclusion = len(eligible)
-                eligible = eligible[~eligible[matricula_col_ativos].isin(exclusions)]
-                print(f"Após exclusões: {len(eligible)} (removidos: {before_exclusion - len(eligible)})")
+        ativos = self.data['ativos']
+        event(logger, logging.INFO, "Colaboradores ativos", linhas=len(ativos))
+        
+        # Índice único de exclusões por matrícula (afastados: competência inteira;
+        # afastamentos parciais são descontados em dias úteis)
+        exclusion_index = build_exclusion_index(
+            self.data,
+            afastados=full_period_absences(self.data.get('afastamentos'), self.calendar)
+        )
+        
+        # Aplicar exclusões anotando o motivo de cada colaborador
+        eligible, self.excluded = split_eligible(ativos, exclusion_index)
+        event(logger, logging.INFO, "Colaboradores elegíveis", linhas=len(eligible), excluidos=len(self.excluded),
+              motivos=self.excluded[MOTIVO_COLUMN].value_counts()[lambda c: c > 0].to_dict())
         
         return eligible
     
-    def calculate_working_days(self, employee_data):
-        """Calcula dias úteis para um colaborador"""
-        # Esta é uma implementação simplificada
-        # Na versão completa, consideraria sindicato, férias, afastamentos, etc.
-        
-        # Assumir 22 dias úteis por mês como padrão
-        working_days = 22
+    def calculate_working_days(self, employee_data, sindicato_index=None):
+        """Calcula dias úteis de todos os colaboradores pelo calendário da competência"""
+        # Feriados nacionais, estaduais e municipais do sindicato de cada colaborador,
+        # considerando admissão, desligamento (regra do dia 15), férias e afastamentos
+        sindicato = coalesce_columns(employee_data, ['SINDICATO'], 'PADRÃO')
+        admissao = coalesce_columns(employee_data, ['Admissão', 'ADMISSAO'], pd.NaT)
+        desligamento = coalesce_columns(employee_data, ['DATA DEMISSÃO', 'DATA DEMISSAO'], pd.NaT)
+        
+        # Férias e afastamentos como intervalos unidos por matrícula
+        absences = build_absence_intervals(
+            self.data.get('ferias'),
+            self.data.get('afastamentos'),
+            self.calendar
+        )
         
-        # Ajustar baseado em dados específicos se disponível
-        return working_days
+        working_days = calculate_working_days(
+            self.calendar,
+            sindicato,
+            admissao=admissao,
+            desligamento=desligamento,
+            base_days=sindicato_index.lookup(sindicato)['dias'] if sindicato_index is not None else None,
+            matriculas=coalesce_columns(employee_data, ['MATRICULA'], None),
+            absences=absences,
+            excluded=employee_data.get(EXCLUIDO_COLUMN)
+        )
+        return pd.Series(working_days, index=employee_data.index)
     
     def calculate_vr_values(self, eligible_employees):
         """Calcula valores de VR para colaboradores elegíveis"""
         if eligible_employees.empty:
+            self.vr_cents = None
             return pd.DataFrame()
         
-        # Preparar dados para cálculo
-        result_data = []
-        
-        for index, employee in eligible_employees.iterrows():
-            # Extrair dados básicos
-            matricula = employee.get('MATRICULA', employee.get('Matrícula', 'N/A'))
-            nome = employee.get('NOME', employee.get('Nome', 'N/A'))
-            sindicato = employee.get('SINDICATO', employee.get('Sindicato', 'PADRÃO'))
-            
-            # Calcular dias úteis
-            dias_uteis = self.calculate_working_days(employee)
-            
-            # Valor padrão do VR (será ajustado baseado no sindicato)
-            valor_vr_diario = 30.00  # Valor exemplo
-            
-            # Buscar valor específico do sindicato se disponível
-            if 'base_sindicato' in self.data and not self.data['base_sindicato'].empty:
-                sindicato_data = self.data['base_sindicato']
-                sindicato_row = sindicato_data[sindicato_data['SINDICATO'] == sindicato]
-                if not sindicato_row.empty:
-                    valor_vr_diario = sindicato_row.iloc[0].get('VALOR', valor_vr_diario)
-            
-            # Calcular valores
-            valor_total = dias_uteis * valor_vr_diario
-            valor_empresa = valor_total * 0.80  # 80% empresa
-            valor_desconto = valor_total * 0.20  # 20% colaborador
-            
-            result_data.append({
-                'Matrícula': matricula,
-                'Nome': nome,
-                'Sindicato': sindicato,
-                'Dias Úteis': dias_uteis,
-                'Valor do VR': valor_vr_diario,
-                'Valor Total': valor_total,
-                'Valor Empresa (80%)': valor_empresa,
-                'Valor Descontado (20%)': valor_desconto,
-                'Status': 'ATIVO'
-            })
-        
-        return pd.DataFrame(result_data)
+        # Dimensão de sindicatos (valor e dias úteis por id, qualquer grafia do nome)
+        sindicato_index = SindicatoIndex.from_sources(self.data)
+        
+        # Admissões e desligamentos (regra do dia 15) juntados por matrícula
+        eligible_employees = apply_proration(
+            eligible_employees,
+            self.data.get('admissao'),
+            self.data.get('desligados'),
+            self.calendar,
+            matricula_columns=('MATRICULA',)
+        )
+        
+        # Calcular dias úteis e valores de todos os colaboradores de uma vez
+        eligible_employees['DIAS UTEIS CALCULADOS'] = self.calculate_working_days(eligible_employees, sindicato_index)
+        
+        # Centavos int64 do motor guardados para os totais (VRTotals)
+        final_result, self.vr_cents = calculate_vr_frame(
+            eligible_employees,
+            {},
+            {},
+            matricula_columns=('MATRICULA',),
+            nome_columns=('NOME', 'Nome'),
+            sindicato_columns=('SINDICATO',),
+            dias_column='DIAS UTEIS CALCULADOS',
+            default_valor=30.00,
+            default_status='ATIVO',
+            sindicato_index=sindicato_index,
+            with_cents=True
+        )
+        return final_result
     
     def process_data(self):
         """Processa todos os dados e gera planilha final"""
-        print("\\n=== INICIANDO PROCESSAMENTO DE DADOS ===\\n")
+        event(logger, logging.INFO, "Iniciando processamento de dados", competencia=self.competencia)
         
         # Carregar arquivos
         self.load_excel_files()
@@ -210,23 +206,20 @@ class VRDataProcessor:
         eligible_employees = self.get_eligible_employees()
         
         if eligible_employees.empty:
-            print("Nenhum colaborador elegível encontrado.")
+            event(logger, logging.WARNING, "Nenhum colaborador elegível encontrado")
             return None
         
         # Calcular valores de VR
         final_result = self.calculate_vr_values(eligible_employees)
         
         # Salvar resultado
-        output_path = os.path.join('output', 'VR_Mensal_05_2025_Gerado.xlsx')
-        os.makedirs('output', exist_ok=True)
-        
-        final_result.to_excel(output_path, index=False)
-        print(f"\\nPlanilha final salva em: {output_path}")
-        print(f"Total de colaboradores processados: {len(final_result)}")
+        output_path, _ = self.output_paths()
+        write_vr_outputs(final_result, output_path)
+        event(logger, logging.INFO, "Planilha final salva", xlsx=output_path)
         
-        # Mostrar resumo
-        print("\\n=== RESUMO DOS RESULTADOS ===")
-        print(final_result.to_string(index=False))
+        # Resumo compacto (amostra das linhas só com VR_VERBOSE=1)
+        log_frame(logger, "Planilha final", final_result)
+        self.totals = VRTotals.from_frame(final_result, self.vr_cents)
         
         self.final_data = final_result
         return final_result
@@ -239,6 +232,7 @@ def main():
     if result is not None:
         print("\\nProcessamento concluído com sucesso!")
         print(f"Modelo LLM utilizado: {processor.model_name}")
+        report_import_times({'VRDataProcessor': processor.startup_time})
     else:
         print("\\nFalha no processamento dos dados.")
 
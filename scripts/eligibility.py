@@ -0,0 +1,105 @@
+"""
+Índice de exclusões e motivo de inelegibilidade por colaborador
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import numpy as np
+import pandas as pd
+
+from column_resolver import CARGO_COLUMN, MATRICULA_COLUMN, normalize_matricula, source_matricula_column
+
+# Motivos de exclusão, em ordem de prioridade
+EXCLUSION_REASONS = ['diretor', 'estagiario', 'aprendiz', 'afastado', 'exterior']
+
+# Planilha de origem de cada motivo
+EXCLUSION_SOURCES = {
+    'estagio': 'estagiario',
+    'aprendiz': 'aprendiz',
+    'exterior': 'exterior'
+}
+
+MOTIVO_COLUMN = 'MOTIVO EXCLUSAO'
+
+
+def exterior_returned(df):
+    """Marca quem já retornou do exterior (ex.: 'RETORNOU DO EXTERIOR - devido o pgto')"""
+    returned = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        if df[col].dtype == object:
+            returned |= df[col].astype(str).str.upper().str.contains('RETORN', na=False).to_numpy()
+    return returned
+
+
+def build_exclusion_index(data, afastados=None):
+    """
+    Monta o índice de exclusões: matrícula (inteira) -> motivo.
+
+    Todas as planilhas de exclusão são concatenadas uma única vez; quando a
+    mesma matrícula aparece em mais de uma, vale o motivo de maior
+    prioridade. Afastados são as matrículas informadas em afastados (ex.:
+    afastamento que cobre a competência inteira).
+    """
+    frames = []
+    for key, reason in EXCLUSION_SOURCES.items():
+        df = data.get(key)
+        if df is None or df.empty:
+            continue
+        matricula_col = source_matricula_column(key, df)
+        if matricula_col is None:
+            continue
+        keep = ~exterior_returned(df) if key == 'exterior' else np.ones(len(df), dtype=bool)
+        frames.append(pd.DataFrame({
+            'matricula': normalize_matricula(df[matricula_col]).to_numpy()[keep],
+            'motivo': reason
+        }))
+
+    if afastados is not None and len(afastados):
+        frames.append(pd.DataFrame({
+            'matricula': normalize_matricula(afastados).to_numpy(),
+            'motivo': 'afastado'
+        }))
+
+    if not frames:
+        return pd.Series([], index=pd.Index([], dtype='Int64', name='matricula'),
+                         dtype=pd.CategoricalDtype(EXCLUSION_REASONS))
+
+    exclusions = pd.concat(frames, ignore_index=True).dropna(subset=['matricula'])
+    exclusions['motivo'] = pd.Categorical(exclusions['motivo'], categories=EXCLUSION_REASONS, ordered=True)
+    exclusions = exclusions.sort_values('motivo', kind='mergesort').drop_duplicates('matricula')
+    return exclusions.set_index('matricula')['motivo']
+
+
+def exclusion_reasons(employees, index, matricula_column=None, cargo_column=None):
+    """
+    Resolve o motivo de exclusão de cada colaborador (NaN para elegíveis).
+
+    A matrícula é procurada no índice por hash (reindex) e diretores são
+    identificados pelo título do cargo, tudo em uma única passada.
+    """
+    matricula_column = matricula_column or (MATRICULA_COLUMN if MATRICULA_COLUMN in employees.columns else None)
+    if matricula_column is None:
+        return pd.Series(pd.Categorical([np.nan] * len(employees), categories=EXCLUSION_REASONS, ordered=True),
+                         index=employees.index)
+
+    matriculas = normalize_matricula(employees[matricula_column])
+    reasons = pd.Series(
+        pd.Categorical(index.reindex(matriculas.to_numpy()).to_numpy(),
+                       categories=EXCLUSION_REASONS, ordered=True),
+        index=employees.index
+    )
+
+    cargo_column = cargo_column or (CARGO_COLUMN if CARGO_COLUMN in employees.columns else None)
+    if cargo_column is not None:
+        diretor = employees[cargo_column].astype(str).str.upper().str.contains('DIRETOR', na=False)
+        reasons = reasons.mask(diretor, 'diretor')
+
+    return reasons
+
+
+def split_eligible(employees, index, matricula_column=None, cargo_column=None):
+    """Separa elegíveis e excluídos, anotando o motivo na coluna MOTIVO EXCLUSAO"""
+    annotated = employees.copy()
+    annotated[MOTIVO_COLUMN] = exclusion_reasons(annotated, index, matricula_column, cargo_column)
+    excluded = annotated[MOTIVO_COLUMN].notna()
+    return annotated[~excluded], annotated[excluded]
@@ -0,0 +1,147 @@
+"""
+Cache em disco de embeddings por hash de chunk
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def chunk_hash(text):
+    """Hash estável do conteúdo de um chunk"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_ids(texts):
+    """
+    Ids de documento derivados do conteúdo dos chunks.
+
+    Chunks idênticos recebem um sufixo de ocorrência para que os ids sejam
+    únicos e estáveis entre revisões do documento.
+    """
+    seen = {}
+    ids = []
+    for text in texts:
+        digest = chunk_hash(text)
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+
+class EmbeddingCache:
+    """Vetores float32 em SQLite, indexados por (modelo, hash do chunk)"""
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, chunk_hash)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def get_many(self, hashes):
+        """Retorna {hash: vetor} para os hashes já presentes no cache"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        # Consultas em lotes para respeitar o limite de parâmetros do SQLite
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.connection.execute(
+                f"SELECT chunk_hash, vector FROM embeddings "
+                f"WHERE model = ? AND chunk_hash IN ({placeholders})",
+                [self.model, *batch]
+            )
+            for digest, blob in rows:
+                found[digest] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items):
+        """Grava pares (hash, vetor) no cache"""
+        rows = [
+            (self.model, digest, len(vector), np.asarray(vector, dtype=np.float32).tobytes())
+            for digest, vector in items
+        ]
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, chunk_hash, dim, vector) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings que consultam o cache antes do provedor.
+
+    Apenas chunks novos ou alterados chegam ao modelo de embeddings; os
+    demais saem do SQLite. As perguntas recentes ficam em memória: o cache
+    de respostas e a busca vetorial da mesma pergunta usam um único
+    embedding. Contadores de acertos e chamadas ficam em stats.
+    """
+
+    def __init__(self, base, cache, query_memo_size=64):
+        self.base = base
+        self.cache = cache
+        self.stats = {'hits': 0, 'misses': 0, 'embedded_calls': 0, 'query_hits': 0, 'query_calls': 0}
+        self.query_memo_size = query_memo_size
+        self.query_memo = OrderedDict()
+        # embed_query também roda em threads (aembed_query usa o executor padrão)
+        self.query_lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        hashes = [chunk_hash(text) for text in texts]
+        cached = self.cache.get_many(hashes)
+
+        missing = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in cached and digest not in missing:
+                missing[digest] = text
+
+        self.stats['hits'] += sum(1 for digest in hashes if digest in cached)
+        self.stats['misses'] += len(missing)
+
+        if missing:
+            vectors = self.base.embed_documents(list(missing.values()))
+            self.stats['embedded_calls'] += 1
+            new_items = list(zip(missing.keys(), vectors))
+            self.cache.put_many(new_items)
+            cached.update({digest: np.asarray(vector, dtype=np.float32) for digest, vector in new_items})
+
+        return [cached[digest].tolist() for digest in hashes]
+
+    def embed_query(self, text):
+        with self.query_lock:
+            vector = self.query_memo.get(text)
+            if vector is not None:
+                self.query_memo.move_to_end(text)
+                self.stats['query_hits'] += 1
+                return list(vector)
+
+        vector = self.base.embed_query(text)
+        with self.query_lock:
+            self.stats['query_calls'] += 1
+            self.query_memo[text] = tuple(vector)
+            while len(self.query_memo) > self.query_memo_size:
+                self.query_memo.popitem(last=False)
+        return vector
@@ -0,0 +1,354 @@
+"""
+Carregamento paralelo e com cache das planilhas de entrada
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    from pyarrow import ArrowException
+except ImportError:
+    ArrowException = ValueError
+
+from column_resolver import SOURCE_COLUMNS, header_of, header_signature, rename_columns, resolve_columns
+from run_logging import event, get_logger
+from source_schema import SOURCE_SCHEMAS, apply_schema, memory_mb, schema_enabled
+
+logger = get_logger('excel_loader')
+
+# Planilhas de entrada da competência
+FILES_TO_LOAD = {
+    'ativos': 'ATIVOS.xlsx',
+    'ferias': 'FÉRIAS.xlsx',
+    'desligados': 'DESLIGADOS.xlsx',
+    'admissao': 'ADMISSÃOABRIL.xlsx',
+    'afastamentos': 'AFASTAMENTOS.xlsx',
+    'aprendiz': 'APRENDIZ.xlsx',
+    'estagio': 'ESTÁGIO.xlsx',
+    'exterior': 'EXTERIOR.xlsx',
+    'base_sindicato': 'Basesindicatoxvalor.xlsx',
+    'base_dias_uteis': 'Basediasuteis.xlsx',
+    'vr_mensal': 'VRMENSAL05.2025.xlsx',
+    'vr_final_ref': 'VR_Mensal_05.2025_Final27ago.xlsx'
+}
+
+# Opções de leitura específicas (base_dias_uteis e vr_mensal: título acima do cabeçalho)
+READ_OPTIONS = {
+    'base_dias_uteis': {'skiprows': 1},
+    'vr_mensal': {'header': 1}
+}
+
+# Meses por extenso (nome da planilha de admissões do mês anterior, ex.: ADMISSÃOABRIL)
+MESES = [
+    'JANEIRO', 'FEVEREIRO', 'MARÇO', 'ABRIL', 'MAIO', 'JUNHO',
+    'JULHO', 'AGOSTO', 'SETEMBRO', 'OUTUBRO', 'NOVEMBRO', 'DEZEMBRO'
+]
+
+CACHE_DIR_NAME = '.cache'
+CACHE_VERSION = 1
+COLUMN_MAPS_NAME = 'columns.json'
+
+
+def files_for_competencia(competencia, data_dir='data'):
+    """
+    Nomes das planilhas de entrada de uma competência (AAAA-MM).
+
+    Admissões vêm do mês anterior (ADMISSÃOABRIL para 2025-05); a planilha
+    de referência final é procurada por prefixo, pois o sufixo traz a data
+    de fechamento (ex.: VR_Mensal_05.2025_Final27ago.xlsx).
+    """
+    period = pd.Period(competencia, freq='M')
+    files = dict(FILES_TO_LOAD)
+    files['admissao'] = f"ADMISSÃO{MESES[(period - 1).month - 1]}.xlsx"
+    files['vr_mensal'] = f"VRMENSAL{period.month:02d}.{period.year}.xlsx"
+
+    references = sorted(glob.glob(os.path.join(data_dir, f"VR_Mensal_{period.month:02d}.{period.year}_Final*.xlsx")))
+    files['vr_final_ref'] = (os.path.basename(references[-1]) if references
+                             else f"VR_Mensal_{period.month:02d}.{period.year}_Final.xlsx")
+    return files
+
+
+def cache_enabled():
+    """Indica se o cache colunar está habilitado (EXCEL_CACHE=0 desabilita)"""
+    if os.getenv('EXCEL_CACHE', '1') == '0':
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def content_hash(file_path, block_size=1 << 20):
+    """Calcula o SHA-256 do conteúdo do arquivo"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(file_path):
+    """Retorna os caminhos do Parquet, do pickle e dos metadados de cache de uma planilha"""
+    directory, filename = os.path.split(file_path)
+    cache_dir = os.path.join(directory, CACHE_DIR_NAME)
+    return (os.path.join(cache_dir, filename + '.parquet'),
+            os.path.join(cache_dir, filename + '.pkl'),
+            os.path.join(cache_dir, filename + '.json'))
+
+
+@contextmanager
+def atomic_target(path):
+    """
+    Caminho temporário no diretório de path, publicado com os.replace ao final.
+
+    Processos do lote que compartilham data/ nunca leem um arquivo de cache
+    pela metade; em caso de erro o temporário é removido e path fica intacto.
+    """
+    directory, filename = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix='.tmp', dir=directory or '.')
+    os.close(fd)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_json(path, payload, **kwargs):
+    """Grava JSON atomicamente (atomic_target)"""
+    with atomic_target(path) as temp_path:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, **kwargs)
+
+
+def read_cache(file_path, read_kwargs):
+    """
+    Lê a planilha do cache colunar se a fonte não mudou.
+
+    Tamanho e mtime iguais validam o cache sem ler a fonte; se só o mtime
+    mudou, o hash do conteúdo decide (e os metadados são atualizados).
+    """
+    parquet_path, pickle_path, meta_path = cache_paths(file_path)
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('version') != CACHE_VERSION or meta.get('read_kwargs') != read_kwargs:
+        return None
+
+    stat = os.stat(file_path)
+    if meta.get('size') != stat.st_size:
+        return None
+
+    if meta.get('mtime_ns') != stat.st_mtime_ns:
+        if meta.get('sha256') != content_hash(file_path):
+            return None
+        meta['mtime_ns'] = stat.st_mtime_ns
+        write_json(meta_path, meta)
+
+    try:
+        if meta.get('format') == 'pickle':
+            df = pd.read_pickle(pickle_path)
+        else:
+            df = pd.read_parquet(parquet_path)
+    except Exception:
+        return None
+    df.columns = meta.get('columns', list(df.columns))
+    return df
+
+
+def write_cache(file_path, df, read_kwargs):
+    """Grava a planilha no cache colunar junto com a chave (tamanho, mtime, hash)"""
+    parquet_path, pickle_path, meta_path = cache_paths(file_path)
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+
+    stat = os.stat(file_path)
+    meta = {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': content_hash(file_path),
+        'read_kwargs': read_kwargs,
+        'columns': list(df.columns),
+        'format': 'parquet'
+    }
+
+    # Parquet exige nomes de coluna em texto; os originais ficam nos metadados
+    stored = df.copy()
+    stored.columns = [str(col) for col in df.columns]
+    # Dados antes dos metadados, cada um publicado atomicamente
+    try:
+        with atomic_target(parquet_path) as temp_path:
+            stored.to_parquet(temp_path, index=False)
+    except (ValueError, TypeError, ImportError, ArrowException):
+        # Colunas com tipos mistos não têm representação colunar: usar pickle
+        with atomic_target(pickle_path) as temp_path:
+            stored.to_pickle(temp_path)
+        meta['format'] = 'pickle'
+    write_json(meta_path, meta, default=str)
+
+
+def column_maps_path(data_dir):
+    """Arquivo com os mapas de colunas já resolvidos, por assinatura de cabeçalho"""
+    return os.path.join(data_dir, CACHE_DIR_NAME, COLUMN_MAPS_NAME)
+
+
+def read_column_maps(path):
+    """Mapas de colunas salvos ({assinatura: nome canônico ou None por coluna})"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def map_source_columns(data, data_dir='data', persist=True):
+    """
+    Renomeia as colunas de cada planilha para os nomes canônicos (SOURCE_COLUMNS).
+
+    A resolução (nomes sem acentos e palavras-chave) roda uma vez por
+    cabeçalho: o resultado fica salvo pela assinatura do cabeçalho e
+    planilhas novas com o mesmo cabeçalho só aplicam o mapa salvo.
+    """
+    path = column_maps_path(data_dir)
+    maps = read_column_maps(path)
+    resolved_keys = []
+
+    mapped = {}
+    for key, df in data.items():
+        if df is None or df.empty or key not in SOURCE_COLUMNS:
+            mapped[key] = df
+            continue
+        header = header_of(df)
+        signature = header_signature(key, header)
+        resolved = maps.get(signature)
+        if resolved is None or len(resolved) != len(header):
+            resolved = maps[signature] = resolve_columns(key, header)
+            resolved_keys.append(key)
+        mapped[key] = rename_columns(df, resolved)
+
+    if resolved_keys:
+        event(logger, logging.DEBUG, "Colunas resolvidas", planilhas=resolved_keys)
+        if persist:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                write_json(path, maps, ensure_ascii=False)
+            except OSError as e:
+                event(logger, logging.WARNING, "Mapa de colunas não gravado", erro=str(e))
+    return mapped
+
+
+def parse_workbook(file_path, read_kwargs, use_cache):
+    """Lê a planilha com openpyxl e atualiza o cache (executado nos processos do pool)"""
+    df = pd.read_excel(file_path, **read_kwargs)
+    if use_cache:
+        try:
+            write_cache(file_path, df, read_kwargs)
+        except Exception as e:
+            event(logger, logging.WARNING, "Cache não gravado", arquivo=os.path.basename(file_path), erro=str(e))
+    return df
+
+
+def load_workbooks(files=None, data_dir='data', read_options=None,
+                   max_workers=None, use_cache=None, schemas=None):
+    """
+    Carrega as planilhas em paralelo, reaproveitando o cache colunar.
+
+    Planilhas inalteradas são lidas do Parquet; apenas as novas ou editadas
+    são interpretadas pelo openpyxl, em um pool de processos. Em seguida
+    as colunas recebem os nomes canônicos (SOURCE_COLUMNS) e cada planilha
+    recebe os tipos do seu esquema (SOURCE_SCHEMAS).
+    """
+    files = FILES_TO_LOAD if files is None else files
+    read_options = READ_OPTIONS if read_options is None else read_options
+    use_cache = cache_enabled() if use_cache is None else use_cache
+    if schemas is None:
+        schemas = SOURCE_SCHEMAS if schema_enabled() else {}
+
+    data = {}
+    pending = {}
+    cached_keys = []
+
+    for key, filename in files.items():
+        file_path = os.path.join(data_dir, filename)
+        read_kwargs = dict(read_options.get(key, {}))
+
+        if not os.path.exists(file_path):
+            event(logger, logging.WARNING, "Planilha não encontrada", arquivo=filename)
+            data[key] = pd.DataFrame()
+            continue
+
+        if use_cache:
+            cached = read_cache(file_path, read_kwargs)
+            if cached is not None:
+                data[key] = cached
+                cached_keys.append(key)
+                event(logger, logging.DEBUG, "Planilha carregada do cache", arquivo=filename, linhas=len(cached))
+                continue
+
+        pending[key] = (file_path, read_kwargs)
+
+    if pending:
+        workers = min(len(pending), max_workers or os.cpu_count() or 1)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    key: executor.submit(parse_workbook, file_path, read_kwargs, use_cache)
+                    for key, (file_path, read_kwargs) in pending.items()
+                }
+                for key, future in futures.items():
+                    data[key] = _collect(files[key], future.result)
+        else:
+            for key, (file_path, read_kwargs) in pending.items():
+                data[key] = _collect(
+                    files[key],
+                    lambda: parse_workbook(file_path, read_kwargs, use_cache)
+                )
+
+    event(logger, logging.INFO, "Planilhas carregadas", planilhas=len(files),
+          linhas=sum(len(df) for df in data.values()), do_cache=len(cached_keys))
+
+    # Nomes canônicos: nenhuma etapa seguinte precisa procurar colunas por aproximação
+    data = map_source_columns(data, data_dir, persist=use_cache)
+
+    # Tipos compactos por planilha e memória ocupada antes/depois
+    if schemas:
+        before = {key: memory_mb(df) for key, df in data.items()} if logger.isEnabledFor(logging.DEBUG) else None
+        data = {key: apply_schema(df, schemas.get(key)) for key, df in data.items()}
+        after = {key: memory_mb(df) for key, df in data.items()}
+        event(logger, logging.INFO, "Memória das planilhas tipadas", total_mb=round(sum(after.values()), 2),
+              **{f"{key}_mb": round(after[key], 2) for key in files if not data[key].empty})
+        if before is not None:
+            event(logger, logging.DEBUG, "Memória das planilhas antes do esquema",
+                  total_mb=round(sum(before.values()), 2))
+
+    # Manter a ordem original das planilhas
+    return {key: data[key] for key in files}
+
+
+def _collect(filename, load):
+    """Executa a leitura e converte falhas em DataFrame vazio"""
+    try:
+        df = load()
+        event(logger, logging.DEBUG, "Planilha carregada", arquivo=filename, linhas=len(df))
+        return df
+    except Exception as e:
+        event(logger, logging.ERROR, "Erro ao carregar planilha", arquivo=filename, erro=str(e))
+        return pd.DataFrame()
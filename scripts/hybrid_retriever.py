@@ -0,0 +1,202 @@
+"""
+Recuperação local: embeddings em CPU, índice BM25 e fusão por RRF
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import os
+import re
+import unicodedata
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from embedding_cache import chunk_hash
+
+# Dimensão dos embeddings locais por hashing
+HASHING_DIMENSIONS = 1024
+
+# Constante k da fusão por posição recíproca (RRF)
+RRF_K = 60
+
+
+def tokenize(text):
+    """Termos em minúsculas e sem acentos (ex.: 'Sindicato', 'dia', '15')"""
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.findall(r'\w+', text)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings locais, determinísticos e sem rede.
+
+    Palavras e trigramas de caracteres são projetados por hash (CRC32) em um
+    vetor de dimensão fixa, com peso log(1 + tf) e norma 1.
+    """
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def features(self, text):
+        tokens = tokenize(text)
+        features = list(tokens)
+        for token in tokens:
+            padded = f"#{token}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return Counter(features)
+
+    def embed_text(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in self.features(text).items():
+            digest = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dimensions] += sign * np.log1p(count)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_text(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_text(text)
+
+
+def local_embeddings():
+    """
+    Modelo de embeddings local (CPU).
+
+    Usa um modelo sentence-transformers quando LOCAL_EMBEDDING_MODEL estiver
+    definido e o pacote instalado; caso contrário, HashingEmbeddings.
+    Retorna (embeddings, nome do modelo) para compor as chaves de cache.
+    """
+    model_name = os.getenv('LOCAL_EMBEDDING_MODEL')
+    if model_name:
+        try:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            return HuggingFaceEmbeddings(model_name=model_name), f"local:{model_name}"
+        except ImportError:
+            print(f"sentence-transformers não instalado; usando embeddings por hashing em vez de {model_name}.")
+    return HashingEmbeddings(), f"local:hashing-{HASHING_DIMENSIONS}"
+
+
+class BM25Index:
+    """Índice léxico BM25 em memória sobre os mesmos chunks do índice vetorial"""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+
+        # Listas invertidas: termo -> (posições dos documentos, frequências)
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(len(self.documents), dtype=np.float32)
+        for position, document in enumerate(self.documents):
+            counts = Counter(tokenize(document.page_content))
+            lengths[position] = sum(counts.values())
+            for term, count in counts.items():
+                postings[term][0].append(position)
+                postings[term][1].append(count)
+
+        n = len(self.documents)
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if n else 0.0
+        self.postings = {
+            term: (np.asarray(positions, dtype=np.int64), np.asarray(freqs, dtype=np.float32))
+            for term, (positions, freqs) in postings.items()
+        }
+        self.idf = {
+            term: float(np.log(1 + (n - len(positions) + 0.5) / (len(positions) + 0.5)))
+            for term, (positions, _) in self.postings.items()
+        }
+
+    def scores(self, query):
+        """Pontuação BM25 de todos os documentos para a consulta"""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        if not self.documents:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / (self.average_length or 1.0))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            positions, freqs = self.postings[term]
+            scores[positions] += self.idf[term] * freqs * (self.k1 + 1) / (freqs + norm[positions])
+        return scores
+
+    def search(self, query, k=4):
+        """Os k documentos de maior pontuação (apenas os que contêm algum termo)"""
+        scores = self.scores(query)
+        if not len(scores):
+            return []
+        top = np.argsort(-scores, kind='stable')[:k]
+        return [self.documents[i] for i in top if scores[i] > 0]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Funde listas ordenadas de documentos por posição recíproca.
+
+    Cada documento soma 1 / (k + posição) em cada lista em que aparece;
+    documentos iguais (mesmo conteúdo) são identificados pelo hash do chunk.
+    """
+    scores = defaultdict(float)
+    documents = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = chunk_hash(document.page_content)
+            scores[key] += 1.0 / (k + rank)
+            documents.setdefault(key, document)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ordered]
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever que combina busca vetorial e BM25 por RRF"""
+
+    vectorstore: object
+    bm25: object
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = RRF_K
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        lexical = self.bm25.search(query, k=self.fetch_k)
+        return reciprocal_rank_fusion([dense, lexical], k=self.rrf_k)[:self.k]
+
+
+class HybridSearch:
+    """
+    Índice vetorial + BM25 sobre os mesmos chunks.
+
+    Expõe as_retriever com a mesma assinatura do vectorstore, para ser
+    usado no lugar dele na cadeia de QA.
+    """
+
+    def __init__(self, vectorstore, documents=None, fetch_k=20):
+        self.vectorstore = vectorstore
+        if documents is None:
+            # Chunks na ordem do índice FAISS
+            documents = [
+                vectorstore.docstore.search(doc_id)
+                for _, doc_id in sorted(vectorstore.index_to_docstore_id.items())
+            ]
+        self.bm25 = BM25Index([doc for doc in documents if isinstance(doc, Document)])
+        self.fetch_k = fetch_k
+
+    def as_retriever(self, search_kwargs=None):
+        search_kwargs = search_kwargs or {}
+        return HybridRetriever(
+            vectorstore=self.vectorstore,
+            bm25=self.bm25,
+            k=search_kwargs.get('k', 4),
+            fetch_k=search_kwargs.get('fetch_k', self.fetch_k)
+        )
@@ -4,32 +4,90 @@ Processador de dados Excel melhorado para automação de VR/VA
 Grupo: Synapse 7 - Desafio 4
 """
 
+import logging
 import pandas as pd
 import os
+import time
 from datetime import datetime, timedelta
 import numpy as np
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from excel_loader import files_for_competencia, load_workbooks
+from money import VRTotals
+from lazy_imports import pure_data_mode, report_import_times, timed_import
+from absence_intervals import build_absence_intervals, full_period_absences
+from columnar_store import STAGES, StageSnapshots, columnar_enabled, resume_enabled, write_parquet_dataset
+from business_calendar import get_calendar
+from column_resolver import find_keyword_column, normalize_matricula
+from instrumentation import Instrumentation
+from incremental import changed_matriculas, incremental_enabled, merge_outputs
+from eligibility import MOTIVO_COLUMN, build_exclusion_index, split_eligible
+from output_writer import write_vr_outputs
+from reconciliation import Reconciliation, reconciliation_enabled
+from run_logging import event, get_logger, log_frame
+from sindicato_index import SindicatoIndex
+from validation import ERRO, validate_all, validation_enabled, violation_counts
+from proration import EXCLUIDO_COLUMN, apply_proration
+from vr_engine import calculate_vr_frame, calculate_working_days, coalesce_columns
+
+logger = get_logger('processador')
 
 class ImprovedVRDataProcessor:
-    def __init__(self):
+    # Colunas de sindicato na ordem de preferência (preferir o mapeado;
+    # SINDICATO é o nome canônico de ATIVOS, Sindicato o da referência final)
+    SINDICATO_COLUMNS = ('Sindicato Mapeado', 'Sindicato_y', 'Sindicato_x', 'Sindicato', 'SINDICATO')
+    
+    def __init__(self, pure_data=None, competencia=None, data_dir='data', output_dir='output',
+                 load_workers=None):
+        start = time.perf_counter()
         load_dotenv()
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         self.model_name = os.getenv('MODEL_NAME', 'gpt-4o-mini')
         
-        # Inicializar LLM
-        self.llm = ChatOpenAI(
-            model_name=self.model_name,
-            temperature=0,
-            openai_api_key=self.openai_api_key
-        )
+        # Calendário de dias úteis da competência (compartilhado por mês)
+        self.competencia = competencia or os.getenv('COMPETENCIA', '2025-05')
+        self.calendar = get_calendar(self.competencia)
+        
+        # Planilhas e diretórios da competência
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self.load_workers = load_workers
+        self.files = files_for_competencia(self.competencia, data_dir)
+        
+        # LLM criado apenas quando usado (modo só dados nunca importa langchain)
+        self.pure_data = pure_data_mode() if pure_data is None else pure_data
+        self._llm = None
         
         # Dicionários para armazenar dados
         self.data = {}
         self.final_data = None
+        self.totals = None
+        self.vr_cents = None
+        self.violations = None
+        self.reconciliations = {}
+        self.excluded = pd.DataFrame()
+        self._sindicato_index = None
+        self.snapshots = None
+        self.resume_from = None
+        self.instrumentation = Instrumentation(self.competencia)
         
         # Carregar prompt personalizado
         self.load_custom_prompt()
+        
+        self.startup_time = time.perf_counter() - start
+    
+    @property
+    def llm(self):
+        """Cliente ChatOpenAI, inicializado (e langchain importado) no primeiro acesso"""
+        if self.pure_data:
+            return None
+        if self._llm is None:
+            ChatOpenAI = timed_import('langchain_openai').ChatOpenAI
+            self._llm = ChatOpenAI(
+                model_name=self.model_name,
+                temperature=0,
+                openai_api_key=self.openai_api_key
+            )
+        return self._llm
     
     def load_custom_prompt(self):
         """Carrega o prompt personalizado do arquivo"""
@@ -37,62 +95,35 @@ class ImprovedVRDataProcessor:
             prompt_path = os.path.join('data', 'prompt.md')
             with open(prompt_path, 'r', encoding='utf-8') as f:
                 self.custom_prompt = f.read()
-            print("Prompt personalizado carregado com sucesso.")
+            event(logger, logging.DEBUG, "Prompt personalizado carregado", caracteres=len(self.custom_prompt))
         except Exception as e:
-            print(f"Erro ao carregar prompt: {str(e)}")
+            event(logger, logging.WARNING, "Erro ao carregar prompt", erro=str(e))
             self.custom_prompt = ""
     
+    def output_paths(self):
+        """Caminhos da planilha final (xlsx) e do CSV da competência"""
+        period = pd.Period(self.competencia, freq='M')
+        name = f"VR_Mensal_{period.month:02d}_{period.year}_Gerado"
+        return (os.path.join(self.output_dir, f"{name}.xlsx"),
+                os.path.join(self.output_dir, f"{name}.csv"))
+    
     def load_excel_files(self):
-        """Carrega todos os arquivos Excel necessários"""
-        files_to_load = {
-            'ativos': 'ATIVOS.xlsx',
-            'ferias': 'FÉRIAS.xlsx',
-            'desligados': 'DESLIGADOS.xlsx',
-            'admissao': 'ADMISSÃOABRIL.xlsx',
-            'afastamentos': 'AFASTAMENTOS.xlsx',
-            'aprendiz': 'APRENDIZ.xlsx',
-            'estagio': 'ESTÁGIO.xlsx',
-            'exterior': 'EXTERIOR.xlsx',
-            'base_sindicato': 'Basesindicatoxvalor.xlsx',
-            'base_dias_uteis': 'Basediasuteis.xlsx',
-            'vr_mensal': 'VRMENSAL05.2025.xlsx',
-            'vr_final_ref': 'VR_Mensal_05.2025_Final27ago.xlsx'
-        }
-        
-        for key, filename in files_to_load.items():
-            try:
-                file_path = os.path.join('data', filename)
-                
-                # Tratamento especial para base_dias_uteis (pular primeira linha)
-                if key == 'base_dias_uteis':
-                    df = pd.read_excel(file_path, skiprows=1)
-                else:
-                    df = pd.read_excel(file_path)
-                
-                self.data[key] = df
-                print(f"Arquivo {filename} carregado: {len(df)} registros")
-                
-            except Exception as e:
-                print(f"Erro ao carregar {filename}: {str(e)}")
-                self.data[key] = pd.DataFrame()
+        """Carrega todos os arquivos Excel necessários (em paralelo, com cache)"""
+        self.data = load_workbooks(self.files, data_dir=self.data_dir, max_workers=self.load_workers)
     
     def find_column(self, df, possible_names):
-        """Encontra uma coluna baseada em possíveis nomes"""
-        for col in df.columns:
-            for name in possible_names:
-                if name.lower() in col.lower():
-                    return col
-        return None
+        """Encontra uma coluna baseada em possíveis nomes (resolução em cache por cabeçalho)"""
+        return find_keyword_column(df, possible_names)
     
     def get_eligible_employees(self):
         """Identifica colaboradores elegíveis ao VR baseado na planilha de referência"""
         # Usar a planilha de referência final como base
         if 'vr_final_ref' not in self.data or self.data['vr_final_ref'].empty:
-            print("Planilha de referência final não encontrada.")
-            return pd.DataFrame()
+            event(logger, logging.INFO, "Planilha de referência final não encontrada; usando ATIVOS com as regras de exclusão")
+            return self.get_eligible_from_ativos()
         
         ref_data = self.data['vr_final_ref'].copy()
-        print(f"Dados de referência carregados: {len(ref_data)} registros")
+        event(logger, logging.DEBUG, "Dados de referência carregados", linhas=len(ref_data))
         
         # Filtrar apenas colaboradores elegíveis
         if 'ELEGIVEL' in ref_data.columns:
@@ -103,30 +134,49 @@ class ImprovedVRDataProcessor:
             # Se não há coluna de elegibilidade, usar todos
             eligible = ref_data.copy()
         
-        print(f"Colaboradores elegíveis encontrados: {len(eligible)}")
+        event(logger, logging.INFO, "Colaboradores elegíveis", origem='referencia', linhas=len(eligible))
         return eligible
     
-    def get_sindicato_values(self):
-        """Obtém valores de VR por sindicato"""
-        sindicato_values = {}
+    def get_eligible_from_ativos(self):
+        """Identifica colaboradores elegíveis a partir de ATIVOS com o índice de exclusões"""
+        if 'ativos' not in self.data or self.data['ativos'].empty:
+            event(logger, logging.WARNING, "Dados de colaboradores ativos não encontrados")
+            return pd.DataFrame()
         
-        if 'base_sindicato' in self.data and not self.data['base_sindicato'].empty:
-            sindicato_data = self.data['base_sindicato']
-            
-            # Encontrar colunas de sindicato e valor
-            sindicato_col = self.find_column(sindicato_data, ['sindicato', 'sindic'])
-            valor_col = self.find_column(sindicato_data, ['valor', 'vr'])
-            
-            if sindicato_col and valor_col:
-                for _, row in sindicato_data.iterrows():
-                    sindicato = row[sindicato_col]
-                    valor = row[valor_col]
-                    if pd.notna(sindicato) and pd.notna(valor):
-                        sindicato_values[sindicato] = float(valor)
-                        
-                print(f"Valores de sindicato carregados: {len(sindicato_values)}")
-            else:
-                print("Colunas de sindicato/valor não encontradas na base de sindicatos")
+        # Índice único de exclusões por matrícula (afastados: competência inteira)
+        exclusion_index = build_exclusion_index(
+            self.data,
+            afastados=full_period_absences(self.data.get('afastamentos'), self.calendar)
+        )
+        eligible, self.excluded = split_eligible(self.data['ativos'], exclusion_index)
+        event(logger, logging.INFO, "Colaboradores excluídos", linhas=len(self.excluded),
+              motivos=self.excluded[MOTIVO_COLUMN].value_counts()[lambda c: c > 0].to_dict())
+        
+        # Sindicato mapeado para o estado (mesmo formato da planilha de referência)
+        if 'SINDICATO' in eligible.columns:
+            sindicatos = eligible['SINDICATO']
+            mapeado = self.sindicato_index().lookup(sindicatos)['Sindicato']
+            eligible = eligible.copy()
+            eligible['Sindicato Mapeado'] = mapeado.where(sindicatos.notna(), None)
+        
+        event(logger, logging.INFO, "Colaboradores elegíveis", origem='ativos', linhas=len(eligible))
+        return eligible
+    
+    def sindicato_index(self):
+        """Dimensão de sindicatos da competência, montada uma vez para as planilhas carregadas"""
+        if self._sindicato_index is None or self._sindicato_index[0] is not self.data:
+            index = SindicatoIndex.from_sources(self.data)
+            event(logger, logging.DEBUG, "Dimensão de sindicatos", sindicatos=len(index),
+                  apelidos=len(index.aliases))
+            self._sindicato_index = (self.data, index)
+        return self._sindicato_index[1]
+    
+    def get_sindicato_values(self, sindicato_index=None):
+        """Obtém valores de VR por sindicato (nome canônico; padrão: dimensão da competência)"""
+        sindicato_index = self.sindicato_index() if sindicato_index is None else sindicato_index
+        sindicato_values = sindicato_index.valores_dict()
+        if sindicato_values:
+            event(logger, logging.DEBUG, "Valores de sindicato carregados", sindicatos=len(sindicato_values))
         
         # Valores padrão se não encontrados
         if not sindicato_values:
@@ -135,37 +185,16 @@ class ImprovedVRDataProcessor:
                 'Rio Grande do Sul': 35.0,
                 'PADRÃO': 30.0
             }
-            print("Usando valores padrão de sindicato")
+            event(logger, logging.WARNING, "Usando valores padrão de sindicato")
         
         return sindicato_values
     
-    def get_dias_uteis_por_sindicato(self):
-        """Obtém dias úteis por sindicato"""
-        dias_uteis = {}
-        
-        if 'base_dias_uteis' in self.data and not self.data['base_dias_uteis'].empty:
-            dias_data = self.data['base_dias_uteis']
-            
-            # Encontrar colunas
-            sindicato_col = self.find_column(dias_data, ['sindicato', 'sindic'])
-            dias_col = self.find_column(dias_data, ['dias', 'uteis'])
-            
-            if sindicato_col and dias_col:
-                for _, row in dias_data.iterrows():
-                    sindicato = row[sindicato_col]
-                    dias = row[dias_col]
-                    if pd.notna(sindicato) and pd.notna(dias):
-                        # Mapear nomes de sindicatos
-                        if 'SP' in str(sindicato).upper():
-                            dias_uteis['São Paulo'] = int(dias)
-                        elif 'RS' in str(sindicato).upper():
-                            dias_uteis['Rio Grande do Sul'] = int(dias)
-                        else:
-                            dias_uteis[str(sindicato)] = int(dias)
-                            
-                print(f"Dias úteis por sindicato: {dias_uteis}")
-            else:
-                print("Colunas de dias úteis não encontradas")
+    def get_dias_uteis_por_sindicato(self, sindicato_index=None):
+        """Obtém dias úteis por sindicato (nome canônico; padrão: dimensão da competência)"""
+        sindicato_index = self.sindicato_index() if sindicato_index is None else sindicato_index
+        dias_uteis = sindicato_index.dias_dict()
+        if dias_uteis:
+            event(logger, logging.DEBUG, "Dias úteis por sindicato", dias=dias_uteis)
         
         # Valores padrão
         if not dias_uteis:
@@ -174,107 +203,342 @@ class ImprovedVRDataProcessor:
                 'Rio Grande do Sul': 21,
                 'PADRÃO': 22
             }
-            print("Usando dias úteis padrão")
+            event(logger, logging.WARNING, "Usando dias úteis padrão")
         
         return dias_uteis
     
-    def process_data_with_reference(self):
+    def calculate_working_days(self, employees, dias_uteis_sindicato, data=None, calendar=None,
+                               sindicato_index=None):
+        """
+        Calcula os dias úteis de cada colaborador pelo calendário da competência.
+        
+        data, calendar e sindicato_index permitem calcular outra competência
+        (a anterior, no recálculo incremental); o padrão é a atual.
+        """
+        data = self.data if data is None else data
+        calendar = self.calendar if calendar is None else calendar
+        sindicato_index = self.sindicato_index() if sindicato_index is None else sindicato_index
+        sindicato = coalesce_columns(employees, self.SINDICATO_COLUMNS, 'PADRÃO')
+        admissao = coalesce_columns(employees, ['Admissão', 'ADMISSAO'], pd.NaT)
+        desligamento = coalesce_columns(employees, ['DATA DEMISSÃO', 'DATA DEMISSAO'], pd.NaT)
+        
+        # Férias e afastamentos como intervalos unidos por matrícula
+        absences = build_absence_intervals(
+            data.get('ferias'),
+            data.get('afastamentos'),
+            calendar
+        )
+        
+        dias = calculate_working_days(
+            calendar,
+            sindicato,
+            admissao=admissao,
+            desligamento=desligamento,
+            base_days=sindicato_index.lookup(sindicato, dias=dias_uteis_sindicato)['dias'],
+            matriculas=coalesce_columns(employees, ['MATRICULA'], None),
+            absences=absences,
+            excluded=employees.get(EXCLUIDO_COLUMN)
+        )
+        return pd.Series(dias, index=employees.index)
+    
+    def prepare_snapshots(self, resume=None):
+        """Configura os snapshots Arrow da competência e a etapa de onde retomar"""
+        self.snapshots = None
+        self.resume_from = None
+        if not columnar_enabled():
+            return
+        
+        source_paths = {key: os.path.join(self.data_dir, name) for key, name in self.files.items()}
+        self.snapshots = StageSnapshots(os.path.join(self.output_dir, 'snapshots'), self.competencia, source_paths)
+        if resume_enabled() if resume is None else resume:
+            self.resume_from = self.snapshots.last_valid()
+            if self.resume_from:
+                event(logger, logging.INFO, "Retomando do snapshot", etapa=self.resume_from, diretorio=self.snapshots.directory)
+            else:
+                event(logger, logging.INFO, "Nenhum snapshot válido para as planilhas atuais; processando do início")
+    
+    def restore_stage(self, stage):
+        """DataFrames da etapa vindos do snapshot, quando a retomada alcança essa etapa"""
+        if self.resume_from is None or STAGES.index(stage) > STAGES.index(self.resume_from):
+            return None
+        return self.snapshots.load(stage)
+    
+    def save_stage(self, stage, frames):
+        """Grava o snapshot Arrow da etapa (se a saída colunar estiver habilitada)"""
+        if self.snapshots is not None:
+            self.snapshots.save(stage, frames)
+    
+    def sindicato_probe(self, sindicatos, data, calendar, sindicato_index, sindicato_values, dias_uteis_sindicato):
+        """
+        Dias úteis e valor diário, por sindicato, de um colaborador sem ocorrências no mês.
+        
+        A competência vem inteira dos argumentos (planilhas, calendário e
+        dimensão de sindicatos), sem depender do estado do processador.
+        """
+        probe = pd.DataFrame({'Sindicato Mapeado': sindicatos, 'MATRICULA': None, EXCLUIDO_COLUMN: False})
+        probe['DIAS UTEIS CALCULADOS'] = self.calculate_working_days(
+            probe, dias_uteis_sindicato, data=data, calendar=calendar, sindicato_index=sindicato_index
+        )
+        result = calculate_vr_frame(
+            probe,
+            sindicato_values,
+            dias_uteis_sindicato,
+            sindicato_columns=self.SINDICATO_COLUMNS,
+            dias_column='DIAS UTEIS CALCULADOS',
+            sindicato_index=sindicato_index
+        )
+        return result.set_index('Sindicato')[['Dias Úteis', 'Valor do VR']]
+    
+    def previous_month_snapshots(self):
+        """Fontes e saída da competência anterior (em output/snapshots ou na pasta do lote)"""
+        previous = str(pd.Period(self.competencia, freq='M') - 1)
+        roots = [
+            os.path.join(self.output_dir, 'snapshots'),
+            os.path.join(os.path.dirname(os.path.normpath(self.output_dir)), previous, 'snapshots')
+        ]
+        for root in roots:
+            snapshots = StageSnapshots(root, previous)
+            sources, values = snapshots.load('fontes'), snapshots.load('valores')
+            if sources is not None and values is not None:
+                return previous, sources, values['vr_mensal']
+        return previous, None, None
+    
+    def plan_incremental(self, eligible, sindicato_values, dias_uteis_sindicato):
+        """
+        Decide quem recalcular em relação à competência anterior.
+        
+        São recalculados os colaboradores com linha alterada nas planilhas
+        (matrícula + hash da linha), os presentes em planilhas datadas, os que
+        não estavam na saída anterior e todos os de sindicatos cujo valor ou
+        calendário mudou. Retorna None quando não há snapshot do mês anterior.
+        """
+        previous, sources, previous_output = self.previous_month_snapshots()
+        if sources is None:
+            event(logger, logging.INFO, "Sem snapshot da competência anterior; recálculo completo", anterior=previous)
+            return None
+        
+        matriculas = normalize_matricula(coalesce_columns(eligible, ['MATRICULA'], None))
+        sindicatos = coalesce_columns(eligible, self.SINDICATO_COLUMNS, 'PADRÃO')
+        
+        # Sindicatos com valor ou dias úteis diferentes para quem não teve ocorrências
+        keys = sindicatos.unique()
+        current_probe = self.sindicato_probe(keys, self.data, self.calendar, self.sindicato_index(),
+                                             sindicato_values, dias_uteis_sindicato)
+        previous_index = SindicatoIndex.from_sources(sources)
+        previous_probe = self.sindicato_probe(
+            keys, sources, get_calendar(previous), previous_index,
+            self.get_sindicato_values(previous_index), self.get_dias_uteis_por_sindicato(previous_index)
+        ).reindex(current_probe.index)
+        changed_sindicatos = current_probe.index[(current_probe != previous_probe).any(axis=1)]
+        
+        previous_matriculas = normalize_matricula(previous_output['Matrícula']).dropna().unique()
+        affected = (
+            matriculas.isna()
+            | matriculas.isin(changed_matriculas(self.data, sources))
+            | ~matriculas.isin(previous_matriculas)
+            | sindicatos.isin(changed_sindicatos)
+        ).to_numpy(dtype=bool)
+        
+        event(logger, logging.INFO, "Recálculo incremental", anterior=previous, recalculados=int(affected.sum()),
+              colaboradores=len(affected), sindicatos_alterados=list(changed_sindicatos))
+        return {
+            'previous_output': previous_output,
+            'affected': affected,
+            'matriculas': matriculas.to_numpy()
+        }
+    
+    def report_path(self):
+        """Relatório JSON da execução, ao lado da planilha final"""
+        return f"{os.path.splitext(self.output_paths()[0])[0]}_execucao.json"
+    
+    def validations_path(self):
+        """Tabela de violações das validações, ao lado da planilha final"""
+        return f"{os.path.splitext(self.output_paths()[0])[0]}_validacoes.csv"
+    
+    def reconcile(self, final_result, references=('vr_mensal', 'vr_final_ref')):
+        """Concilia a planilha gerada com cada planilha de referência carregada, por matrícula"""
+        base = os.path.splitext(self.output_paths()[0])[0]
+        reconciliations = {}
+        for key in references:
+            reference = self.data.get(key)
+            if reference is None or reference.empty:
+                continue
+            try:
+                reconciliation = Reconciliation.from_frames(final_result, reference)
+            except ValueError as e:
+                event(logger, logging.WARNING, "Conciliação não realizada", referencia=key, erro=str(e))
+                continue
+            differences_path, _ = reconciliation.write(f"{base}_conciliacao_{key}")
+            event(logger, logging.INFO, "Conciliação com a referência", referencia=key,
+                  arquivo=differences_path, **reconciliation.summary())
+            reconciliations[key] = reconciliation
+        return reconciliations
+    
+    def validate(self, final_result):
+        """Roda as validações das planilhas de entrada e da planilha final e grava as violações"""
+        violations = validate_all(self.data, final_result, self.calendar, self.sindicato_index())
+        
+        path = self.validations_path()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        violations.to_csv(path, index=False)
+        
+        errors = int((violations['severidade'] == ERRO).sum())
+        event(logger, logging.WARNING if errors else logging.INFO, "Validações concluídas",
+              violacoes=len(violations), erros=errors, arquivo=path, **violation_counts(violations))
+        return violations
+    
+    def process_data_with_reference(self, resume=None, incremental=None):
         """Processa dados usando a planilha de referência como guia"""
-        print("\\n=== PROCESSAMENTO BASEADO NA PLANILHA DE REFERÊNCIA ===\\n")
+        event(logger, logging.INFO, "Processamento baseado na planilha de referência", competencia=self.competencia)
+        
+        # Etapas medidas (tempo, CPU, linhas, memória) e perfil opcional (VR_PROFILE)
+        self.instrumentation = Instrumentation(self.competencia)
+        report_path = self.report_path()
+        with self.instrumentation.profiling(os.path.splitext(report_path)[0]):
+            result = self.run_pipeline(resume, incremental)
+        
+        self.instrumentation.write(report_path)
+        event(logger, logging.INFO, "Relatório da execução salvo", arquivo=report_path,
+              **{f"{stage}_s": seconds for stage, seconds in self.instrumentation.stage_times().items()})
+        return result
+    
+    def run_pipeline(self, resume=None, incremental=None):
+        """Executa as etapas do processamento: carga, elegibilidade, dias, valores e gravação"""
+        span = self.instrumentation.span
+        self.prepare_snapshots(resume)
         
         # Carregar arquivos
-        self.load_excel_files()
+        with span('load') as stage:
+            sources = self.restore_stage('fontes')
+            if sources is not None:
+                self.data = {key: sources.get(key, pd.DataFrame()) for key in self.files}
+            else:
+                with span('load_excel_files'):
+                    self.load_excel_files()
+                with span('snapshot_fontes'):
+                    self.save_stage('fontes', self.data)
+            stage.rows = sum(len(df) for df in self.data.values())
         
         # Obter colaboradores elegíveis da referência
-        eligible_employees = self.get_eligible_employees()
+        with span('eligibility') as stage:
+            restored = self.restore_stage('elegiveis')
+            if restored is not None:
+                eligible_employees = restored['elegiveis']
+                self.excluded = restored.get('excluidos', pd.DataFrame())
+            else:
+                eligible_employees = self.get_eligible_employees()
+                self.save_stage('elegiveis', {'elegiveis': eligible_employees, 'excluidos': self.excluded})
+            stage.rows = len(eligible_employees)
         
         if eligible_employees.empty:
-            print("Nenhum colaborador elegível encontrado na referência.")
+            event(logger, logging.WARNING, "Nenhum colaborador elegível encontrado na referência")
             return None
         
-        # Obter valores de sindicato e dias úteis
-        sindicato_values = self.get_sindicato_values()
-        dias_uteis_sindicato = self.get_dias_uteis_por_sindicato()
-        
-        # Processar cada colaborador
-        result_data = []
-        
-        for index, employee in eligible_employees.iterrows():
-            try:
-                # Extrair dados básicos
-                matricula = employee.get('MATRICULA', 'N/A')
-                
-                # Tentar diferentes colunas para nome
-                nome = (employee.get('NOME') or 
-                       employee.get('Nome') or 
-                       employee.get('TITULO DO CARGO', 'N/A'))
-                
-                # Sindicato mapeado (preferir o mapeado)
-                sindicato = (employee.get('Sindicato Mapeado') or 
-                           employee.get('Sindicato_y') or 
-                           employee.get('Sindicato_x') or 
-                           'PADRÃO')
+        with span('days') as stage:
+            # Obter valores de sindicato e dias úteis
+            with span('get_sindicato_values'):
+                sindicato_values = self.get_sindicato_values()
+            with span('get_dias_uteis_por_sindicato'):
+                dias_uteis_sindicato = self.get_dias_uteis_por_sindicato()
+            
+            restored = self.restore_stage('dias')
+            plan = None
+            if restored is not None:
+                eligible_employees = restored['colaboradores']
+            else:
+                # Modo incremental: só quem mudou desde a competência anterior
+                if incremental_enabled() if incremental is None else incremental:
+                    with span('plan_incremental'):
+                        plan = self.plan_incremental(eligible_employees, sindicato_values, dias_uteis_sindicato)
+                    if plan is not None:
+                        eligible_employees = eligible_employees[plan['affected']]
                 
-                # Dias úteis calculados (usar da referência se disponível)
-                if 'DIAS UTEIS CALCULADOS' in employee and pd.notna(employee['DIAS UTEIS CALCULADOS']):
-                    dias_uteis = int(employee['DIAS UTEIS CALCULADOS'])
-                else:
-                    dias_uteis = dias_uteis_sindicato.get(sindicato, 22)
+                # Admissões e desligamentos (regra do dia 15) juntados por matrícula
+                with span('apply_proration', rows=len(eligible_employees)):
+                    eligible_employees = apply_proration(
+                        eligible_employees,
+                        self.data.get('admissao'),
+                        self.data.get('desligados'),
+                        self.calendar
+                    )
                 
-                # Valor VR diário (usar da referência se disponível)
-                if 'VALOR VR DIARIO' in employee and pd.notna(employee['VALOR VR DIARIO']):
-                    valor_vr_diario = float(employee['VALOR VR DIARIO'])
+                # Dias úteis por colaborador (usar da referência se disponível)
+                with span('calculate_working_days', rows=len(eligible_employees)):
+                    dias_calendario = self.calculate_working_days(eligible_employees, dias_uteis_sindicato)
+                if 'DIAS UTEIS CALCULADOS' in eligible_employees.columns:
+                    dias_referencia = pd.to_numeric(eligible_employees['DIAS UTEIS CALCULADOS'], errors='coerce')
+                    eligible_employees['DIAS UTEIS CALCULADOS'] = dias_referencia.fillna(dias_calendario)
                 else:
-                    valor_vr_diario = sindicato_values.get(sindicato, 30.0)
-                
-                # Calcular valores
-                valor_total = dias_uteis * valor_vr_diario
-                valor_empresa = valor_total * 0.80  # 80% empresa
-                valor_desconto = valor_total * 0.20  # 20% colaborador
-                
-                # Status
-                status = employee.get('Status', 'Elegível')
-                
-                result_data.append({
-                    'Matrícula': matricula,
-                    'Nome': nome,
-                    'Sindicato': sindicato,
-                    'Dias Úteis': dias_uteis,
-                    'Valor do VR': valor_vr_diario,
-                    'Valor Total': valor_total,
-                    'Valor Empresa (80%)': valor_empresa,
-                    'Valor Descontado (20%)': valor_desconto,
-                    'Status': status
-                })
-                
-            except Exception as e:
-                print(f"Erro ao processar colaborador {matricula}: {str(e)}")
-                continue
+                    eligible_employees['DIAS UTEIS CALCULADOS'] = dias_calendario
+                if plan is None:
+                    self.save_stage('dias', {'colaboradores': eligible_employees})
+            stage.rows = len(eligible_employees)
         
-        # Criar DataFrame final
-        final_result = pd.DataFrame(result_data)
+        with span('values') as stage:
+            restored = self.restore_stage('valores')
+            self.vr_cents = None
+            if restored is not None:
+                final_result = restored['vr_mensal']
+            else:
+                # Calcular valores de todos os colaboradores de uma vez (e os centavos dos totais)
+                final_result, self.vr_cents = calculate_vr_frame(
+                    eligible_employees,
+                    sindicato_values,
+                    dias_uteis_sindicato,
+                    matricula_columns=('MATRICULA',),
+                    nome_columns=('NOME', 'Nome', 'TITULO DO CARGO'),
+                    sindicato_columns=self.SINDICATO_COLUMNS,
+                    dias_column='DIAS UTEIS CALCULADOS',
+                    valor_column='VALOR VR DIARIO',
+                    status_column='Status',
+                    sindicato_index=self.sindicato_index(),
+                    with_cents=True
+                )
+                if plan is not None:
+                    # Linhas reaproveitadas não têm centavos do motor: os totais convertem os reais
+                    final_result = merge_outputs(plan['previous_output'], final_result,
+                                                 plan['affected'], plan['matriculas'])
+                    self.vr_cents = None
+                self.save_stage('valores', {'vr_mensal': final_result})
+            stage.rows = len(final_result)
+        
+        # Validações da aba "Validações" (uma passada por planilha)
+        if validation_enabled():
+            with span('validation') as stage:
+                self.violations = self.validate(final_result)
+                stage.rows = len(self.violations)
         
-        # Salvar resultado
-        output_path = os.path.join('output', 'VR_Mensal_05_2025_Gerado.xlsx')
-        os.makedirs('output', exist_ok=True)
+        # Salvar resultado (xlsx e CSV gravados em paralelo, em blocos)
+        output_path, csv_path = self.output_paths()
         
-        final_result.to_excel(output_path, index=False)
-        print(f"\\nPlanilha final salva em: {output_path}")
-        print(f"Total de colaboradores processados: {len(final_result)}")
+        with span('write', rows=len(final_result)):
+            with span('write_vr_outputs'):
+                write_vr_outputs(final_result, output_path, csv_path)
+            event(logger, logging.INFO, "Planilha final salva", xlsx=output_path, csv=csv_path)
+            
+            # Dataset Parquet tipado, particionado por competência e sindicato
+            if columnar_enabled():
+                with span('write_parquet_dataset'):
+                    partition = write_parquet_dataset(final_result,
+                                                      os.path.join(self.output_dir, 'parquet', 'vr_mensal'),
+                                                      self.competencia)
+                event(logger, logging.INFO, "Dataset Parquet salvo", diretorio=partition)
         
-        # Calcular totais
-        total_valor_empresa = final_result['Valor Empresa (80%)'].sum()
-        total_valor_desconto = final_result['Valor Descontado (20%)'].sum()
-        total_geral = final_result['Valor Total'].sum()
+        # Conciliação com VRMENSAL e a referência final (hash join por matrícula)
+        if reconciliation_enabled():
+            with span('reconciliation', rows=len(final_result)):
+                self.reconciliations = self.reconcile(final_result)
         
-        print(f"\\n=== RESUMO FINANCEIRO ===")
-        print(f"Total Valor Empresa (80%): R$ {total_valor_empresa:,.2f}")
-        print(f"Total Desconto Colaborador (20%): R$ {total_valor_desconto:,.2f}")
-        print(f"Total Geral: R$ {total_geral:,.2f}")
+        # Resumo compacto (a tabela completa só com VR_VERBOSE=1, em amostra)
+        log_frame(logger, "Planilha final", final_result)
         
-        # Mostrar primeiros registros
-        print(f"\\n=== PRIMEIROS 10 REGISTROS ===")
-        print(final_result.head(10).to_string(index=False))
+        # Totais em centavos por sindicato e status, calculados uma única vez
+        self.totals = VRTotals.from_frame(final_result, self.vr_cents)
+        event(logger, logging.INFO, "Resumo financeiro",
+              colaboradores=self.totals.colaboradores,
+              valor_empresa=f"{self.totals.empresa:,.2f}",
+              valor_desconto=f"{self.totals.desconto:,.2f}",
+              valor_total=f"{self.totals.total:,.2f}")
         
         self.final_data = final_result
         return final_result
@@ -287,12 +551,7 @@ def main():
     if result is not None:
         print("\\nProcessamento concluído com sucesso!")
         print(f"Modelo LLM utilizado: {processor.model_name}")
-        
-        # Salvar também em formato CSV para facilitar visualização
-        csv_path = os.path.join('output', 'VR_Mensal_05_2025_Gerado.csv')
-        result.to_csv(csv_path, index=False, encoding='utf-8')
-        print(f"Arquivo CSV salvo em: {csv_path}")
-        
+        report_import_times({'ImprovedVRDataProcessor': processor.startup_time})
     else:
         print("\\nFalha no processamento dos dados.")
 
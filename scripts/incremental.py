@@ -0,0 +1,87 @@
+"""
+Recálculo incremental entre competências (diferença por matrícula e hash da linha)
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from column_resolver import normalize_matricula, source_matricula_column
+
+# Planilhas comparadas linha a linha: só matrículas com linha nova, alterada
+# ou removida são recalculadas
+ROW_SOURCES = ['ativos', 'aprendiz', 'estagio', 'exterior', 'vr_final_ref']
+
+# Planilhas com datas relativas à competência (férias contadas a partir do
+# início do mês, afastamentos sem data, regra do dia 15): toda matrícula
+# presente em qualquer dos dois meses é recalculada
+DATED_SOURCES = ['ferias', 'desligados', 'afastamentos', 'admissao']
+
+
+def incremental_enabled():
+    """Indica se o recálculo incremental está habilitado (VR_INCREMENTAL=1)"""
+    return os.getenv('VR_INCREMENTAL', '0') == '1'
+
+
+def row_hashes(key, df):
+    """
+    (matrícula, hash da linha) de cada linha da planilha.
+
+    As colunas entram em ordem de nome e como texto, para que o hash não
+    dependa da ordem das colunas nem do tipo inferido na leitura.
+    """
+    matricula_col = source_matricula_column(key, df) if df is not None and not df.empty else None
+    if matricula_col is None:
+        return pd.DataFrame({'matricula': pd.Series(dtype='Int64'), 'hash': pd.Series(dtype='uint64')})
+
+    text = df[sorted(df.columns, key=str)].astype(str)
+    text.columns = [str(col) for col in text.columns]
+    return pd.DataFrame({
+        'matricula': normalize_matricula(df[matricula_col]).to_numpy(),
+        'hash': pd.util.hash_pandas_object(text, index=False).to_numpy()
+    }).dropna(subset=['matricula'])
+
+
+def present_matriculas(key, df):
+    """Matrículas presentes em uma planilha"""
+    matricula_col = source_matricula_column(key, df) if df is not None and not df.empty else None
+    if matricula_col is None:
+        return np.array([], dtype=np.int64)
+    return normalize_matricula(df[matricula_col]).dropna().unique().astype(np.int64)
+
+
+def changed_matriculas(current, previous):
+    """
+    Matrículas afetadas entre as fontes de dois meses ({chave: DataFrame}).
+
+    Nas planilhas linha a linha vale a diferença simétrica dos pares
+    (matrícula, hash); nas planilhas datadas, todas as matrículas presentes.
+    """
+    changed = [np.array([], dtype=np.int64)]
+    for key in ROW_SOURCES:
+        now, before = row_hashes(key, current.get(key)), row_hashes(key, previous.get(key))
+        diff = now.merge(before, how='outer', on=['matricula', 'hash'], indicator=True)
+        changed.append(diff.loc[diff['_merge'] != 'both', 'matricula'].to_numpy(dtype=np.int64))
+    for key in DATED_SOURCES:
+        changed.append(present_matriculas(key, current.get(key)))
+        changed.append(present_matriculas(key, previous.get(key)))
+    return np.unique(np.concatenate(changed))
+
+
+def merge_outputs(previous_output, recomputed, affected, matriculas):
+    """
+    Junta as linhas reaproveitadas do mês anterior às recalculadas.
+
+    affected marca (por posição) os colaboradores recalculados; os demais
+    vêm da saída anterior pela matrícula. A ordem final é a dos colaboradores.
+    """
+    previous = previous_output.assign(_matricula=normalize_matricula(previous_output['Matrícula']).to_numpy())
+    previous = previous.dropna(subset=['_matricula']).drop_duplicates('_matricula').set_index('_matricula')
+
+    reused = previous.reindex(matriculas[~affected])[recomputed.columns]
+    reused.index = np.flatnonzero(~affected)
+    recomputed = recomputed.set_axis(np.flatnonzero(affected))
+    return pd.concat([reused, recomputed]).sort_index().reset_index(drop=True)
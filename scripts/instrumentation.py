@@ -0,0 +1,168 @@
+"""
+Instrumentação do processamento: etapas com tempo, CPU, linhas e memória
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+REPORT_VERSION = 1
+
+
+def current_rss_mb():
+    """Memória residente atual (MB); sem /proc, usa o pico do processo"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Pico de memória residente (MB) do processo"""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def profiler_name():
+    """Perfilador da execução: VR_PROFILE=cprofile ou pyinstrument (vazio desliga)"""
+    return os.getenv('VR_PROFILE', '').strip().lower()
+
+
+def tracemalloc_enabled():
+    """Indica se as alocações Python devem ser rastreadas por etapa (VR_TRACEMALLOC=1)"""
+    return os.getenv('VR_TRACEMALLOC', '0') == '1'
+
+
+class Span:
+    """Uma etapa medida; rows pode ser preenchido dentro do bloco"""
+
+    def __init__(self, name, parent=None, rows=None):
+        self.name = name
+        self.parent = parent
+        self.rows = rows
+        self.record = {}
+
+
+class Instrumentation:
+    """
+    Registro das etapas de uma execução.
+
+    Cada span guarda tempo de parede, tempo de CPU, linhas processadas e a
+    variação de RSS (e, com VR_TRACEMALLOC=1, das alocações Python). Spans
+    podem ser aninhados; o relatório JSON lista todos na ordem de término.
+    """
+
+    def __init__(self, competencia=None):
+        self.competencia = competencia
+        self.spans = []
+        self.stack = []
+        self.started_at = datetime.now()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.trace = tracemalloc_enabled()
+        self.profile_path = None
+
+    @contextlib.contextmanager
+    def span(self, name, rows=None):
+        """Mede o bloco como uma etapa (aninhada na etapa corrente, se houver)"""
+        current = Span(name, self.stack[-1].name if self.stack else None, rows)
+        self.stack.append(current)
+
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            traced_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        rss_before = current_rss_mb()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield current
+        finally:
+            rss_after = current_rss_mb()
+            record = {
+                'etapa': name,
+                'pai': current.parent,
+                'inicio_s': round(wall - self.start_wall, 4),
+                'tempo_s': round(time.perf_counter() - wall, 4),
+                'cpu_s': round(time.process_time() - cpu, 4),
+                'linhas': None if current.rows is None else int(current.rows),
+                'rss_mb': round(rss_after, 1),
+                'rss_delta_mb': round(rss_after - rss_before, 1)
+            }
+            if self.trace:
+                traced, traced_peak = tracemalloc.get_traced_memory()
+                record['alocado_delta_mb'] = round((traced - traced_before) / (1024 * 1024), 2)
+                record['alocado_pico_mb'] = round(traced_peak / (1024 * 1024), 2)
+            current.record = record
+            self.spans.append(record)
+            self.stack.pop()
+
+    @contextlib.contextmanager
+    def profiling(self, base_path):
+        """Perfila o bloco com cProfile ou pyinstrument conforme VR_PROFILE"""
+        name = profiler_name()
+        if name in ('cprofile', 'cprof'):
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                self.profile_path = f"{base_path}.prof"
+                os.makedirs(os.path.dirname(self.profile_path) or '.', exist_ok=True)
+                profiler.dump_stats(self.profile_path)
+        elif name == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("pyinstrument não instalado; execução sem perfil.")
+                yield
+                return
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                self.profile_path = f"{base_path}.html"
+                os.makedirs(os.path.dirname(self.profile_path) or '.', exist_ok=True)
+                with open(self.profile_path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+        else:
+            yield
+
+    def stage_times(self):
+        """Tempo de parede das etapas de primeiro nível, por nome"""
+        return {span['etapa']: span['tempo_s'] for span in self.spans if span['pai'] is None}
+
+    def report(self):
+        """Relatório da execução (dicionário serializável em JSON)"""
+        return {
+            'versao': REPORT_VERSION,
+            'competencia': self.competencia,
+            'inicio': self.started_at.isoformat(timespec='seconds'),
+            'tempo_total_s': round(time.perf_counter() - self.start_wall, 4),
+            'cpu_total_s': round(time.process_time() - self.start_cpu, 4),
+            'pico_rss_mb': round(peak_rss_mb(), 1),
+            'perfil': self.profile_path,
+            'etapas': self.spans
+        }
+
+    def write(self, path):
+        """Grava o relatório JSON da execução"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
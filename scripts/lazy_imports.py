@@ -0,0 +1,40 @@
+"""
+Importação sob demanda de dependências pesadas (langchain) com medição de tempo
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import importlib
+import os
+import sys
+import time
+
+# Tempo (segundos) gasto na primeira importação de cada módulo
+IMPORT_TIMES = {}
+
+
+def timed_import(module_name):
+    """Importa um módulo na primeira vez que for pedido, registrando o tempo gasto"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES[module_name] = time.perf_counter() - start
+    return module
+
+
+def pure_data_mode():
+    """Indica se o processamento deve rodar sem LLM/langchain (VR_PURE_DATA=1)"""
+    return os.getenv('VR_PURE_DATA', '0') == '1'
+
+
+def report_import_times(startup_times=None):
+    """Mostra os tempos de inicialização e de importação sob demanda"""
+    print("\n=== TEMPOS DE INICIALIZAÇÃO ===")
+    for name, seconds in (startup_times or {}).items():
+        print(f"- {name}: {seconds * 1000:.1f} ms")
+    if not IMPORT_TIMES:
+        print("- Nenhuma dependência pesada importada (langchain não carregado)")
+    for module_name, seconds in IMPORT_TIMES.items():
+        print(f"- import {module_name}: {seconds * 1000:.1f} ms")
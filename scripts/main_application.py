@@ -4,36 +4,50 @@ Aplicação principal que integra o sistema RAG com o processamento de dados.
 Grupo: Synapse 7 - Desafio 4
 """
 
+import argparse
+import contextlib
+import json
 import os
+import re
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 from improved_data_processor import ImprovedVRDataProcessor
+from lazy_imports import pure_data_mode, report_import_times, timed_import
+from money import from_cents, to_cents
+from run_logging import configure_logging
 
-# Tentar importar o sistema RAG (pode falhar devido às limitações da API)
-try:
-    from rag_system import VRRAGSystem
-    RAG_AVAILABLE = True
-except Exception as e:
-    print(f"Sistema RAG não disponível: {str(e)}")
-    RAG_AVAILABLE = False
+def load_rag_class():
+    """Importa o sistema RAG sob demanda (pode falhar devido às limitações da API)"""
+    try:
+        return timed_import('rag_system').VRRAGSystem
+    except Exception as e:
+        print(f"Sistema RAG não disponível: {str(e)}")
+        return None
 
 class VRAutomationApp:
-    def __init__(self):
+    def __init__(self, pure_data=None):
+        start = time.perf_counter()
         load_dotenv()
         self.model_name = os.getenv('MODEL_NAME', 'gpt-4o-mini')
+        self.pure_data = pure_data_mode() if pure_data is None else pure_data
         
         # Inicializar processador de dados
-        self.data_processor = ImprovedVRDataProcessor()
+        self.data_processor = ImprovedVRDataProcessor(pure_data=self.pure_data)
         
-        # Inicializar sistema RAG se disponível
+        # Inicializar sistema RAG se disponível (langchain só é importado aqui)
         self.rag_system = None
-        if RAG_AVAILABLE:
+        VRRAGSystem = None if self.pure_data else load_rag_class()
+        if VRRAGSystem:
             try:
                 self.rag_system = VRRAGSystem()
                 self.setup_rag()
             except Exception as e:
                 print(f"Erro ao inicializar RAG: {str(e)}")
                 self.rag_system = None
+        
+        self.startup_time = time.perf_counter() - start
     
     def setup_rag(self):
         """Configura o sistema RAG"""
@@ -41,25 +55,11 @@ class VRAutomationApp:
             return False
         
         try:
-            # Tentar carregar vectorstore existente
+            # Carregar o índice salvo para este PDF/configuração ou criar um novo
+            pdf_path = os.path.join('data', 'Desafio4-Descrição.pdf')
             vectorstore_path = os.path.join('output', 'vectorstore')
-            if os.path.exists(vectorstore_path):
-                if self.rag_system.load_vectorstore(vectorstore_path):
-                    print("Vectorstore existente carregado.")
-                else:
-                    # Se falhar, criar novo
-                    pdf_path = os.path.join('data', 'Desafio4-Descrição.pdf')
-                    if self.rag_system.load_pdf_context(pdf_path):
-                        print("Novo vectorstore criado.")
-                    else:
-                        return False
-            else:
-                # Criar novo vectorstore
-                pdf_path = os.path.join('data', 'Desafio4-Descrição.pdf')
-                if self.rag_system.load_pdf_context(pdf_path):
-                    print("Vectorstore criado com sucesso.")
-                else:
-                    return False
+            if not self.rag_system.load_or_build_vectorstore(pdf_path, vectorstore_path):
+                return False
             
             # Configurar cadeia de QA com prompt personalizado
             custom_prompt = self.data_processor.custom_prompt
@@ -90,6 +90,43 @@ class VRAutomationApp:
         except Exception as e:
             return f"Erro ao consultar RAG: {str(e)}"
     
+    def answer_questions_file(self, questions_path, output_path, concurrency=None):
+        """Responde em paralelo as perguntas de um arquivo e grava os resultados em JSON"""
+        if not self.rag_system:
+            print("Sistema RAG não disponível.")
+            return None
+        
+        # Uma pergunta por linha (.txt) ou lista de perguntas (.json)
+        with open(questions_path, 'r', encoding='utf-8') as f:
+            if questions_path.lower().endswith('.json'):
+                questions = json.load(f)
+            else:
+                questions = [line.strip() for line in f if line.strip()]
+        
+        print(f"Respondendo {len(questions)} perguntas em paralelo...")
+        start = time.perf_counter()
+        results = self.rag_system.query_many(questions, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        
+        records = [
+            {
+                'pergunta': result['question'],
+                'resposta': result['answer'],
+                'fontes': result['source_ids'],
+                'cache': result['cached'],
+                'erro': result['error']
+            }
+            for result in results
+        ]
+        
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        
+        errors = sum(1 for record in records if record['erro'])
+        print(f"Respostas salvas em: {output_path} ({elapsed:.1f}s, {errors} com erro)")
+        return records
+    
     def process_vr_data(self):
         """Processa os dados de VR"""
         print("\\n" + "="*60)
@@ -104,23 +141,21 @@ class VRAutomationApp:
             print("PROCESSAMENTO CONCLUÍDO COM SUCESSO!")
             print("="*60)
             
-            # Estatísticas finais
-            total_colaboradores = len(result)
-            total_valor = result['Valor Total'].sum()
-            total_empresa = result['Valor Empresa (80%)'].sum()
-            total_desconto = result['Valor Descontado (20%)'].sum()
+            # Estatísticas finais (totais já agregados pelo processador)
+            totals = self.data_processor.totals
             
             print(f"\\nESTATÍSTICAS FINAIS:")
-            print(f"- Total de colaboradores processados: {total_colaboradores}")
-            print(f"- Valor total de VR: R$ {total_valor:,.2f}")
-            print(f"- Custo para empresa (80%): R$ {total_empresa:,.2f}")
-            print(f"- Desconto dos colaboradores (20%): R$ {total_desconto:,.2f}")
+            print(f"- Total de colaboradores processados: {totals.colaboradores}")
+            print(f"- Valor total de VR: R$ {totals.total:,.2f}")
+            print(f"- Custo para empresa (80%): R$ {totals.empresa:,.2f}")
+            print(f"- Desconto dos colaboradores (20%): R$ {totals.desconto:,.2f}")
             print(f"- Modelo LLM utilizado: {self.model_name}")
             
             # Arquivos gerados
             print(f"\\nARQUIVOS GERADOS:")
-            print(f"- Excel: output/VR_Mensal_05_2025_Gerado.xlsx")
-            print(f"- CSV: output/VR_Mensal_05_2025_Gerado.csv")
+            excel_path, csv_path = self.data_processor.output_paths()
+            print(f"- Excel: {excel_path}")
+            print(f"- CSV: {csv_path}")
             
             return result
         else:
@@ -178,12 +213,175 @@ class VRAutomationApp:
             except:
                 pass
         
+        report_import_times({
+            'ImprovedVRDataProcessor': self.data_processor.startup_time,
+            'VRAutomationApp': self.startup_time
+        })
+        
         print("\\nAplicação finalizada.")
         return result
 
-def main():
+def resolve_batch_target(target, data_root='data', output_root='output'):
+    """
+    Converte um item do lote em (competência, diretório de dados, diretório de saída).
+
+    Aceita uma competência AAAA-MM (dados em data/AAAA-MM ou, se o diretório
+    não existir, em data/ desde que lá esteja a VRMENSALMM.AAAA.xlsx da
+    competência) ou um diretório de entrada, cuja competência vem do nome
+    do diretório ou da planilha VRMENSALMM.AAAA.xlsx dentro dele.
+    """
+    if re.fullmatch(r'\d{4}-\d{2}', target):
+        competencia = target
+        data_dir = os.path.join(data_root, target)
+        if not os.path.isdir(data_dir):
+            # Sem diretório próprio, data/ só vale se tiver a planilha do mês
+            # (do contrário a competência seria calculada com dados de outro mês)
+            year, month = target.split('-')
+            if not os.path.exists(os.path.join(data_root, f"VRMENSAL{month}.{year}.xlsx")):
+                raise ValueError(f"Dados da competência {target} não encontrados "
+                                 f"({data_dir} ou VRMENSAL{month}.{year}.xlsx em {data_root})")
+            data_dir = data_root
+    elif os.path.isdir(target):
+        data_dir = target
+        match = re.search(r'(\d{4})-(\d{2})', os.path.basename(os.path.normpath(target)))
+        if match:
+            competencia = f"{match.group(1)}-{match.group(2)}"
+        else:
+            names = [re.fullmatch(r'VRMENSAL(\d{2})\.(\d{4})\.xlsx', name) for name in os.listdir(target)]
+            found = [m for m in names if m]
+            if not found:
+                raise ValueError(f"Competência não identificada para o diretório {target}")
+            competencia = f"{found[0].group(2)}-{found[0].group(1)}"
+    else:
+        raise ValueError(f"Item do lote inválido (use AAAA-MM ou um diretório): {target}")
+    
+    return competencia, data_dir, os.path.join(output_root, competencia)
+
+def process_competencia(competencia, data_dir, output_dir):
+    """Processa uma competência em um processo do pool (saída detalhada no log da competência)"""
+    start = time.perf_counter()
+    summary = {
+        'competencia': competencia,
+        'data_dir': data_dir,
+        'output_dir': output_dir,
+        'colaboradores': 0,
+        'valor_total': 0.0,
+        'valor_empresa': 0.0,
+        'valor_desconto': 0.0,
+        'erro': None
+    }
+    
+    os.makedirs(output_dir, exist_ok=True)
+    log_path = os.path.join(output_dir, 'processamento.log')
+    with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            # Leitura das planilhas sequencial: o paralelismo do lote é entre competências
+            processor = ImprovedVRDataProcessor(pure_data=True, competencia=competencia,
+                                                data_dir=data_dir, output_dir=output_dir, load_workers=1)
+            result = processor.process_data_with_reference()
+            if result is None:
+                summary['erro'] = "Nenhum colaborador elegível encontrado"
+            else:
+                summary.update(processor.totals.summary())
+                summary['arquivo'] = processor.output_paths()[0]
+        except Exception as e:
+            summary['erro'] = str(e)
+    
+    summary['tempo_s'] = round(time.perf_counter() - start, 3)
+    return summary
+
+def run_batch(targets, max_workers=None, summary_path=None):
+    """
+    Processa várias competências em paralelo, cada uma em um processo com
+    seus próprios dados e saída, e grava um resumo consolidado em JSON.
+    """
+    # Itens inválidos entram no resumo como erro, sem interromper os demais
+    jobs, summaries = [], []
+    for target in targets:
+        try:
+            jobs.append(resolve_batch_target(target))
+        except ValueError as e:
+            summaries.append({'competencia': target, 'data_dir': None, 'output_dir': None, 'erro': str(e)})
+    summary_path = summary_path or os.path.join('output', 'resumo_competencias.json')
+    workers = max(1, min(len(jobs), max_workers or os.cpu_count() or 1))
+    
+    print(f"Processando {len(jobs)} competências com {workers} processos...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_competencia, *job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                summaries.append(future.result())
+            except Exception as e:
+                summaries.append({'competencia': job[0], 'data_dir': job[1], 'output_dir': job[2], 'erro': str(e)})
+    elapsed = time.perf_counter() - start
+    
+    summaries.sort(key=lambda item: item['competencia'])
+    report = {
+        'competencias': summaries,
+        'total_colaboradores': sum(item.get('colaboradores', 0) for item in summaries),
+        'valor_total': float(from_cents(to_cents([item.get('valor_total', 0.0) for item in summaries]).sum())),
+        'tempo_total_s': round(elapsed, 3),
+        'tempo_maior_competencia_s': max((item.get('tempo_s', 0.0) for item in summaries), default=0.0)
+    }
+    os.makedirs(os.path.dirname(summary_path) or '.', exist_ok=True)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    print("\n=== RESUMO DO LOTE ===")
+    for item in summaries:
+        if item.get('erro'):
+            print(f"- {item['competencia']}: ERRO - {item['erro']}")
+        else:
+            print(f"- {item['competencia']}: {item['colaboradores']} colaboradores, "
+                  f"R$ {item['valor_total']:,.2f} ({item['tempo_s']:.1f}s)")
+    print(f"Tempo total: {elapsed:.1f}s (maior competência: {report['tempo_maior_competencia_s']:.1f}s)")
+    print(f"Resumo salvo em: {summary_path}")
+    return report
+
+def parse_args(argv=None):
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Automação de VR/VA com Langchain")
+    parser.add_argument('--perguntas', help="arquivo de perguntas (uma por linha ou lista JSON) a responder em paralelo")
+    parser.add_argument('--saida', default=os.path.join('output', 'respostas.json'),
+                        help="arquivo JSON com as respostas (modo --perguntas)")
+    parser.add_argument('--concorrencia', type=int, default=None,
+                        help="número máximo de perguntas simultâneas (padrão: QUERY_CONCURRENCY)")
+    parser.add_argument('--competencias', nargs='+',
+                        help="processa em lote as competências (AAAA-MM) ou diretórios de entrada informados")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="número de processos do lote (padrão: número de CPUs)")
+    parser.add_argument('--resumo', default=os.path.join('output', 'resumo_competencias.json'),
+                        help="arquivo JSON com o resumo consolidado do lote")
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help="log detalhado: colunas e amostras das planilhas (equivale a VR_VERBOSE=1)")
+    parser.add_argument('--log-json', action='store_true',
+                        help="log estruturado em JSON, um evento por linha (equivale a VR_LOG_FORMAT=json)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Função principal"""
+    args = parse_args(argv)
+    
+    # Variáveis de ambiente também valem para os processos do lote
+    if args.verbose:
+        os.environ['VR_VERBOSE'] = '1'
+    if args.log_json:
+        os.environ['VR_LOG_FORMAT'] = 'json'
+    configure_logging()
+    
+    # Modo em lote: várias competências em processos separados (sem RAG)
+    if args.competencias:
+        report = run_batch(args.competencias, args.processos, args.resumo)
+        return 1 if any(item.get('erro') for item in report['competencias']) else 0
+    
     app = VRAutomationApp()
+    
+    # Modo em lote: responder um arquivo de perguntas
+    if args.perguntas:
+        records = app.answer_questions_file(args.perguntas, args.saida, args.concorrencia)
+        return 0 if records is not None else 1
+    
     result = app.run()
     
     if result is not None:
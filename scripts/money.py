@@ -0,0 +1,130 @@
+"""
+Valores monetários em centavos inteiros (int64) e totais agregados do VR
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import numpy as np
+import pandas as pd
+
+# Divisão de custos, em pontos percentuais inteiros (empresa + colaborador = 100)
+PERCENTUAL_EMPRESA_PP = 80
+PERCENTUAL_COLABORADOR_PP = 100 - PERCENTUAL_EMPRESA_PP
+
+# Colunas de valor da planilha final
+TOTAL_COLUMN = 'Valor Total'
+EMPRESA_COLUMN = 'Valor Empresa (80%)'
+DESCONTO_COLUMN = 'Valor Descontado (20%)'
+
+# Agrupamento dos totais
+GROUP_COLUMNS = ['Sindicato', 'Status']
+
+
+def to_cents(values):
+    """
+    Converte reais (float ou texto numérico) em centavos int64.
+
+    Arredonda meio centavo para longe do zero (R$ 0,125 -> 13 centavos);
+    valores ausentes ou inválidos viram zero.
+    """
+    reais = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+    cents = np.sign(reais) * np.floor(np.abs(reais) * 100 + 0.5)
+    return np.nan_to_num(cents, nan=0.0).astype(np.int64)
+
+
+def from_cents(cents):
+    """Centavos int64 em reais (float), para as planilhas de saída"""
+    return np.asarray(cents, dtype=np.int64) / 100
+
+
+def split_cents(total_cents, percentual_pp=PERCENTUAL_EMPRESA_PP):
+    """
+    Divide totais em centavos em (empresa, colaborador).
+
+    A parte da empresa é arredondada para o centavo mais próximo (meio
+    centavo para cima) e o colaborador fica com o restante, de modo que as
+    duas partes sempre somam exatamente o total.
+    """
+    total_cents = np.asarray(total_cents, dtype=np.int64)
+    empresa = (total_cents * percentual_pp + 50) // 100
+    return empresa, total_cents - empresa
+
+
+class VRTotals:
+    """
+    Totais da planilha final em centavos, agrupados por sindicato e status.
+
+    Montado uma vez a partir da planilha final; o resumo do processamento,
+    o da aplicação e o do lote leem os mesmos totais, sem novas reduções
+    sobre as colunas completas.
+    """
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    @classmethod
+    def from_frame(cls, frame, cents=None):
+        """
+        Agrega colaboradores e valores (centavos) da planilha final por sindicato e status.
+
+        cents são os centavos int64 do motor ({coluna: array} na ordem das
+        linhas, de calculate_vr_frame com with_cents=True); sem eles, ou se
+        não cobrirem a planilha (ex.: saída mesclada ou restaurada), os
+        reais das colunas são convertidos.
+        """
+        columns = ['colaboradores', 'total_cents', 'empresa_cents', 'desconto_cents']
+        if frame is None or frame.empty:
+            return cls(pd.DataFrame(columns=GROUP_COLUMNS + columns))
+
+        def column_cents(column):
+            if cents is not None and column in cents and len(cents[column]) == len(frame):
+                return np.asarray(cents[column], dtype=np.int64)
+            return to_cents(frame[column])
+
+        keys = {column: frame[column].astype(object).fillna('').to_numpy() for column in GROUP_COLUMNS}
+        cents = pd.DataFrame({
+            **keys,
+            'colaboradores': np.ones(len(frame), dtype=np.int64),
+            'total_cents': column_cents(TOTAL_COLUMN),
+            'empresa_cents': column_cents(EMPRESA_COLUMN),
+            'desconto_cents': column_cents(DESCONTO_COLUMN)
+        })
+        groups = cents.groupby(GROUP_COLUMNS, sort=True, dropna=False)[columns].sum().reset_index()
+        return cls(groups)
+
+    def cents(self, column):
+        """Soma de uma coluna em centavos (int)"""
+        return int(self.groups[column].sum())
+
+    @property
+    def colaboradores(self):
+        return self.cents('colaboradores')
+
+    @property
+    def total(self):
+        return self.cents('total_cents') / 100
+
+    @property
+    def empresa(self):
+        return self.cents('empresa_cents') / 100
+
+    @property
+    def desconto(self):
+        return self.cents('desconto_cents') / 100
+
+    def summary(self):
+        """Colaboradores e totais em reais (resumos e relatórios JSON)"""
+        return {
+            'colaboradores': self.colaboradores,
+            'valor_total': self.total,
+            'valor_empresa': self.empresa,
+            'valor_desconto': self.desconto
+        }
+
+    def to_frame(self):
+        """Totais por sindicato e status, em reais"""
+        frame = self.groups[GROUP_COLUMNS + ['colaboradores']].copy()
+        for column, cents in [(TOTAL_COLUMN, 'total_cents'), (EMPRESA_COLUMN, 'empresa_cents'),
+                              (DESCONTO_COLUMN, 'desconto_cents')]:
+            frame[column] = from_cents(self.groups[cents])
+        return frame
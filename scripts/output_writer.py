@@ -0,0 +1,136 @@
+"""
+Gravação em streaming da planilha VR Mensal (xlsx e CSV em paralelo)
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import csv
+import itertools
+import os
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# Aba da planilha final
+SHEET_NAME = 'VR MENSAL'
+
+# Linhas por bloco enviado aos gravadores
+CHUNK_ROWS = 5000
+
+# Blocos em trânsito por gravador (limita a memória usada pelas filas)
+QUEUE_BLOCKS = 4
+
+# Marcador de fim das filas
+_END = object()
+
+
+def iter_chunks(frames, chunk_rows=CHUNK_ROWS):
+    """Divide um DataFrame (ou um iterável de DataFrames) em blocos de até chunk_rows linhas"""
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    for frame in frames:
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows]
+
+
+def chunk_rows(chunk):
+    """Converte um bloco em tuplas de valores Python (NaN/NaT viram células vazias)"""
+    columns = []
+    for name in chunk.columns:
+        values = chunk[name]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            column = [None if pd.isna(v) else v.to_pydatetime() for v in values]
+        else:
+            array = values.to_numpy(dtype=object)
+            column = [None if v is None or (isinstance(v, float) and np.isnan(v)) or v is pd.NA
+                      else v.item() if isinstance(v, np.generic) else v
+                      for v in array]
+        columns.append(column)
+    return list(zip(*columns))
+
+
+def _xlsx_worker(path, header, blocks, sheet_name):
+    """Grava os blocos com openpyxl em modo write_only (linhas vão direto para o disco)"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(header)
+    for rows in blocks:
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+
+
+def _csv_worker(path, header, blocks):
+    """Grava os blocos em CSV (UTF-8)"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for rows in blocks:
+            writer.writerows(['' if value is None else value for value in row] for row in rows)
+
+
+def write_vr_outputs(frames, xlsx_path, csv_path=None, columns=None,
+                     sheet_name=SHEET_NAME, chunk_rows_count=CHUNK_ROWS):
+    """
+    Grava a planilha VR Mensal em xlsx (e CSV) sem materializar o arquivo em memória.
+
+    frames pode ser o DataFrame final ou um iterável de blocos. Cada bloco é
+    convertido em linhas uma única vez e o mesmo buffer segue para os dois
+    gravadores, que rodam em threads separadas; as filas limitadas fazem o
+    produtor esperar quando um gravador atrasa, então a memória fica em
+    poucos blocos independentemente do número de linhas.
+    Retorna o número de linhas gravadas.
+    """
+    chunks = iter_chunks(frames, chunk_rows_count)
+    first = next(chunks, None)
+    header = list(columns) if columns is not None else (list(first.columns) if first is not None else [])
+
+    for path in [xlsx_path, csv_path]:
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    targets = [(_xlsx_worker, (xlsx_path, header), {'sheet_name': sheet_name})]
+    if csv_path:
+        targets.append((_csv_worker, (csv_path, header), {}))
+
+    errors = []
+    queues = []
+    threads = []
+    for worker, args, kwargs in targets:
+        blocks = queue.Queue(maxsize=QUEUE_BLOCKS)
+
+        def run(worker=worker, args=args, kwargs=kwargs, blocks=blocks):
+            received = iter(blocks.get, _END)
+            try:
+                worker(*args, received, **kwargs)
+            except Exception as e:
+                errors.append(e)
+                # Consumir o restante da fila para não travar o produtor
+                for _ in received:
+                    pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        queues.append(blocks)
+        threads.append(thread)
+
+    total = 0
+    try:
+        if first is not None:
+            for chunk in itertools.chain([first], chunks):
+                rows = chunk_rows(chunk[header] if columns is not None else chunk)
+                total += len(rows)
+                for blocks in queues:
+                    blocks.put(rows)
+    finally:
+        for blocks in queues:
+            blocks.put(_END)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return total
@@ -0,0 +1,97 @@
+"""
+Proporcionalidade de admissões e desligamentos na competência
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import pandas as pd
+
+from column_resolver import (COMUNICADO_DESLIGAMENTO_COLUMN, DATA_ADMISSAO_COLUMN, DATA_DEMISSAO_COLUMN,
+                             MATRICULA_COLUMN, find_matricula_column, normalize_matricula)
+
+# Regra de desligamento: comunicado até este dia não recebe VR
+DESLIGAMENTO_CUTOFF_DAY = 15
+
+# Colunas adicionadas aos colaboradores
+ADMISSAO_COLUMN = 'Admissão'
+DEMISSAO_COLUMN = 'DATA DEMISSÃO'
+COMUNICADO_COLUMN = 'COMUNICADO DE DESLIGAMENTO'
+EXCLUIDO_COLUMN = 'DESLIGADO ATE DIA 15'
+
+
+def dated_source(df, date_column, extra_column=None):
+    """
+    Reduz uma planilha mapeada a (matrícula, data[, extra]) com uma linha por
+    matrícula (a mais recente), pelas colunas canônicas informadas.
+    """
+    columns = ['matricula', 'data', 'extra']
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columns)
+
+    if MATRICULA_COLUMN not in df.columns or date_column not in df.columns:
+        return pd.DataFrame(columns=columns)
+
+    source = pd.DataFrame({
+        'matricula': normalize_matricula(df[MATRICULA_COLUMN]).to_numpy(),
+        'data': pd.to_datetime(df[date_column], errors='coerce').to_numpy(),
+        'extra': df[extra_column].to_numpy() if extra_column in df.columns else None
+    })
+    source = source.dropna(subset=['matricula'])
+    source = source.sort_values('data', kind='mergesort').drop_duplicates('matricula', keep='last')
+    return source
+
+
+def apply_proration(employees, admissoes, desligados, calendar, matricula_columns=('MATRICULA',)):
+    """
+    Junta admissões e desligamentos aos colaboradores por matrícula.
+
+    Cada planilha custa um único merge. As datas entram como janela de
+    admissão/desligamento (os dias proporcionais saem do calendário) e a
+    regra do dia 15 vira a coluna booleana DESLIGADO ATE DIA 15: desligamento
+    comunicado com data até o dia 15 da competência não recebe VR.
+    """
+    result = employees.copy()
+    if result.empty:
+        return result
+
+    # Os colaboradores podem vir da referência final, que mantém os nomes originais
+    matricula_col = next((col for col in matricula_columns if col in result.columns), None)
+    if matricula_col is None:
+        matricula_col = find_matricula_column(result)
+    if matricula_col is None:
+        result[EXCLUIDO_COLUMN] = False
+        return result
+
+    keys = pd.DataFrame({'matricula': normalize_matricula(result[matricula_col]).to_numpy()})
+
+    admissao = dated_source(admissoes, DATA_ADMISSAO_COLUMN)
+    desligamento = dated_source(desligados, DATA_DEMISSAO_COLUMN, COMUNICADO_DESLIGAMENTO_COLUMN)
+
+    joined = keys.merge(
+        admissao[['matricula', 'data']].rename(columns={'data': 'admissao'}),
+        on='matricula', how='left'
+    ).merge(
+        desligamento.rename(columns={'data': 'demissao', 'extra': 'comunicado'}),
+        on='matricula', how='left'
+    )
+
+    # Preservar datas que já venham nos colaboradores (ex.: planilha de referência)
+    for column, values in [(ADMISSAO_COLUMN, joined['admissao']), (DEMISSAO_COLUMN, joined['demissao'])]:
+        values = pd.Series(values.to_numpy(), index=result.index)
+        if column in result.columns:
+            result[column] = pd.to_datetime(result[column], errors='coerce').fillna(values)
+        else:
+            result[column] = values
+    result[COMUNICADO_COLUMN] = joined['comunicado'].to_numpy()
+
+    # Regra do dia 15
+    demissao = result[DEMISSAO_COLUMN]
+    cutoff = pd.Timestamp(calendar.start) + pd.Timedelta(days=DESLIGAMENTO_CUTOFF_DAY - 1)
+    comunicado = result[COMUNICADO_COLUMN].astype(str).str.strip().str.upper().eq('OK')
+    result[EXCLUIDO_COLUMN] = (
+        comunicado
+        & demissao.notna()
+        & (demissao <= cutoff)
+    ).to_numpy()
+
+    return result
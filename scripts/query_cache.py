@@ -0,0 +1,141 @@
+"""
+Cache de respostas do RAG: pergunta exata normalizada e similaridade semântica
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(question):
+    """Normaliza a pergunta: minúsculas, sem acentos, sem pontuação e espaços extras"""
+    text = unicodedata.normalize('NFKD', str(question).lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return ' '.join(text.split())
+
+
+class QueryCache:
+    """
+    Cache de duas camadas para respostas do RAG.
+
+    1. Pergunta normalizada idêntica (dicionário).
+    2. Vizinho mais próximo pelo embedding da pergunta, aceito acima de
+       similarity_threshold (cosseno).
+
+    As entradas guardam os ids dos documentos fonte e a versão do índice
+    que as gerou; expiram por TTL, são descartadas por LRU acima de
+    max_entries e deixam de valer quando o índice muda.
+    """
+
+    def __init__(self, embeddings=None, similarity_threshold=0.95,
+                 max_entries=256, ttl_seconds=86400):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.index_version = None
+
+        self.entries = OrderedDict()
+        self.last_embedding = (None, None)
+        self.stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+
+    def set_index_version(self, index_version):
+        """Registra a versão do índice vetorial; se mudou, as respostas antigas são descartadas"""
+        if index_version != self.index_version:
+            self.entries.clear()
+            self.index_version = index_version
+
+    def remember(self, key, raw):
+        """Normaliza (norma 1) e memoriza o embedding da última pergunta"""
+        vector = np.asarray(raw, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        self.last_embedding = (key, vector)
+        return vector
+
+    def embed(self, question):
+        """Embedding normalizado (norma 1) da pergunta, se houver modelo de embeddings"""
+        if self.embeddings is None:
+            return None
+        key = normalize_question(question)
+        if self.last_embedding[0] == key:
+            return self.last_embedding[1]
+        return self.remember(key, self.embeddings.embed_query(question))
+
+    async def aembed(self, question):
+        """
+        Versão assíncrona de embed, para o laço de eventos.
+
+        Só o modelo de embeddings sai do laço (aembed_query); o cache em si
+        é lido e escrito apenas pela thread do laço.
+        """
+        if self.embeddings is None:
+            return None
+        key = normalize_question(question)
+        if self.last_embedding[0] == key:
+            return self.last_embedding[1]
+        return self.remember(key, await self.embeddings.aembed_query(question))
+
+    def expire(self):
+        """Remove entradas vencidas pelo TTL"""
+        now = time.time()
+        expired = [key for key, entry in self.entries.items()
+                   if now - entry['created_at'] > self.ttl_seconds]
+        for key in expired:
+            del self.entries[key]
+
+    def get(self, question, embedding=None, semantic=True):
+        """
+        Retorna (entrada, tipo de acerto) ou (None, None).
+
+        embedding é o vetor já calculado da pergunta (aembed); sem ele a
+        busca semântica calcula o embedding aqui. semantic=False consulta
+        apenas a pergunta exata.
+        """
+        self.expire()
+        key = normalize_question(question)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.stats['exact_hits'] += 1
+            return entry, 'exact'
+
+        if semantic and self.embeddings is not None and self.entries:
+            keys = [k for k, e in self.entries.items() if e['embedding'] is not None]
+            if keys:
+                vector = self.embed(question) if embedding is None else embedding
+                matrix = np.vstack([self.entries[k]['embedding'] for k in keys])
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    self.entries.move_to_end(keys[best])
+                    self.stats['semantic_hits'] += 1
+                    return self.entries[keys[best]], 'semantic'
+
+        self.stats['misses'] += 1
+        return None, None
+
+    def put(self, question, answer, source_documents, source_ids, embedding=None, semantic=True):
+        """Guarda a resposta com os ids dos documentos fonte (embedding e semantic como em get)"""
+        key = normalize_question(question)
+        if semantic and embedding is None:
+            embedding = self.embed(question)
+        self.entries[key] = {
+            'question': question,
+            'answer': answer,
+            'source_documents': source_documents,
+            'source_ids': list(source_ids),
+            'index_version': self.index_version,
+            'embedding': embedding if semantic else None,
+            'created_at': time.time()
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
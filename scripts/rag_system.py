@@ -4,7 +4,12 @@ Sistema RAG (Retrieval-Augmented Generation) para automação de VR/VA
 Grupo: Synapse 7 - Desafio 4
 """
 
+import asyncio
+import hashlib
+import json
 import os
+import pickle
+from datetime import datetime
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -12,29 +17,92 @@ from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import FAISS
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
+from excel_loader import content_hash
+from embedding_cache import CachedEmbeddings, EmbeddingCache, chunk_hash, chunk_ids
+from hybrid_retriever import HybridSearch, local_embeddings
+from query_cache import QueryCache
+
+# Manifesto gravado junto de cada índice salvo
+INDEX_MANIFEST = 'manifest.json'
 
 class VRRAGSystem:
-    def __init__(self):
+    def __init__(self, llm=None, embeddings=None):
         # Carregar variáveis de ambiente
         load_dotenv()
         
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        self.openai_api_base = os.getenv('OPENAI_API_BASE')
         self.model_name = os.getenv('MODEL_NAME', 'gpt-4o-mini')
         self.chunk_size = int(os.getenv('CHUNK_SIZE', 1000))
         self.chunk_overlap = int(os.getenv('CHUNK_OVERLAP', 200))
+        self.embedding_model = os.getenv('EMBEDDING_MODEL', 'text-embedding-ada-002')
+        self.vectorstore_root = os.getenv('VECTORSTORE_DIR')
+        
+        # Backends: embeddings 'openai' ou 'local' (CPU, sem rede) e busca
+        # 'faiss' (só vetorial) ou 'hybrid' (vetorial + BM25 fundidos por RRF)
+        self.embedding_backend = os.getenv('EMBEDDING_BACKEND', 'openai')
+        self.retriever_backend = os.getenv(
+            'RETRIEVER_BACKEND', 'hybrid' if self.embedding_backend == 'local' else 'faiss'
+        )
+        if embeddings is None and self.embedding_backend == 'local':
+            embeddings, self.embedding_model = local_embeddings()
         
-        # Inicializar componentes
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
-        self.llm = ChatOpenAI(
+        # Consultas concorrentes (query_many)
+        self.query_concurrency = int(os.getenv('QUERY_CONCURRENCY', 4))
+        self.query_timeout = float(os.getenv('QUERY_TIMEOUT', 60))
+        self.query_retries = int(os.getenv('QUERY_RETRIES', 2))
+        
+        # Inicializar componentes (embeddings com cache em disco por chunk).
+        # llm/embeddings podem ser injetados (ex.: modelos falsos locais em testes)
+        # e OPENAI_API_BASE permite apontar para um servidor compatível local.
+        self.embedding_cache_path = os.getenv('EMBEDDING_CACHE', os.path.join('output', 'embedding_cache.sqlite'))
+        self.embeddings = CachedEmbeddings(
+            embeddings or OpenAIEmbeddings(
+                model=self.embedding_model,
+                openai_api_key=self.openai_api_key,
+                openai_api_base=self.openai_api_base
+            ),
+            EmbeddingCache(self.embedding_cache_path, self.embedding_model)
+        )
+        self.llm = llm or ChatOpenAI(
             model_name=self.model_name,
             temperature=0,
-            openai_api_key=self.openai_api_key
+            openai_api_key=self.openai_api_key,
+            openai_api_base=self.openai_api_base
+        )
+        
+        # Cache de respostas (pergunta exata e similaridade semântica)
+        self.query_cache = QueryCache(
+            embeddings=self.embeddings,
+            similarity_threshold=float(os.getenv('QUERY_CACHE_THRESHOLD', 0.95)),
+            max_entries=int(os.getenv('QUERY_CACHE_SIZE', 256)),
+            ttl_seconds=int(os.getenv('QUERY_CACHE_TTL', 86400))
         )
         
         self.vectorstore = None
         self.qa_chain = None
         
-    def load_pdf_context(self, pdf_path):
+    def index_manifest(self, pdf_path):
+        """Descreve as entradas que determinam o índice: documento, chunks e modelo de embeddings"""
+        return {
+            'source': os.path.basename(pdf_path),
+            'sha256': content_hash(pdf_path),
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'embedding_model': self.embedding_model
+        }
+    
+    def index_path(self, pdf_path, manifest, vectorstore_root=None):
+        """Diretório do índice, endereçado pelo hash do manifesto"""
+        key_fields = ['sha256', 'chunk_size', 'chunk_overlap', 'embedding_model']
+        key = json.dumps({field: manifest[field] for field in key_fields}, sort_keys=True)
+        fingerprint = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        
+        root = (vectorstore_root or self.vectorstore_root or
+                os.path.join(os.path.dirname(pdf_path), '..', 'output', 'vectorstore'))
+        return os.path.join(root, fingerprint)
+    
+    def load_pdf_context(self, pdf_path, vectorstore_root=None):
         """Carrega e processa o PDF para o contexto RAG"""
         try:
             # Carregar PDF
@@ -47,32 +115,134 @@ class VRRAGSystem:
                 chunk_overlap=self.chunk_overlap
             )
             texts = text_splitter.split_documents(documents)
+            ids = chunk_ids([text.page_content for text in texts])
+            manifest = self.index_manifest(pdf_path)
             
-            # Criar vectorstore
-            self.vectorstore = FAISS.from_documents(texts, self.embeddings)
+            # Atualizar o índice da revisão anterior ou criar um novo; em ambos
+            # os casos só chunks novos ou alterados passam pelo modelo de embeddings
+            previous_path = self.find_previous_index(pdf_path, manifest, vectorstore_root)
+            if not (previous_path and self.update_vectorstore(previous_path, texts, ids)):
+                self.vectorstore = FAISS.from_documents(texts, self.embeddings, ids=ids)
             
-            # Salvar vectorstore
-            vectorstore_path = os.path.join(os.path.dirname(pdf_path), '..', 'output', 'vectorstore')
+            # Salvar vectorstore com o manifesto das entradas que o geraram
+            manifest['chunks'] = len(texts)
+            manifest['created_at'] = datetime.now().isoformat(timespec='seconds')
+            vectorstore_path = self.index_path(pdf_path, manifest, vectorstore_root)
             os.makedirs(vectorstore_path, exist_ok=True)
             self.vectorstore.save_local(vectorstore_path)
+            with open(os.path.join(vectorstore_path, INDEX_MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            self.query_cache.set_index_version(os.path.basename(vectorstore_path))
             
-            print(f"PDF processado com sucesso. {len(texts)} chunks criados.")
+            print(f"PDF processado com sucesso. {len(texts)} chunks criados "
+                  f"({self.embeddings.stats['misses']} embeddings novos, "
+                  f"{self.embeddings.stats['hits']} do cache).")
             return True
             
         except Exception as e:
             print(f"Erro ao processar PDF: {str(e)}")
             return False
     
-    def load_vectorstore(self, vectorstore_path):
-        """Carrega vectorstore existente"""
+    def find_previous_index(self, pdf_path, manifest, vectorstore_root=None):
+        """Localiza o índice mais recente do mesmo documento com a mesma configuração de chunks"""
+        root = os.path.dirname(self.index_path(pdf_path, manifest, vectorstore_root))
+        if not os.path.isdir(root):
+            return None
+        
+        same_config = ['source', 'chunk_size', 'chunk_overlap', 'embedding_model']
+        candidates = []
+        for name in os.listdir(root):
+            manifest_path = os.path.join(root, name, INDEX_MANIFEST)
+            if not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if all(saved.get(field) == manifest[field] for field in same_config):
+                candidates.append((saved.get('created_at', ''), os.path.join(root, name)))
+        
+        return max(candidates)[1] if candidates else None
+    
+    def update_vectorstore(self, previous_path, texts, ids):
+        """
+        Reindexa de forma incremental a partir do índice anterior.
+        
+        Chunks removidos do documento saem do índice e apenas os chunks novos
+        ou alterados (ids por hash de conteúdo) são embutidos e adicionados.
+        """
+        if not self.load_vectorstore(previous_path, mmap=False):
+            return False
+        
+        existing = set(self.vectorstore.index_to_docstore_id.values())
+        current = set(ids)
+        removed = list(existing - current)
+        added = [(text, doc_id) for text, doc_id in zip(texts, ids) if doc_id not in existing]
+        
+        if removed:
+            self.vectorstore.delete(removed)
+        if added:
+            self.vectorstore.add_documents(
+                [text for text, _ in added],
+                ids=[doc_id for _, doc_id in added]
+            )
+        
+        print(f"Índice atualizado de forma incremental: {len(added)} chunks adicionados, "
+              f"{len(removed)} removidos.")
+        return True
+    
+    def load_vectorstore(self, vectorstore_path, mmap=True):
+        """Carrega vectorstore existente (índice FAISS mapeado em memória quando possível)"""
         try:
-            self.vectorstore = FAISS.load_local(vectorstore_path, self.embeddings)
+            if mmap:
+                import faiss
+                try:
+                    index = faiss.read_index(
+                        os.path.join(vectorstore_path, 'index.faiss'),
+                        faiss.IO_FLAG_MMAP
+                    )
+                except (RuntimeError, AttributeError):
+                    # Tipo de índice sem suporte a mmap: leitura normal
+                    index = faiss.read_index(os.path.join(vectorstore_path, 'index.faiss'))
+                
+                # Índice gerado por este sistema (validado pelo manifesto)
+                with open(os.path.join(vectorstore_path, 'index.pkl'), 'rb') as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+                self.vectorstore = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+            else:
+                self.vectorstore = FAISS.load_local(
+                    vectorstore_path,
+                    self.embeddings,
+                    allow_dangerous_deserialization=True
+                )
+            self.query_cache.set_index_version(os.path.basename(os.path.normpath(vectorstore_path)))
             print("Vectorstore carregado com sucesso.")
             return True
         except Exception as e:
             print(f"Erro ao carregar vectorstore: {str(e)}")
             return False
     
+    def load_or_build_vectorstore(self, pdf_path, vectorstore_root=None):
+        """
+        Carrega o índice salvo para este PDF e configuração; recria só se algo mudou.
+        
+        O índice é procurado pelo hash do PDF, CHUNK_SIZE, CHUNK_OVERLAP e
+        modelo de embeddings, então um índice desatualizado nunca é usado e
+        um índice válido nunca é recalculado.
+        """
+        manifest = self.index_manifest(pdf_path)
+        vectorstore_path = self.index_path(pdf_path, manifest, vectorstore_root)
+        manifest_path = os.path.join(vectorstore_path, INDEX_MANIFEST)
+        
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if all(saved.get(field) == value for field, value in manifest.items() if field != 'source'):
+                if self.load_vectorstore(vectorstore_path):
+                    print(f"Vectorstore existente carregado ({saved.get('chunks', '?')} chunks).")
+                    return True
+        
+        print("Vectorstore inexistente ou desatualizado. Criando novo índice...")
+        return self.load_pdf_context(pdf_path, vectorstore_root)
+    
     def setup_qa_chain(self, custom_prompt=None):
         """Configura a cadeia de QA com prompt personalizado"""
         if not self.vectorstore:
@@ -97,11 +267,14 @@ class VRRAGSystem:
             input_variables=["context", "question"]
         )
         
+        # Busca só vetorial ou híbrida (BM25 sobre os mesmos chunks)
+        search = HybridSearch(self.vectorstore) if self.retriever_backend == 'hybrid' else self.vectorstore
+        
         # Criar cadeia de QA
         self.qa_chain = RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(search_kwargs={"k": 3}),
+            retriever=search.as_retriever(search_kwargs={"k": 3}),
             chain_type_kwargs={"prompt": prompt},
             return_source_documents=True
         )
@@ -113,15 +286,113 @@ class VRRAGSystem:
         if not self.qa_chain:
             raise ValueError("Cadeia de QA não foi configurada. Execute setup_qa_chain() primeiro.")
         
+        # Respostas já dadas para a mesma pergunta (ou uma muito parecida)
+        cached, hit = self.query_cache.get(question)
+        if cached:
+            return {
+                "answer": cached["answer"],
+                "source_documents": cached["source_documents"],
+                "source_ids": cached["source_ids"],
+                "cached": hit
+            }
+        
         try:
             result = self.qa_chain({"query": question})
+            source_ids = [chunk_hash(doc.page_content) for doc in result["source_documents"]]
+            self.query_cache.put(question, result["result"], result["source_documents"], source_ids)
             return {
                 "answer": result["result"],
-                "source_documents": result["source_documents"]
+                "source_documents": result["source_documents"],
+                "source_ids": source_ids,
+                "cached": None
             }
         except Exception as e:
             print(f"Erro ao processar pergunta: {str(e)}")
             return None
+    
+    async def aquery(self, question, timeout=None, retries=None):
+        """
+        Versão assíncrona de query, com timeout por chamada e novas tentativas.
+        
+        Retorna o mesmo dicionário de query, com o campo "error" preenchido
+        (e "answer" vazio) quando todas as tentativas falham.
+        """
+        if not self.qa_chain:
+            raise ValueError("Cadeia de QA não foi configurada. Execute setup_qa_chain() primeiro.")
+        
+        timeout = self.query_timeout if timeout is None else timeout
+        retries = self.query_retries if retries is None else retries
+        
+        # O embedding da pergunta é calculado uma vez, fora do laço, e serve à
+        # busca e à gravação no cache; sem ele vale apenas o cache exato
+        vector, semantic = None, True
+        try:
+            vector = await self.query_cache.aembed(question)
+        except Exception as e:
+            semantic = False
+            print(f"Aviso: embedding da pergunta indisponível ({e}); usando apenas o cache exato")
+        
+        cached, hit = self.query_cache.get(question, embedding=vector, semantic=semantic)
+        if cached:
+            return {
+                "question": question,
+                "answer": cached["answer"],
+                "source_documents": cached["source_documents"],
+                "source_ids": cached["source_ids"],
+                "cached": hit,
+                "error": None
+            }
+        
+        error = None
+        for attempt in range(retries + 1):
+            try:
+                result = await asyncio.wait_for(
+                    self.qa_chain.ainvoke({"query": question}),
+                    timeout=timeout
+                )
+                source_ids = [chunk_hash(doc.page_content) for doc in result["source_documents"]]
+                self.query_cache.put(question, result["result"], result["source_documents"], source_ids,
+                                     embedding=vector, semantic=semantic)
+                return {
+                    "question": question,
+                    "answer": result["result"],
+                    "source_documents": result["source_documents"],
+                    "source_ids": source_ids,
+                    "cached": None,
+                    "error": None
+                }
+            except asyncio.TimeoutError:
+                error = f"Tempo limite de {timeout}s excedido"
+            except Exception as e:
+                error = str(e)
+            
+            if attempt < retries:
+                # Espera exponencial entre tentativas
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        
+        print(f"Erro ao processar pergunta: {error}")
+        return {
+            "question": question,
+            "answer": None,
+            "source_documents": [],
+            "source_ids": [],
+            "cached": None,
+            "error": error
+        }
+    
+    async def aquery_many(self, questions, concurrency=None, timeout=None, retries=None):
+        """Responde várias perguntas concorrentemente, limitadas por um semáforo"""
+        semaphore = asyncio.Semaphore(concurrency or self.query_concurrency)
+        
+        async def bounded(question):
+            async with semaphore:
+                return await self.aquery(question, timeout=timeout, retries=retries)
+        
+        return await asyncio.gather(*(bounded(question) for question in questions))
+    
+    def query_many(self, questions, concurrency=None, timeout=None, retries=None):
+        """Responde uma lista de perguntas em paralelo (resultados na ordem da lista)"""
+        return asyncio.run(self.aquery_many(questions, concurrency, timeout, retries))
 
 def main():
     """Função principal para testar o sistema RAG"""
@@ -130,8 +401,8 @@ def main():
     # Caminho para o PDF
     pdf_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'Desafio4-Descrição.pdf')
     
-    # Carregar PDF e criar vectorstore
-    if rag_system.load_pdf_context(pdf_path):
+    # Carregar índice salvo ou criar vectorstore
+    if rag_system.load_or_build_vectorstore(pdf_path):
         # Configurar cadeia de QA
         rag_system.setup_qa_chain()
         
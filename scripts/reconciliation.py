@@ -0,0 +1,226 @@
+"""
+Conciliação da planilha gerada com uma planilha de referência do VR Mensal
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from column_resolver import normalize_matricula, normalize_name
+from money import from_cents, to_cents
+from sindicato_index import canonical_names
+
+# Campos conciliados: nomes normalizados aceitos, em ordem de preferência
+# (planilha gerada, VRMENSAL, referência final e nomes canônicos da carga)
+FIELDS = {
+    'matricula': ['MATRICULA', 'CADASTRO'],
+    'sindicato': ['SINDICATO MAPEADO', 'SINDICATO', 'SINDICATO DO COLABORADOR', 'SINDICATO_Y', 'SINDICATO_X'],
+    'dias': ['DIAS UTEIS', 'DIAS UTEIS CALCULADOS', 'DIAS'],
+    'valor_diario': ['VALOR DO VR', 'VALOR VR DIARIO', 'VALOR DIARIO VR'],
+    'total': ['VALOR TOTAL', 'TOTAL'],
+    'empresa': ['VALOR EMPRESA (80%)', 'CUSTO EMPRESA'],
+    'desconto': ['VALOR DESCONTADO (20%)', 'DESCONTO PROFISSIONAL']
+}
+
+# Campos comparados e os que são valores em centavos
+COMPARED_FIELDS = ['dias', 'valor_diario', 'total', 'empresa', 'desconto']
+MONEY_FIELDS = ['valor_diario', 'total', 'empresa', 'desconto']
+
+# Situação de cada matrícula na conciliação
+ADICIONADO = 'adicionado'
+AUSENTE = 'ausente'
+DIVERGENTE = 'divergente'
+IGUAL = 'igual'
+SITUACOES = [ADICIONADO, AUSENTE, DIVERGENTE, IGUAL]
+
+# Linhas iniciais procuradas pelo cabeçalho (títulos e totais acima dele)
+HEADER_SEARCH_ROWS = 20
+
+
+def reconciliation_enabled():
+    """Indica se a planilha gerada é conciliada com as referências carregadas (VR_RECONCILE=0 desabilita)"""
+    return os.getenv('VR_RECONCILE', '1') != '0'
+
+
+def read_sheet(path, sheet_name=None):
+    """
+    Lê uma planilha (xlsx, CSV ou Parquet) para a conciliação.
+
+    No xlsx o cabeçalho é a primeira linha com a coluna de matrícula entre
+    as HEADER_SEARCH_ROWS iniciais (ex.: VRMENSAL, com o total geral acima),
+    sem reler o arquivo.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return pd.read_csv(path)
+    if extension == '.parquet':
+        return pd.read_parquet(path)
+
+    raw = pd.read_excel(path, sheet_name=sheet_name or 0, header=None)
+    for position in range(min(len(raw), HEADER_SEARCH_ROWS)):
+        names = [normalize_name(value) for value in raw.iloc[position] if pd.notna(value)]
+        if any(name in FIELDS['matricula'] for name in names):
+            frame = raw.iloc[position + 1:].reset_index(drop=True)
+            frame.columns = [value if pd.notna(value) else f"Unnamed: {i}"
+                             for i, value in enumerate(raw.iloc[position])]
+            return frame
+    raise ValueError(f"Coluna de matrícula não encontrada em {path}")
+
+
+def normalize_sheet(df):
+    """
+    Reduz uma planilha aos campos conciliados, com uma linha por matrícula.
+
+    Valores viram centavos int64 e sindicatos o nome canônico; campos
+    ausentes ficam nulos e não são comparados. Retorna a planilha reduzida
+    e o número de matrículas repetidas (vale a primeira ocorrência).
+    """
+    positions = {}
+    for col in df.columns:
+        positions.setdefault(normalize_name(col), col)
+    column = {field: next((positions[name] for name in names if name in positions), None)
+              for field, names in FIELDS.items()}
+    if column['matricula'] is None:
+        raise ValueError("Planilha sem coluna de matrícula")
+
+    frame = pd.DataFrame({'matricula': normalize_matricula(df[column['matricula']]).to_numpy()})
+    frame['sindicato'] = (canonical_names(df[column['sindicato']]) if column['sindicato'] is not None
+                          else None)
+    for field in COMPARED_FIELDS:
+        if column[field] is None:
+            frame[field] = pd.array([pd.NA] * len(df), dtype='Int64')
+            continue
+        values = pd.to_numeric(pd.Series(df[column[field]].to_numpy()), errors='coerce')
+        if field in MONEY_FIELDS:
+            converted = pd.Series(to_cents(values), dtype='Int64')
+        else:
+            converted = values.round().astype('Int64')
+        frame[field] = converted.mask(values.isna())
+
+    frame = frame.dropna(subset=['matricula'])
+    duplicates = int(frame['matricula'].duplicated().sum())
+    return frame.drop_duplicates('matricula'), duplicates
+
+
+class Reconciliation:
+    """
+    Resultado da conciliação por matrícula entre a planilha gerada e a referência.
+
+    rows guarda uma linha por matrícula (hash join externo) com a situação e
+    as diferenças de cada campo em centavos; by_sindicato agrega contagens e
+    totais por sindicato a partir do mesmo join.
+    """
+
+    def __init__(self, rows, duplicates):
+        self.rows = rows
+        self.duplicates = duplicates
+        self.by_sindicato = self._aggregate(rows)
+
+    @classmethod
+    def from_frames(cls, generated, reference):
+        """Concilia duas planilhas em qualquer um dos layouts conhecidos (FIELDS)"""
+        left, left_duplicates = normalize_sheet(generated)
+        right, right_duplicates = normalize_sheet(reference)
+
+        rows = left.merge(right, on='matricula', how='outer', suffixes=('_gerado', '_referencia'),
+                          indicator=True, sort=False)
+        divergent = np.zeros(len(rows), dtype=bool)
+        for field in COMPARED_FIELDS:
+            difference = rows[f"{field}_gerado"] - rows[f"{field}_referencia"]
+            rows[f"{field}_diferenca"] = difference
+            divergent |= (difference.fillna(0) != 0).to_numpy(dtype=bool)
+
+        side = rows.pop('_merge').astype(str).to_numpy()
+        situacao = np.where(side == 'left_only', ADICIONADO,
+                            np.where(side == 'right_only', AUSENTE,
+                                     np.where(divergent, DIVERGENTE, IGUAL)))
+        rows.insert(1, 'situacao', pd.Categorical(situacao, categories=SITUACOES))
+        sindicato = rows.pop('sindicato_gerado').fillna(rows.pop('sindicato_referencia')).fillna('SEM SINDICATO')
+        rows.insert(1, 'sindicato', sindicato.astype(str))
+        return cls(rows, {'gerado': left_duplicates, 'referencia': right_duplicates})
+
+    @staticmethod
+    def _aggregate(rows):
+        """Contagens por situação e totais (centavos) por sindicato"""
+        counts = pd.crosstab(rows['sindicato'], rows['situacao']).reindex(columns=SITUACOES, fill_value=0)
+        totals = rows.groupby('sindicato')[['total_gerado', 'total_referencia']].sum(min_count=0)
+        aggregate = counts.join(totals.astype('int64'))
+        aggregate['total_diferenca'] = aggregate['total_gerado'] - aggregate['total_referencia']
+        return aggregate.reset_index()
+
+    def counts(self):
+        """Matrículas por situação"""
+        return {situacao: int(count) for situacao, count
+                in self.rows['situacao'].value_counts().reindex(SITUACOES, fill_value=0).items()}
+
+    def summary(self):
+        """Contagens, totais em reais e matrículas repetidas (log e linha de comando)"""
+        total_gerado = int(self.by_sindicato['total_gerado'].sum())
+        total_referencia = int(self.by_sindicato['total_referencia'].sum())
+        return {
+            **self.counts(),
+            'total_gerado': total_gerado / 100,
+            'total_referencia': total_referencia / 100,
+            'total_diferenca': (total_gerado - total_referencia) / 100,
+            'repetidas_gerado': self.duplicates['gerado'],
+            'repetidas_referencia': self.duplicates['referencia']
+        }
+
+    def differences(self):
+        """Matrículas adicionadas, ausentes ou divergentes, com valores em reais"""
+        differences = self.rows[self.rows['situacao'] != IGUAL].copy()
+        for column in differences.columns:
+            if any(column.startswith(f"{field}_") for field in MONEY_FIELDS):
+                cents = differences[column]
+                reais = from_cents(cents.fillna(0).to_numpy(dtype=np.int64))
+                differences[column] = pd.Series(reais, index=cents.index).where(cents.notna())
+        return differences
+
+    def sindicato_frame(self):
+        """Agregados por sindicato com totais em reais"""
+        frame = self.by_sindicato.copy()
+        for column in ['total_gerado', 'total_referencia', 'total_diferenca']:
+            frame[column] = from_cents(frame[column])
+        return frame
+
+    def write(self, prefix):
+        """Grava as diferenças e os agregados por sindicato em CSV (prefix_diferencas.csv, prefix_sindicatos.csv)"""
+        os.makedirs(os.path.dirname(prefix) or '.', exist_ok=True)
+        paths = (f"{prefix}_diferencas.csv", f"{prefix}_sindicatos.csv")
+        self.differences().to_csv(paths[0], index=False)
+        self.sindicato_frame().to_csv(paths[1], index=False)
+        return paths
+
+
+def main(argv=None):
+    """Concilia a planilha gerada com a referência (código de saída 1 quando há diferenças)"""
+    parser = argparse.ArgumentParser(description="Conciliação da planilha de VR gerada com uma referência")
+    parser.add_argument('gerado', help="planilha gerada (xlsx, CSV ou Parquet)")
+    parser.add_argument('referencia', help="planilha de referência (ex.: data/VRMENSAL05.2025.xlsx)")
+    parser.add_argument('--aba', default=None, help="aba da referência (padrão: a primeira)")
+    parser.add_argument('--saida', default=os.path.join('output', 'reconciliacao'),
+                        help="prefixo dos CSVs de diferenças e de agregados por sindicato")
+    args = parser.parse_args(argv)
+
+    reconciliation = Reconciliation.from_frames(read_sheet(args.gerado), read_sheet(args.referencia, args.aba))
+    summary = reconciliation.summary()
+    differences_path, sindicatos_path = reconciliation.write(args.saida)
+
+    print("\n=== CONCILIAÇÃO ===")
+    print(f"- Adicionados: {summary[ADICIONADO]} | Ausentes: {summary[AUSENTE]} | "
+          f"Divergentes: {summary[DIVERGENTE]} | Iguais: {summary[IGUAL]}")
+    print(f"- Total gerado: R$ {summary['total_gerado']:,.2f} | Referência: R$ {summary['total_referencia']:,.2f} | "
+          f"Diferença: R$ {summary['total_diferenca']:,.2f}")
+    print(reconciliation.sindicato_frame().to_string(index=False))
+    print(f"\nDiferenças salvas em: {differences_path}")
+    print(f"Agregados por sindicato salvos em: {sindicatos_path}")
+    return 1 if summary[ADICIONADO] or summary[AUSENTE] or summary[DIVERGENTE] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Log estruturado e com níveis do processamento (agregados compactos por padrão)
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+LOGGER_NAME = 'vr'
+
+# Linhas de exemplo mostradas por DataFrame no modo detalhado
+DEFAULT_SAMPLE_ROWS = 5
+
+
+def verbose_enabled():
+    """Indica se o log detalhado (nível DEBUG, com amostras) está ligado (VR_VERBOSE=1)"""
+    return os.getenv('VR_VERBOSE', '0') == '1'
+
+
+def log_level():
+    """Nível do log: VR_LOG_LEVEL (DEBUG, INFO, WARNING...) ou DEBUG com VR_VERBOSE=1"""
+    name = os.getenv('VR_LOG_LEVEL', '').strip().upper()
+    if name:
+        level = logging.getLevelName(name)
+        return level if isinstance(level, int) else logging.INFO
+    return logging.DEBUG if verbose_enabled() else logging.INFO
+
+
+def log_format():
+    """Formato do log: texto (padrão) ou json, uma linha por evento (VR_LOG_FORMAT)"""
+    return 'json' if os.getenv('VR_LOG_FORMAT', 'texto').strip().lower() == 'json' else 'texto'
+
+
+def sample_rows():
+    """Linhas de exemplo por DataFrame no modo detalhado (VR_LOG_SAMPLE)"""
+    try:
+        return max(0, int(os.getenv('VR_LOG_SAMPLE', DEFAULT_SAMPLE_ROWS)))
+    except ValueError:
+        return DEFAULT_SAMPLE_ROWS
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Mensagem seguida dos campos do evento (extra={'fields': {...}}).
+
+    No formato texto os campos viram "chave=valor"; no formato json cada
+    evento é um objeto com horário, nível, origem, mensagem e campos.
+    """
+
+    def __init__(self, fmt='texto'):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+        if self.fmt == 'json':
+            event = {
+                'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                'nivel': record.levelname,
+                'origem': record.name,
+                'mensagem': record.getMessage()
+            }
+            event.update(fields)
+            return json.dumps(event, ensure_ascii=False, default=str)
+
+        message = record.getMessage()
+        if fields:
+            message = f"{message} | " + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if record.levelno >= logging.WARNING:
+            message = f"[{record.levelname}] {message}"
+        return message
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Escreve no sys.stdout corrente (respeita contextlib.redirect_stdout do modo em lote)"""
+
+    def emit(self, record):
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+def configure_logging(level=None, fmt=None):
+    """Configura (ou reconfigura) o logger raiz do processamento"""
+    logger = logging.getLogger(LOGGER_NAME)
+    handler = next((h for h in logger.handlers if isinstance(h, StdoutHandler)), None)
+    if handler is None:
+        handler = StdoutHandler()
+        logger.addHandler(handler)
+        logger.propagate = False
+    handler.setFormatter(StructuredFormatter(fmt or log_format()))
+    logger.setLevel(log_level() if level is None else level)
+    return logger
+
+
+def get_logger(name):
+    """Logger de um módulo, abaixo do logger do processamento"""
+    if not logging.getLogger(LOGGER_NAME).handlers:
+        configure_logging()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def event(logger, level, message, **fields):
+    """Registra um evento com campos estruturados"""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={'fields': fields})
+
+
+def frame_summary(df):
+    """Agregados compactos de um DataFrame: linhas, colunas e memória"""
+    if df is None:
+        return {'linhas': 0, 'colunas': 0, 'memoria_mb': 0.0}
+    return {
+        'linhas': int(len(df)),
+        'colunas': int(len(df.columns)),
+        'memoria_mb': round(df.memory_usage(index=False).sum() / (1024 * 1024), 2)
+    }
+
+
+def log_frame(logger, message, df, level=logging.INFO):
+    """
+    Resumo do DataFrame no nível pedido; colunas e uma amostra de linhas
+    só no modo detalhado (DEBUG), para não formatar tabelas inteiras.
+    """
+    event(logger, level, message, **frame_summary(df))
+    if df is not None and logger.isEnabledFor(logging.DEBUG):
+        event(logger, logging.DEBUG, f"{message}: colunas", colunas=[str(col) for col in df.columns])
+        rows = sample_rows()
+        if rows and not df.empty:
+            logger.debug(f"{message}: amostra de {min(rows, len(df))} linhas\n"
+                         f"{df.head(rows).to_string(index=False)}")
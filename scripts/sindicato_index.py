@@ -0,0 +1,151 @@
+"""
+Dimensão de sindicatos da competência: id estável, nomes normalizados, valor e dias úteis
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import numpy as np
+import pandas as pd
+
+from business_calendar import ESTADOS, resolve_uf
+from column_resolver import DIAS_UTEIS_COLUMN, ESTADO_COLUMN, SINDICATO_COLUMN, VALOR_COLUMN, normalize_name
+
+# Sindicato sem correspondência nas bases
+DEFAULT_SINDICATO = 'PADRÃO'
+
+
+def sindicato_key(name):
+    """Chave canônica de um sindicato: a UF (sigla ou nome do estado) ou o nome normalizado"""
+    uf = resolve_uf(name)
+    return uf if uf else normalize_name(name)
+
+
+def canonical_names(sindicatos):
+    """Nome canônico de cada sindicato (estado por extenso quando há UF), resolvido uma vez por nome distinto"""
+    codes, uniques = pd.factorize(pd.Series(sindicatos, dtype=object))
+    names = np.array([ESTADOS.get(resolve_uf(name), str(name).strip()) for name in uniques]
+                     + [DEFAULT_SINDICATO], dtype=object)
+    return names[codes]
+
+
+class SindicatoIndex:
+    """
+    Tabela de dimensão dos sindicatos, montada uma vez por competência.
+
+    Cada sindicato recebe um id inteiro estável (ordem da chave canônica:
+    UF ou nome normalizado) e todos os apelidos encontrados em ATIVOS,
+    Basesindicatoxvalor e Basediasuteis apontam para ele. Valor diário e
+    dias úteis ficam em arrays contíguos; o último id é o sindicato padrão.
+    Os atributos de qualquer quantidade de colaboradores saem de um único
+    take pelos ids.
+    """
+
+    def __init__(self, keys, names, valores, dias, aliases):
+        self.keys = list(keys) + [DEFAULT_SINDICATO]
+        self.names = np.array(list(names) + [DEFAULT_SINDICATO], dtype=object)
+        self.valores = np.asarray(list(valores) + [np.nan], dtype=np.float64)
+        self.dias = np.asarray(list(dias) + [np.nan], dtype=np.float64)
+        self.default_id = len(self.keys) - 1
+        self.aliases = dict(aliases)
+
+    @classmethod
+    def from_sources(cls, data):
+        """Monta a dimensão a partir de ATIVOS, da base de valores e da base de dias úteis"""
+        names = {}
+        valores = {}
+        dias = {}
+        aliases = {}
+
+        def register(name):
+            if name is None or (isinstance(name, float) and np.isnan(name)) or not str(name).strip():
+                return None
+            # Linhas só com espaços de largura zero (ex.: rodapé da base de valores)
+            alias = normalize_name(name)
+            if not alias.strip('\u200b'):
+                return None
+            key = aliases.setdefault(alias, sindicato_key(name))
+            uf = key if key in ESTADOS else None
+            names.setdefault(key, ESTADOS[uf] if uf else str(name).strip())
+            return key
+
+        ativos = data.get('ativos')
+        if ativos is not None and not ativos.empty:
+            if SINDICATO_COLUMN in ativos.columns:
+                for name in pd.unique(ativos[SINDICATO_COLUMN].dropna()):
+                    register(name)
+
+        for source, name_columns, value_column, target in [
+            ('base_sindicato', [SINDICATO_COLUMN, ESTADO_COLUMN], VALOR_COLUMN, valores),
+            ('base_dias_uteis', [SINDICATO_COLUMN], DIAS_UTEIS_COLUMN, dias)
+        ]:
+            df = data.get(source)
+            if df is None or df.empty:
+                continue
+            name_col = next((col for col in name_columns if col in df.columns), None)
+            value_col = value_column if value_column in df.columns else None
+            if name_col is None or value_col is None:
+                continue
+            values = pd.to_numeric(df[value_col], errors='coerce')
+            for name, value in zip(df[name_col], values):
+                key = register(name)
+                if key is not None and pd.notna(value):
+                    target.setdefault(key, float(value))
+
+        keys = sorted(names)
+        return cls(
+            keys,
+            [names[key] for key in keys],
+            [valores.get(key, np.nan) for key in keys],
+            [dias.get(key, np.nan) for key in keys],
+            aliases
+        )
+
+    def __len__(self):
+        return len(self.keys) - 1
+
+    def resolve(self, sindicatos):
+        """Ids dos sindicatos (nomes em qualquer grafia); desconhecidos e vazios vão para o padrão"""
+        codes, uniques = pd.factorize(pd.Series(sindicatos, dtype=object), use_na_sentinel=True)
+        positions = {key: position for position, key in enumerate(self.keys)}
+        ids = np.array([
+            positions.get(self.aliases.get(normalize_name(name)) or sindicato_key(name), self.default_id)
+            for name in uniques
+        ] + [self.default_id], dtype=np.int64)
+        return ids[codes]
+
+    def lookup(self, sindicatos, valores=None, dias=None):
+        """
+        Nome canônico, valor diário e dias úteis de cada colaborador (um take por atributo).
+
+        valores e dias são tabelas por nome usadas só onde a dimensão não
+        tem o atributo (ex.: valores padrão quando a base está vazia).
+        """
+        sindicatos = pd.Series(sindicatos, dtype=object)
+        ids = self.resolve(sindicatos)
+        result = pd.DataFrame({
+            'Sindicato': self.names[ids],
+            'valor': self.valores[ids],
+            'dias': self.dias[ids]
+        }, index=sindicatos.index)
+        for column, fallback in [('valor', valores), ('dias', dias)]:
+            if fallback:
+                result[column] = result[column].fillna(pd.to_numeric(sindicatos.map(fallback), errors='coerce'))
+        return result
+
+    def valores_dict(self):
+        """Valor diário por nome canônico (sindicatos com valor na base)"""
+        return {name: value for name, value in zip(self.names[:-1], self.valores[:-1]) if not np.isnan(value)}
+
+    def dias_dict(self):
+        """Dias úteis por nome canônico (sindicatos com dias na base)"""
+        return {name: int(value) for name, value in zip(self.names[:-1], self.dias[:-1]) if not np.isnan(value)}
+
+    def to_frame(self):
+        """Tabela de dimensão (id, chave, nome, valor, dias) para inspeção"""
+        return pd.DataFrame({
+            'id': np.arange(len(self.keys)),
+            'chave': self.keys,
+            'Sindicato': self.names,
+            'valor': self.valores,
+            'dias': self.dias
+        })
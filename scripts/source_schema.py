@@ -0,0 +1,146 @@
+"""
+Esquema tipado das planilhas de entrada (categorias, inteiros anuláveis e datas)
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from column_resolver import normalize_name
+
+# Tipos do esquema
+MATRICULA = 'Int32'
+DIAS = 'Int32'
+DATA = 'datetime64[ns]'
+CATEGORIA = 'category'
+VALOR = 'float64'
+
+# Tipos declarados por planilha, pelo nome canônico da coluna (SOURCE_COLUMNS) ou,
+# fora do mapa, pelo nome normalizado (normalize_name); colunas fora do esquema
+# (observações livres) ficam como foram lidas
+SOURCE_SCHEMAS = {
+    'ativos': {
+        'MATRICULA': MATRICULA,
+        'EMPRESA': 'Int32',
+        'TITULO DO CARGO': CATEGORIA,
+        'DESC. SITUACAO': CATEGORIA,
+        'SINDICATO': CATEGORIA
+    },
+    'ferias': {
+        'MATRICULA': MATRICULA,
+        'DESC. SITUACAO': CATEGORIA,
+        'DIAS DE FERIAS': DIAS
+    },
+    'desligados': {
+        'MATRICULA': MATRICULA,
+        'DATA DEMISSAO': DATA,
+        'COMUNICADO DE DESLIGAMENTO': CATEGORIA
+    },
+    'admissao': {
+        'MATRICULA': MATRICULA,
+        'ADMISSAO': DATA,
+        'CARGO': CATEGORIA
+    },
+    'afastamentos': {
+        'MATRICULA': MATRICULA,
+        'DESC. SITUACAO': CATEGORIA
+    },
+    'aprendiz': {
+        'MATRICULA': MATRICULA,
+        'TITULO DO CARGO': CATEGORIA
+    },
+    'estagio': {
+        'MATRICULA': MATRICULA,
+        'TITULO DO CARGO': CATEGORIA
+    },
+    'exterior': {
+        'MATRICULA': MATRICULA,
+        'VALOR': VALOR
+    },
+    'base_sindicato': {
+        'ESTADO': CATEGORIA,
+        'SINDICATO': CATEGORIA,
+        'VALOR': VALOR
+    },
+    'base_dias_uteis': {
+        'SINDICATO': CATEGORIA,
+        'DIAS UTEIS': DIAS
+    },
+    'vr_mensal': {
+        'MATRICULA': MATRICULA,
+        'ADMISSAO': DATA,
+        'SINDICATO DO COLABORADOR': CATEGORIA,
+        'COMPETENCIA': DATA,
+        'DIAS': DIAS,
+        'VALOR DIARIO VR': VALOR,
+        'TOTAL': VALOR,
+        'CUSTO EMPRESA': VALOR,
+        'DESCONTO PROFISSIONAL': VALOR
+    },
+    'vr_final_ref': {
+        'MATRICULA': MATRICULA,
+        'SINDICATO': CATEGORIA,
+        'SINDICATO MAPEADO': CATEGORIA,
+        'DIAS UTEIS CALCULADOS': DIAS,
+        'VALOR VR DIARIO': VALOR,
+        'STATUS': CATEGORIA
+    }
+}
+
+INT32_RANGE = (np.iinfo(np.int32).min, np.iinfo(np.int32).max)
+
+
+def schema_enabled():
+    """Indica se o esquema tipado é aplicado na carga (VR_SCHEMA=0 desabilita)"""
+    return os.getenv('VR_SCHEMA', '1') != '0'
+
+
+def cast_column(values, dtype):
+    """
+    Converte a coluna para o tipo declarado sem perder valores.
+
+    Se algum valor preenchido não tiver representação no tipo (texto em
+    coluna numérica, número fracionário ou fora da faixa em Int32, data
+    inválida), a coluna é mantida como foi lida.
+    """
+    if dtype == CATEGORIA:
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype(CATEGORIA)
+
+    if dtype == DATA:
+        # Números não são datas (o Excel já entrega datas como datetime)
+        if pd.api.types.is_numeric_dtype(values):
+            return values
+        converted = pd.to_datetime(values, errors='coerce')
+    else:
+        converted = pd.to_numeric(values, errors='coerce')
+    if (converted.isna() & values.notna()).any():
+        return values
+    if dtype == DATA or dtype == VALOR:
+        return converted.astype(dtype)
+
+    filled = converted.dropna()
+    if ((filled % 1) != 0).any() or not filled.between(*INT32_RANGE).all():
+        return values
+    return converted.astype(dtype)
+
+
+def apply_schema(df, schema):
+    """Aplica o esquema da planilha (colunas casadas pelo nome normalizado)"""
+    if df is None or df.empty or not schema:
+        return df
+    typed = df.copy(deep=False)
+    for col in df.columns:
+        dtype = schema.get(normalize_name(col))
+        if dtype is not None:
+            typed[col] = cast_column(df[col], dtype)
+    return typed
+
+
+def memory_mb(df):
+    """Memória ocupada pelo DataFrame (MB, contando o conteúdo dos textos)"""
+    if df is None:
+        return 0.0
+    return df.memory_usage(index=False, deep=True).sum() / (1024 * 1024)
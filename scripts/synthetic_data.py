@@ -0,0 +1,190 @@
+"""
+Gerador de planilhas sintéticas de entrada em qualquer escala
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from excel_loader import files_for_competencia
+from output_writer import chunk_rows, iter_chunks
+
+# Sindicatos da amostra e sua participação no quadro
+SINDICATOS = {
+    'SINDPPD RS - SINDICATO DOS TRAB. EM PROC. DE DADOS RIO GRANDE DO SUL': 0.63,
+    'SINDPD SP - SIND.TRAB.EM PROC DADOS E EMPR.EMPRESAS PROC DADOS ESTADO DE SP.': 0.23,
+    'SITEPD PR - SIND DOS TRAB EM EMPR PRIVADAS DE PROC DE DADOS DE CURITIBA E REGIAO METROPOLITANA': 0.08,
+    'SINDPD RJ - SINDICATO PROFISSIONAIS DE PROC DADOS DO RIO DE JANEIRO': 0.06
+}
+
+# Valor diário por estado e dias úteis por sindicato (mesmo formato das bases reais)
+VALORES_ESTADO = {'Paraná': 35.0, 'Rio de Janeiro': 35.0, 'Rio Grande do Sul': 35.0, 'São Paulo': 37.5}
+DIAS_SINDICATO = {
+    'SITEPD PR - SIND DOS TRAB EM EMPR PRIVADAS DE PROC DE DADOS DE CURITIBA E REGIAO METROPOLITANA': 22,
+    'SINDPPD RS - SINDICATO DOS TRAB. EM PROC. DE DADOS RIO GRANDE DO SUL': 21,
+    'SINDPD SP - SIND.TRAB.EM PROC DADOS E EMPR.EMPRESAS PROC DADOS ESTADO DE SP.': 22,
+    'SINDPD RJ - SINDICATO PROFISSIONAIS DE PROC DADOS DO RIO DE JANEIRO': 21
+}
+
+CARGOS = [
+    'ANALISTA CONTABIL-FISCAL II', 'TECH RECRUITER II', 'COORDENADOR ADMINISTRATIVO',
+    'DESENVOLVEDOR III', 'ANALISTA DADOS I', 'ASSISTENTE DE BPO I', 'GERENTE CONTABIL-FISCAL',
+    'COORDENADOR DE OPERACOES III', 'ANALISTA DE CONTROLADORIA II', 'DIRETOR DE OPERACOES'
+]
+PESOS_CARGOS = [0.2, 0.12, 0.1, 0.16, 0.14, 0.14, 0.04, 0.04, 0.055, 0.005]
+
+# Situações em ATIVOS e proporções observadas na amostra
+SITUACOES = {
+    'Trabalhando': 0.946,
+    'Férias': 0.042,
+    'Licença Maternidade': 0.0066,
+    'Auxílio Doença': 0.0044,
+    'Atestado': 0.001
+}
+
+# Proporções das demais planilhas em relação ao quadro
+TAXA_DESLIGADOS = 0.028
+TAXA_ADMISSOES = 0.046
+TAXA_APRENDIZ = 0.018
+TAXA_ESTAGIO = 0.015
+TAXA_EXTERIOR = 0.002
+
+
+def write_workbook(path, frame, title=None):
+    """Grava o DataFrame em xlsx no modo write_only do openpyxl (linha de título opcional)"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Planilha1')
+    if title:
+        sheet.append([title])
+    sheet.append([str(col) for col in frame.columns])
+    for chunk in iter_chunks(frame):
+        for row in chunk_rows(chunk):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def generate_frames(rows, competencia='2025-05', seed=42):
+    """
+    Gera as planilhas de entrada de uma competência com rows colaboradores.
+
+    Distribuições (sindicatos, cargos, situações, férias, desligamentos,
+    admissões e exclusões) seguem as proporções da amostra em data/.
+    """
+    rng = np.random.default_rng(seed)
+    period = pd.Period(competencia, freq='M')
+    start = period.start_time.normalize()
+
+    matriculas = rng.choice(np.arange(10000, 10000 + rows * 3), size=rows, replace=False)
+    situacoes = rng.choice(list(SITUACOES), size=rows, p=list(SITUACOES.values()))
+    ativos = pd.DataFrame({
+        'MATRICULA': matriculas,
+        'EMPRESA': 1410,
+        'TITULO DO CARGO': rng.choice(CARGOS, size=rows, p=PESOS_CARGOS),
+        'DESC. SITUACAO': situacoes,
+        'Sindicato': rng.choice(list(SINDICATOS), size=rows, p=list(SINDICATOS.values()))
+    })
+
+    em_ferias = matriculas[situacoes == 'Férias']
+    ferias = pd.DataFrame({
+        'MATRICULA': em_ferias,
+        'DESC. SITUACAO': 'Férias',
+        'DIAS DE FÉRIAS': rng.choice([5, 10, 15, 20, 30], size=len(em_ferias), p=[0.1, 0.35, 0.3, 0.15, 0.1])
+    })
+
+    afastados = np.isin(situacoes, ['Licença Maternidade', 'Auxílio Doença', 'Atestado'])
+    retorno = rng.random(afastados.sum()) < 0.2
+    retorno_dia = rng.integers(2, 28, size=afastados.sum())
+    afastamentos = pd.DataFrame({
+        'MATRICULA': matriculas[afastados],
+        'DESC. SITUACAO': situacoes[afastados],
+        'na compra?': np.nan,
+        'Unnamed: 3': np.where(
+            retorno,
+            [f"retorno da licença em {dia:02d}/{period.month:02d}" for dia in retorno_dia],
+            None
+        )
+    })
+
+    n_desligados = max(1, int(rows * TAXA_DESLIGADOS))
+    desligados = pd.DataFrame({
+        'MATRICULA ': rng.choice(matriculas, size=n_desligados, replace=False),
+        'DATA DEMISSÃO': start + pd.to_timedelta(rng.integers(0, period.days_in_month, size=n_desligados), unit='D'),
+        'COMUNICADO DE DESLIGAMENTO': np.where(rng.random(n_desligados) < 0.85, 'OK', None)
+    })
+
+    n_admissoes = max(1, int(rows * TAXA_ADMISSOES))
+    anterior = (period - 1).start_time.normalize()
+    admissao = pd.DataFrame({
+        'MATRICULA': rng.choice(matriculas, size=n_admissoes, replace=False),
+        'Admissão': anterior + pd.to_timedelta(rng.integers(0, (period - 1).days_in_month, size=n_admissoes), unit='D'),
+        'Cargo': rng.choice(CARGOS[:-1], size=n_admissoes)
+    })
+
+    aprendiz = pd.DataFrame({
+        'MATRICULA': rng.choice(matriculas, size=max(1, int(rows * TAXA_APRENDIZ)), replace=False),
+        'TITULO DO CARGO': 'APRENDIZ'
+    })
+    estagio = pd.DataFrame({
+        'MATRICULA': rng.choice(matriculas, size=max(1, int(rows * TAXA_ESTAGIO)), replace=False),
+        'TITULO DO CARGO': 'ESTAGIARIO',
+        'na compra?': np.nan
+    })
+
+    n_exterior = max(1, int(rows * TAXA_EXTERIOR))
+    exterior = pd.DataFrame({
+        'Cadastro': rng.choice(matriculas, size=n_exterior, replace=False),
+        'Valor': rng.choice([28.0, 554.4, 660.0], size=n_exterior),
+        'Unnamed: 2': rng.choice([None, 'RETORNOU DO EXTERIOR - devido o pgto'], size=n_exterior, p=[0.75, 0.25])
+    })
+
+    base_sindicato = pd.DataFrame({'ESTADO': list(VALORES_ESTADO), 'VALOR': list(VALORES_ESTADO.values())})
+    base_dias_uteis = pd.DataFrame({'SINDICADO': list(DIAS_SINDICATO), 'DIAS UTEIS ': list(DIAS_SINDICATO.values())})
+
+    return {
+        'ativos': ativos,
+        'ferias': ferias,
+        'desligados': desligados,
+        'admissao': admissao,
+        'afastamentos': afastamentos,
+        'aprendiz': aprendiz,
+        'estagio': estagio,
+        'exterior': exterior,
+        'base_sindicato': base_sindicato,
+        'base_dias_uteis': base_dias_uteis
+    }
+
+
+def generate_dataset(rows, output_dir, competencia='2025-05', seed=42):
+    """Grava as planilhas sintéticas com os nomes esperados pelo carregador"""
+    os.makedirs(output_dir, exist_ok=True)
+    files = files_for_competencia(competencia, output_dir)
+    period = pd.Period(competencia, freq='M')
+    title = f"BASE DIAS UTEIS DE 15/{(period - 1).month:02d} a 15/{period.month:02d}"
+
+    for key, frame in generate_frames(rows, competencia, seed).items():
+        write_workbook(os.path.join(output_dir, files[key]), frame,
+                       title=title if key == 'base_dias_uteis' else None)
+    print(f"Planilhas sintéticas ({rows} colaboradores, competência {competencia}) salvas em: {output_dir}")
+    return output_dir
+
+
+def main(argv=None):
+    """Gera um conjunto de planilhas sintéticas pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Gera planilhas sintéticas de entrada para VR/VA")
+    parser.add_argument('--linhas', type=int, default=50000, help="número de colaboradores em ATIVOS")
+    parser.add_argument('--saida', default=os.path.join('output', 'sintetico'), help="diretório das planilhas")
+    parser.add_argument('--competencia', default='2025-05', help="competência (AAAA-MM)")
+    parser.add_argument('--semente', type=int, default=42, help="semente do gerador aleatório")
+    args = parser.parse_args(argv)
+    generate_dataset(args.linhas, args.saida, args.competencia, args.semente)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
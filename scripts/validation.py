@@ -0,0 +1,353 @@
+"""
+Validações das planilhas de entrada e da planilha final (aba "Validações" do VR Mensal)
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from column_resolver import normalize_matricula
+from money import split_cents, to_cents
+from proration import DESLIGAMENTO_CUTOFF_DAY
+
+# Gravidade das violações
+ERRO = 'erro'
+AVISO = 'aviso'
+SEVERITIES = [ERRO, AVISO]
+
+# Colunas da tabela de violações
+VIOLATION_COLUMNS = ['planilha', 'matricula', 'regra', 'severidade']
+
+# Espaços removidos dos textos (inclui os de largura zero das bases de sindicato)
+WHITESPACE = ' \t\r\n\xa0\u200b'
+
+# Férias de um mês: dias corridos
+MAX_DIAS_FERIAS = 30
+
+
+def validation_enabled():
+    """Indica se as validações rodam no processamento (VR_VALIDATE=0 desabilita)"""
+    return os.getenv('VR_VALIDATE', '1') != '0'
+
+
+class SourceView:
+    """
+    Colunas de uma planilha já convertidas para as regras.
+
+    Cada coluna é convertida (matrícula, data, número, texto) uma única vez
+    por planilha e compartilhada por todas as regras dela; colunas ausentes
+    viram colunas vazias, então as regras não precisam testar o cabeçalho.
+    """
+
+    def __init__(self, df, context):
+        self.df = df
+        self.context = context
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def _get(self, kind, column, convert):
+        key = (kind, column)
+        if key not in self._columns:
+            if column in self.df.columns:
+                self._columns[key] = convert(self.df[column])
+            else:
+                self._columns[key] = convert(pd.Series([None] * len(self.df), index=self.df.index, dtype=object))
+        return self._columns[key]
+
+    def matricula(self, column='MATRICULA'):
+        return self._get('matricula', column, lambda values: normalize_matricula(values).set_axis(values.index))
+
+    def date(self, column):
+        return self._get('date', column, lambda values: pd.to_datetime(values, errors='coerce'))
+
+    def number(self, column):
+        return self._get('number', column, lambda values: pd.to_numeric(values, errors='coerce'))
+
+    def text(self, column):
+        return self._get('text', column,
+                         lambda values: values.astype(object).where(values.notna(), '').astype(str)
+                         .str.strip(WHITESPACE).str.upper())
+
+    def filled(self, column):
+        """Campo preenchido (não nulo e não vazio)"""
+        return self.text(column) != ''
+
+    def in_ativos(self):
+        """Matrícula presente em ATIVOS"""
+        return self.matricula().isin(self.context['ativos']).to_numpy(dtype=bool)
+
+
+# Regras por planilha: (regra, gravidade, predicado). O predicado recebe a
+# SourceView e devolve a máscara das linhas que violam a regra.
+def _matricula_ausente(view):
+    return view.matricula().isna()
+
+
+def _fora_de_ativos(view):
+    return view.matricula().notna().to_numpy(dtype=bool) & ~view.in_ativos()
+
+
+def _matricula_duplicada(view):
+    matriculas = view.matricula()
+    return matriculas.notna() & matriculas.duplicated(keep=False)
+
+
+def _data_ausente(column):
+    return lambda view: view.date(column).isna()
+
+
+def _data_apos_competencia(column):
+    return lambda view: view.date(column) > view.context['fim']
+
+
+def _data_antes_competencia(column):
+    return lambda view: view.date(column) < view.context['inicio']
+
+
+def _campo_ausente(column):
+    return lambda view: ~view.filled(column)
+
+
+def _ferias_mal_preenchidas(view):
+    dias = view.number('DIAS DE FERIAS')
+    return dias.isna() | (dias <= 0) | (dias > MAX_DIAS_FERIAS) | ((dias % 1) != 0)
+
+
+def _periodo_invertido(view):
+    return view.date('FIM') < view.date('INICIO')
+
+
+def _desligamento_sem_comunicado(view):
+    # Até o dia 15 só sai da compra com o OK; sem ele a compra é integral
+    data = view.date('DATA DEMISSAO')
+    return (data < view.context['corte']) & (view.text('COMUNICADO DE DESLIGAMENTO') != 'OK')
+
+
+def _cargo_divergente(keyword):
+    return lambda view: ~view.text('TITULO DO CARGO').str.contains(keyword, regex=False)
+
+
+def _valor_invalido(column):
+    def predicate(view):
+        valor = view.number(column)
+        return valor.isna() | (valor <= 0)
+    return predicate
+
+
+def _sindicato_informado(view):
+    return view.filled('ESTADO') | view.filled('SINDICATO')
+
+
+def _valor_sindicato_invalido(view):
+    return _valor_invalido('VALOR')(view) & _sindicato_informado(view)
+
+
+def _dias_uteis_invalidos(view):
+    dias = view.number('DIAS UTEIS')
+    return (dias.isna() | (dias <= 0) | (dias > 31)) & _sindicato_informado(view)
+
+
+def _sindicato_sem_valor(view):
+    return np.isnan(view.context['valores_ativos']) & view.filled('SINDICATO').to_numpy(dtype=bool)
+
+
+def _sindicato_sem_dias(view):
+    return np.isnan(view.context['dias_ativos']) & view.filled('SINDICATO').to_numpy(dtype=bool)
+
+
+SOURCE_RULES = {
+    'ativos': [
+        ('matricula_ausente', ERRO, _matricula_ausente),
+        ('matricula_duplicada', ERRO, _matricula_duplicada),
+        ('sindicato_ausente', ERRO, _campo_ausente('SINDICATO')),
+        ('sindicato_sem_valor', ERRO, _sindicato_sem_valor),
+        ('sindicato_sem_dias_uteis', AVISO, _sindicato_sem_dias),
+        ('cargo_ausente', AVISO, _campo_ausente('TITULO DO CARGO')),
+        ('situacao_ausente', AVISO, _campo_ausente('DESC. SITUACAO'))
+    ],
+    'afastamentos': [
+        ('matricula_ausente', ERRO, _matricula_ausente),
+        ('fora_de_ativos', AVISO, _fora_de_ativos),
+        ('situacao_ausente', AVISO, _campo_ausente('DESC. SITUACAO')),
+        ('periodo_invertido', ERRO, _periodo_invertido)
+    ],
+    'desligados': [
+        ('matricula_ausente', ERRO, _matricula_ausente),
+        ('fora_de_ativos', AVISO, _fora_de_ativos),
+        ('data_demissao_ausente', ERRO, _data_ausente('DATA DEMISSAO')),
+        ('data_demissao_fora_da_competencia', AVISO, lambda view: (
+            _data_antes_competencia('DATA DEMISSAO')(view) | _data_apos_competencia('DATA DEMISSAO')(view)
+        )),
+        ('desligamento_ate_dia_15_sem_comunicado', AVISO, _desligamento_sem_comunicado)
+    ],
+    'admissao': [
+        ('matricula_ausente', ERRO, _matricula_ausente),
+        ('fora_de_ativos', AVISO, _fora_de_ativos),
+        ('data_admissao_ausente', ERRO, _data_ausente('ADMISSAO')),
+        ('data_admissao_apos_competencia', ERRO, _data_apos_competencia('ADMISSAO'))
+    ],
+    'ferias': [
+        ('matricula_ausente', ERRO, _matricula_ausente),
+        ('fora_de_ativos', AVISO, _fora_de_ativos),
+        ('ferias_mal_preenchidas', ERRO, _ferias_mal_preenchidas),
+        ('periodo_invertido', ERRO, _periodo_invertido)
+    ],
+    'estagio': [
+        ('matricula_ausente', ERRO, _matricula_ausente),
+        ('cargo_divergente', AVISO, _cargo_divergente('ESTAG'))
+    ],
+    'aprendiz': [
+        ('matricula_ausente', ERRO, _matricula_ausente),
+        ('cargo_divergente', AVISO, _cargo_divergente('APRENDIZ'))
+    ],
+    'exterior': [
+        ('matricula_ausente', ERRO, _matricula_ausente),
+        ('valor_ausente', AVISO, lambda view: view.number('VALOR').isna())
+    ],
+    'base_sindicato': [
+        ('valor_sindicato_invalido', ERRO, _valor_sindicato_invalido)
+    ],
+    'base_dias_uteis': [
+        ('dias_uteis_invalidos', ERRO, _dias_uteis_invalidos)
+    ]
+}
+
+
+def _dias_fora_da_competencia(view):
+    dias = view.number('Dias Úteis')
+    return dias.isna() | (dias < 0) | (dias > view.context['dias_competencia'])
+
+
+def _total_divergente(view):
+    total = to_cents(view.number('Valor Total'))
+    return total != view.number('Dias Úteis').fillna(0).to_numpy(dtype=np.int64) * to_cents(view.number('Valor do VR'))
+
+
+def _divisao_divergente(view):
+    total = to_cents(view.number('Valor Total'))
+    empresa, desconto = split_cents(total)
+    return ((to_cents(view.number('Valor Empresa (80%)')) != empresa)
+            | (to_cents(view.number('Valor Descontado (20%)')) != desconto))
+
+
+# "Revisar o cálculo de pagamento antes de gerar os vales": regras da planilha final
+OUTPUT_RULES = [
+    ('matricula_ausente', ERRO, lambda view: view.matricula('Matrícula').isna()),
+    ('matricula_duplicada', ERRO, lambda view: view.matricula('Matrícula').notna()
+     & view.matricula('Matrícula').duplicated(keep=False)),
+    ('dias_uteis_fora_da_competencia', ERRO, _dias_fora_da_competencia),
+    ('valor_diario_invalido', ERRO, _valor_invalido('Valor do VR')),
+    ('total_divergente', ERRO, _total_divergente),
+    ('divisao_80_20_divergente', ERRO, _divisao_divergente)
+]
+
+
+def build_context(data, calendar, sindicato_index=None):
+    """
+    Dados compartilhados pelas regras: matrículas de ATIVOS, limites da
+    competência e valor/dias úteis do sindicato de cada colaborador ativo.
+    """
+    ativos = data.get('ativos')
+    if ativos is None or ativos.empty:
+        ativos = pd.DataFrame()
+    matriculas = normalize_matricula(ativos['MATRICULA']) if 'MATRICULA' in ativos.columns else pd.Series([], dtype='Int64')
+
+    inicio = pd.Timestamp(calendar.start)
+    context = {
+        'ativos': matriculas.dropna().unique(),
+        'inicio': inicio,
+        'fim': pd.Timestamp(calendar.end),
+        'corte': inicio + pd.Timedelta(days=DESLIGAMENTO_CUTOFF_DAY),
+        'dias_competencia': int((pd.Timestamp(calendar.end) - inicio).days) + 1,
+        'valores_ativos': np.full(len(ativos), np.nan),
+        'dias_ativos': np.full(len(ativos), np.nan)
+    }
+    if sindicato_index is not None and 'SINDICATO' in ativos.columns:
+        attributes = sindicato_index.lookup(ativos['SINDICATO'])
+        context['valores_ativos'] = attributes['valor'].to_numpy(dtype=np.float64)
+        context['dias_ativos'] = attributes['dias'].to_numpy(dtype=np.float64)
+    return context
+
+
+def evaluate_rules(name, df, rules, context, matricula_column='MATRICULA'):
+    """Aplica as regras a uma planilha (colunas convertidas uma vez) e devolve as violações"""
+    if df is None or df.empty or not rules:
+        return []
+
+    view = SourceView(df, context)
+    matriculas = view.matricula(matricula_column).array
+    violations = []
+    for regra, severidade, predicate in rules:
+        rows = np.flatnonzero(np.asarray(predicate(view), dtype=bool))
+        if len(rows):
+            violations.append(pd.DataFrame({
+                'planilha': name,
+                'matricula': matriculas[rows],
+                'regra': regra,
+                'severidade': severidade
+            }))
+    return violations
+
+
+def violation_table(frames):
+    """Tabela compacta de violações (planilha, matrícula, regra, gravidade)"""
+    if not frames:
+        table = pd.DataFrame({column: pd.Series(dtype=object) for column in VIOLATION_COLUMNS})
+    else:
+        table = pd.concat(frames, ignore_index=True)
+    table['matricula'] = table['matricula'].astype('Int64')
+    for column in ['planilha', 'regra']:
+        table[column] = table[column].astype('category')
+    table['severidade'] = pd.Categorical(table['severidade'], categories=SEVERITIES, ordered=True)
+    return table[VIOLATION_COLUMNS]
+
+
+def source_violations(data, calendar, sindicato_index=None, rules=None):
+    """Violações (lista de DataFrames não vazios) das planilhas de entrada, uma passada por planilha"""
+    rules = SOURCE_RULES if rules is None else rules
+    context = build_context(data, calendar, sindicato_index)
+    frames = []
+    for name, source_rules in rules.items():
+        frames.extend(evaluate_rules(name, data.get(name), source_rules, context))
+    return frames
+
+
+def output_violations(frame, calendar, rules=None):
+    """Violações (lista de DataFrames não vazios) da planilha final"""
+    rules = OUTPUT_RULES if rules is None else rules
+    context = build_context({}, calendar)
+    return evaluate_rules('vr_mensal', frame, rules, context, matricula_column='Matrícula')
+
+
+def validate_sources(data, calendar, sindicato_index=None, rules=None):
+    """Roda as regras de todas as planilhas de entrada (uma passada por planilha)"""
+    return violation_table(source_violations(data, calendar, sindicato_index, rules))
+
+
+def validate_output(frame, calendar, rules=None):
+    """Confere a planilha final: matrículas, dias úteis da competência e valores em centavos"""
+    return violation_table(output_violations(frame, calendar, rules))
+
+
+def validate_all(data, frame, calendar, sindicato_index=None):
+    """
+    Planilhas de entrada e planilha final em uma única tabela.
+
+    As violações são juntadas antes de virar tabela: um concat só, sem
+    tabelas vazias nem categorias diferentes a conciliar.
+    """
+    return violation_table(source_violations(data, calendar, sindicato_index)
+                           + output_violations(frame, calendar))
+
+
+def violation_counts(table):
+    """Quantidade de violações por planilha, regra e gravidade (para o log)"""
+    if table.empty:
+        return {}
+    counts = table.groupby(['planilha', 'regra', 'severidade'], observed=True).size()
+    return {f"{planilha}.{regra}.{severidade}": int(count) for (planilha, regra, severidade), count in counts.items()}
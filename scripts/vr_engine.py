@@ -0,0 +1,174 @@
+"""
+Motor de cálculo vetorizado de VR/VA
+
+Grupo: Synapse 7 - Desafio 4
+"""
+
+import numpy as np
+import pandas as pd
+
+from absence_intervals import absence_business_days
+from money import DESCONTO_COLUMN, EMPRESA_COLUMN, TOTAL_COLUMN, from_cents, split_cents, to_cents
+
+# Layout da planilha final
+OUTPUT_COLUMNS = [
+    'Matrícula',
+    'Nome',
+    'Sindicato',
+    'Dias Úteis',
+    'Valor do VR',
+    'Valor Total',
+    'Valor Empresa (80%)',
+    'Valor Descontado (20%)',
+    'Status'
+]
+
+
+def filled_values(values):
+    """
+    Marca os valores preenchidos: não nulos e, em colunas de texto, não em branco.
+
+    O teste de texto em branco roda uma vez por valor distinto (ou categoria);
+    colunas numéricas e de datas só precisam de notna.
+    """
+    filled = values.notna()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        candidates = values.cat.categories
+    elif pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype):
+        candidates = values.dropna().unique()
+    else:
+        return filled
+    blank = [value for value in candidates if isinstance(value, str) and not value.strip()]
+    return filled & ~values.isin(blank) if blank else filled
+
+
+def coalesce_columns(df, columns, default):
+    """Retorna, linha a linha, o primeiro valor preenchido entre as colunas informadas"""
+    result = pd.Series(np.nan, index=df.index, dtype=object)
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        missing = result.isna() & filled_values(values)
+        result = result.mask(missing, values)
+    return result.where(result.notna(), default)
+
+
+def resolve_numeric(df, column, fallback):
+    """Usa a coluna numérica quando preenchida e o fallback (Series) nas demais linhas"""
+    if column and column in df.columns:
+        values = pd.to_numeric(df[column], errors='coerce')
+        return values.fillna(fallback)
+    return fallback
+
+
+def calculate_working_days(calendar, sindicatos, admissao=None, desligamento=None,
+                           base_days=None, municipios=None, matriculas=None,
+                           absences=None, excluded=None):
+    """
+    Calcula os dias úteis de todos os colaboradores de uma vez.
+
+    Cada colaborador conta os dias úteis do seu calendário (UF/município do
+    sindicato) entre a admissão e o desligamento, limitados à competência,
+    descontando os intervalos de férias e afastamentos (absences) ligados
+    pela matrícula. Quando o sindicato tem dias úteis acordados (base_days),
+    os dias perdidos no calendário são descontados desse total. Linhas
+    marcadas em excluded (ex.: desligamento comunicado até o dia 15) ficam
+    com zero dias.
+    """
+    calendar_ids = calendar.calendar_ids(sindicatos, municipios)
+    worked = calendar.count_business_days(calendar_ids, admissao, desligamento)
+
+    if absences is not None and matriculas is not None:
+        worked = worked - absence_business_days(
+            calendar, absences, matriculas, calendar_ids,
+            admissao=admissao, desligamento=desligamento
+        )
+        worked = np.clip(worked, 0, None)
+
+    if base_days is not None:
+        base = pd.to_numeric(pd.Series(base_days), errors='coerce').to_numpy(dtype=np.float64)
+        lost = calendar.full_period_days(calendar_ids) - worked
+        worked = np.where(np.isnan(base), worked, np.clip(base - lost, 0, None))
+
+    if excluded is not None:
+        worked = np.where(np.asarray(excluded, dtype=bool), 0, worked)
+
+    return worked.astype(np.int64)
+
+
+def calculate_vr_frame(employees, sindicato_values, dias_uteis_sindicato,
+                       matricula_columns=('MATRICULA',),
+                       nome_columns=('NOME', 'Nome'),
+                       sindicato_columns=('SINDICATO', 'Sindicato'),
+                       dias_column=None,
+                       valor_column=None,
+                       status_column=None,
+                       default_sindicato='PADRÃO',
+                       default_dias=22,
+                       default_valor=30.0,
+                       default_status='Elegível',
+                       sindicato_index=None,
+                       with_cents=False):
+    """
+    Calcula os valores de VR para todos os colaboradores com operações por coluna.
+
+    Sindicato, dias úteis e valor diário são resolvidos por mapeamento
+    vetorizado (hash join) e os valores são calculados em centavos int64:
+    a divisão 80/20 arredonda a parte da empresa e o desconto é o restante,
+    então as duas sempre somam o total, sem iterar linha a linha. Com
+    with_cents=True retorna (planilha, centavos), os centavos como
+    {coluna: array int64} para os totais (VRTotals.from_frame).
+
+    Com sindicato_index (SindicatoIndex), valor e dias saem da dimensão de
+    sindicatos por id, em qualquer grafia do nome; as tabelas por nome
+    cobrem o que a dimensão não tiver.
+    """
+    if employees.empty:
+        empty = pd.DataFrame(columns=OUTPUT_COLUMNS)
+        return (empty, None) if with_cents else empty
+
+    matricula = coalesce_columns(employees, matricula_columns, 'N/A')
+    nome = coalesce_columns(employees, nome_columns, 'N/A')
+    sindicato = coalesce_columns(employees, sindicato_columns, default_sindicato)
+
+    # Dias úteis e valor diário: coluna própria (se houver) ou tabela do sindicato
+    if sindicato_index is not None:
+        attributes = sindicato_index.lookup(sindicato, sindicato_values, dias_uteis_sindicato)
+        dias_por_sindicato = attributes['dias']
+        valor_por_sindicato = attributes['valor']
+    else:
+        dias_por_sindicato = pd.to_numeric(sindicato.map(dias_uteis_sindicato), errors='coerce')
+        valor_por_sindicato = pd.to_numeric(sindicato.map(sindicato_values), errors='coerce')
+
+    dias_uteis = resolve_numeric(employees, dias_column, dias_por_sindicato.fillna(default_dias))
+    dias_uteis = dias_uteis.astype(np.int64)
+
+    valor_vr_diario = resolve_numeric(employees, valor_column, valor_por_sindicato.fillna(default_valor))
+    valor_vr_diario = valor_vr_diario.astype(np.float64)
+
+    # Calcular valores em centavos (exatos) e voltar a reais só na saída
+    diario_cents = to_cents(valor_vr_diario)
+    total_cents = dias_uteis.to_numpy() * diario_cents
+    empresa_cents, desconto_cents = split_cents(total_cents)
+
+    if status_column and status_column in employees.columns:
+        # Texto simples: uma coluna categórica não aceita o status padrão como novo valor
+        status = employees[status_column].astype(object).fillna(default_status)
+    else:
+        status = pd.Series(default_status, index=employees.index)
+
+    result = pd.DataFrame({
+        'Matrícula': matricula.to_numpy(),
+        'Nome': nome.to_numpy(),
+        'Sindicato': sindicato.to_numpy(),
+        'Dias Úteis': dias_uteis.to_numpy(),
+        'Valor do VR': from_cents(diario_cents),
+        TOTAL_COLUMN: from_cents(total_cents),
+        EMPRESA_COLUMN: from_cents(empresa_cents),
+        DESCONTO_COLUMN: from_cents(desconto_cents),
+        'Status': status.to_numpy()
+    })[OUTPUT_COLUMNS]
+    if not with_cents:
+        return result
+    return result, {TOTAL_COLUMN: total_cents, EMPRESA_COLUMN: empresa_cents, DESCONTO_COLUMN: desconto_cents}